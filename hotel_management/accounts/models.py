@@ -19,8 +19,11 @@ class UserProfile(models.Model):
 
 #SIGNAL: CREATE & SAVE PROFILE AUTOMATICALLY
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
+def create_or_update_user_profile(sender, instance, created, update_fields=None, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
+    elif update_fields and set(update_fields) <= {"last_login"}:
+        # Logging in only touches last_login; the profile has nothing to save
+        return
     else:
         instance.userprofile.save()
@@ -1,3 +1,28 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from hotel_management.querybudget import QueryBudgetTestMixin
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+
+    def test_register(self):
+        response = self.client.post(reverse("register"), {
+            "username": "newguest",
+            "email": "newguest@example.com",
+            "first_name": "New",
+            "last_name": "Guest",
+            "password1": "a-Strong-passw0rd",
+            "password2": "a-Strong-passw0rd",
+        })
+        self.assertRedirects(response, reverse("home"))
+        self.assertWithinQueryBudget(response)
+
+    def test_login_profile_logout(self):
+        User.objects.create_user("guest", password="secret")
+        response = self.client.post(reverse("login"), {"username": "guest", "password": "secret"})
+        self.assertRedirects(response, reverse("home"))
+        self.assertWithinQueryBudget(response)
+        self.assertWithinQueryBudget(self.client.get(reverse("profile")))
+        self.assertWithinQueryBudget(self.client.get(reverse("logout")))
@@ -5,9 +5,11 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 
 from .forms import CustomUserCreationForm, LoginForm, UserProfileForm
+from hotel_management.querybudget import query_budget
 
 
 #REGISTER VIEW
+@query_budget(13)
 def register(request):
     if request.method == "POST":
         form = CustomUserCreationForm(request.POST)
@@ -23,6 +25,7 @@ def register(request):
 
 
 #LOGIN VIEW
+@query_budget(10)
 def user_login(request):
     if request.method == "POST":
         form = LoginForm(request, data=request.POST)
@@ -41,6 +44,7 @@ def user_login(request):
 
 
 #LOGOUT VIEW
+@query_budget(4)
 def user_logout(request):
     logout(request)
     messages.success(request, "You have been logged out.")
@@ -48,6 +52,7 @@ def user_logout(request):
 
 
 #USER PROFILE
+@query_budget(5)
 @login_required
 def profile(request):
     profile = request.user.userprofile
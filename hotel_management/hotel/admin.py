@@ -1,8 +1,9 @@
 from django.contrib import admin
-from.models import RoomType,Room,Booking,Payment
+from.models import RoomType,Room,RoomRate,Booking,Payment,NightAuditRun
 # Register your models here.
 admin.site.register(RoomType)
 admin.site.register(Room)
+admin.site.register(RoomRate)
 admin.site.register(Booking)
 admin.site.register(Payment)
-
+admin.site.register(NightAuditRun)
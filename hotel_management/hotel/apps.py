@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class HotelConfig(AppConfig):
     name = 'hotel'
+
+    def ready(self):
+        from . import signals  # noqa: F401
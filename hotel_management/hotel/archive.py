@@ -0,0 +1,108 @@
+"""
+Hot/cold archival of bookings and payments.
+
+Completed and cancelled bookings whose stay ended more than
+``settings.ARCHIVE_AFTER_DAYS`` ago are copied, with their payments, to
+``ArchivedBooking`` / ``ArchivedPayment`` and deleted from the hot tables,
+one batch per transaction. The hot tables then hold only recent and active
+bookings, which is all that availability, the dashboard and the night
+audit look at.
+
+Archiving changes no totals, availability or search result, so the delete
+runs with the ``hotel.signals`` receivers muted.
+
+Guest-facing history (My Bookings, booking details, the review check) and
+accounting exports read both tables; the helpers below do that.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import signals
+from .models import ArchivedBooking, ArchivedPayment, Booking, Payment
+
+ARCHIVED_STATUSES = ["completed", "cancelled"]
+
+BOOKING_FIELDS = [
+    "id", "guest_id", "room_id", "check_in_date", "check_out_date",
+    "number_of_guests", "total_price", "status", "created_at",
+]
+PAYMENT_FIELDS = [
+    "id", "booking_id", "amount", "payment_date", "payment_method", "status", "transaction_id",
+]
+
+
+def cutoff_date(days=None):
+    days = getattr(settings, "ARCHIVE_AFTER_DAYS", 365) if days is None else days
+    return timezone.localdate() - timedelta(days=days)
+
+
+def archivable(cutoff):
+    """Hot bookings that are over and checked out before ``cutoff``."""
+    return Booking.objects.filter(status__in=ARCHIVED_STATUSES, check_out_date__lt=cutoff)
+
+
+def archive_batch(booking_ids):
+    """Move these bookings and their payments to the archive tables."""
+    with transaction.atomic():
+        bookings = Booking.objects.filter(id__in=booking_ids, status__in=ARCHIVED_STATUSES)
+        ArchivedBooking.objects.bulk_create([
+            ArchivedBooking(**row) for row in bookings.values(*BOOKING_FIELDS)
+        ])
+        ArchivedPayment.objects.bulk_create([
+            ArchivedPayment(**row)
+            for row in Payment.objects.filter(booking__in=bookings).values(*PAYMENT_FIELDS)
+        ])
+        with signals.muted():
+            # Cascades to the payments and the (past) room nights
+            _, deleted = bookings.delete()
+    return deleted.get(Booking._meta.label, 0)
+
+
+def archive(cutoff=None, batch_size=1000, on_batch=None):
+    """Archive everything ``archivable(cutoff)``; return how many bookings moved."""
+    cutoff = cutoff or cutoff_date()
+    total = 0
+    while True:
+        batch = list(archivable(cutoff).order_by("id").values_list("id", flat=True)[:batch_size])
+        if not batch:
+            return total
+        total += archive_batch(batch)
+        if on_batch:
+            on_batch(total)
+
+
+# READING BOTH TABLES
+
+def guest_bookings(guest):
+    """Querysets of a guest's hot and archived bookings, for ``paginate_merged``."""
+    return [
+        Booking.objects.filter(guest=guest).select_related("room__room_type"),
+        ArchivedBooking.objects.filter(guest=guest).select_related("room__room_type"),
+    ]
+
+
+def find_booking(booking_id, guest):
+    """``(booking, payment)`` from the hot or the archive tables, or ``(None, None)``."""
+    booking = Booking.objects.select_related("guest", "room__room_type").filter(
+        id=booking_id, guest=guest
+    ).first()
+    if booking is not None:
+        return booking, Payment.objects.filter(booking=booking).first()
+
+    booking = ArchivedBooking.objects.select_related("guest", "room__room_type").filter(
+        id=booking_id, guest=guest
+    ).first()
+    if booking is not None:
+        return booking, ArchivedPayment.objects.filter(booking=booking).first()
+    return None, None
+
+
+def has_stayed(guest, room):
+    """Has ``guest`` completed a stay in ``room``, recently or long ago?"""
+    return (
+        Booking.objects.filter(guest=guest, room=room, status="completed").exists()
+        or ArchivedBooking.objects.filter(guest=guest, room=room, status="completed").exists()
+    )
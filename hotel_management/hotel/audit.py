@@ -0,0 +1,97 @@
+"""
+Night audit: the daily job that moves bookings and rooms along with the
+calendar (``manage.py night_audit``).
+
+For a business date it
+
+1. cancels holds that have expired (``holds.sweep``);
+2. completes confirmed stays that have checked out, which is what lets a
+   guest review the room;
+3. marks rooms with a guest in house ``occupied`` and the other occupied
+   rooms ``available``. Rooms under maintenance are left alone.
+
+Every step is a set-based ``UPDATE`` or one ``bulk_update``, found through
+the ``(status, check_out_date)`` and ``(status, check_in_date, ...)``
+indexes, so the work is proportional to the stays that ended or are in
+progress and not to the booking history. The steps only change rows that
+are not yet in their target state, so running the audit twice for the same
+date is harmless. Each run is recorded as a ``NightAuditRun``.
+
+The writes skip the model signals; the dashboard counters, search cache,
+catalogue and availability index are updated here instead.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import holds, search_cache
+from .availability import index as availability_index
+from .models import Booking, DashboardStats, NightAuditRun, Room
+
+
+def complete_stays(business_date):
+    """Complete confirmed stays checking out on or before ``business_date``."""
+    completed = Booking.objects.filter(
+        status="confirmed", check_out_date__lte=business_date
+    ).update(status="completed", version=F("version") + 1)
+    DashboardStats.apply(confirmed_bookings=-completed)
+    return completed
+
+
+def sync_room_status(business_date):
+    """Set room status from the stays in house on ``business_date``.
+
+    Returns ``(freed, occupied)``: how many rooms became available and how
+    many became occupied.
+    """
+    in_house = set(Booking.objects.filter(
+        status="confirmed",
+        check_in_date__lte=business_date,
+        check_out_date__gt=business_date,
+    ).values_list("room_id", flat=True))
+
+    changed = []
+    rooms = Room.objects.filter(
+        Q(status="occupied") | Q(id__in=in_house, status="available")
+    ).only("id", "status")
+    for room in rooms:
+        status = "occupied" if room.id in in_house else "available"
+        if room.status != status:
+            room.status = status
+            changed.append(room)
+    Room.objects.bulk_update(changed, ["status"], batch_size=500)
+
+    occupied = sum(room.status == "occupied" for room in changed)
+    freed = len(changed) - occupied
+    DashboardStats.apply(occupied_rooms=occupied - freed)
+    return freed, occupied
+
+
+def run(business_date=None):
+    """Audit ``business_date`` (default: today) and record the run."""
+    business_date = business_date or timezone.localdate()
+    started_at = timezone.now()
+    started = time.perf_counter()
+
+    expired = holds.sweep(now=started_at)
+    with transaction.atomic():
+        completed = complete_stays(business_date)
+        freed, occupied = sync_room_status(business_date)
+
+    if completed:
+        availability_index.invalidate_everywhere()
+    if freed or occupied:
+        # Room status decides which rooms are listed
+        search_cache.invalidate_all()
+
+    return NightAuditRun.objects.create(
+        business_date=business_date,
+        started_at=started_at,
+        duration_ms=round((time.perf_counter() - started) * 1000),
+        holds_expired=expired,
+        stays_completed=completed,
+        rooms_freed=freed,
+        rooms_occupied=occupied,
+    )
@@ -0,0 +1,273 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.utils import timezone
+from hotel_management.replicas import primary
+
+from . import versions
+from .search_cache import night_versions
+
+# Nights whose versions a full load records; later ones are refreshed from
+# the database the first time they are queried
+TRACKED_NIGHTS = 365
+
+
+def booked_rooms_query(check_in, check_out):
+    """ORM equivalent of ``AvailabilityIndex.booked_room_ids``."""
+    from .models import Booking
+
+    return Booking.objects.filter(
+        check_in_date__lt=check_out,
+        check_out_date__gt=check_in,
+        status__in=Booking.BLOCKING_STATUSES,
+    ).exclude(
+        status="pending", hold_expires_at__lte=timezone.now()
+    ).values_list("room_id", flat=True)
+
+
+class RoomIntervals:
+    """Sorted stays of one room, with a running max of check-out dates.
+
+    Stays are kept ordered by check-in. ``max_ends[i]`` is the latest
+    check-out among the first ``i + 1`` stays, so an overlap test is one
+    bisect plus one comparison even when stays overlap each other.
+    """
+
+    __slots__ = ("stays", "starts", "max_ends")
+
+    def __init__(self):
+        self.stays = []
+        self.starts = []
+        self.max_ends = []
+
+    def add(self, check_in, check_out, booking_id):
+        insort(self.stays, (check_in, check_out, booking_id))
+        self._reindex()
+
+    def discard(self, booking_id):
+        stays = [stay for stay in self.stays if stay[2] != booking_id]
+        if len(stays) != len(self.stays):
+            self.stays = stays
+            self._reindex()
+
+    def overlapping(self, check_in, check_out):
+        """Booking ids of the stays overlapping the dates."""
+        return [
+            booking_id
+            for _, stay_out, booking_id in self.stays[:bisect_left(self.starts, check_out)]
+            if stay_out > check_in
+        ]
+
+    def overlaps(self, check_in, check_out):
+        # Stays starting before check_out are a prefix of the list; the room
+        # is busy if any of them ends after check_in.
+        i = bisect_left(self.starts, check_out)
+        return i > 0 and self.max_ends[i - 1] > check_in
+
+    def _reindex(self):
+        self.starts = [stay[0] for stay in self.stays]
+        self.max_ends = []
+        latest = None
+        for stay in self.stays:
+            if latest is None or stay[1] > latest:
+                latest = stay[1]
+            self.max_ends.append(latest)
+
+    def __len__(self):
+        return len(self.stays)
+
+
+class AvailabilityIndex:
+    """In-memory per-room interval index of bookings that block a room.
+
+    The index is loaded in bulk the first time it is queried. Each worker
+    process holds its own copy, which the ``Booking`` signals in
+    ``hotel.signals`` update for this process's own writes. Other workers'
+    writes show up through the per-night version counters the signals bump
+    (``search_cache.night_versions``): before answering for a stay, the
+    index compares the versions of its nights with the ones it last saw and
+    reloads the bookings on the nights that moved on. Bulk writes that
+    bypass signals (imports, sweepers) call ``invalidate_everywhere()``,
+    which bumps a shared version so every worker reloads in full.
+
+    Pending bookings are also kept in a heap by hold expiry; every query
+    first drops the holds that have run out (see ``hotel.holds``).
+    """
+
+    VERSION = "availability"
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rooms = None
+        self._room_of = {}
+        self._hold_of = {}
+        self._holds = []
+        self._version = None
+        self._nights = {}  # night version name -> value the index reflects
+
+    # LOADING
+
+    def rebuild(self):
+        from .models import Booking
+
+        version = versions.get(self.VERSION)
+        # Read before the bookings, so a write committing meanwhile leaves
+        # its nights looking changed rather than hiding it
+        today = date.today()
+        nights = versions.get_many(night_versions(
+            today, today + timedelta(days=TRACKED_NIGHTS)
+        ))
+        now = timezone.now()
+        rooms = defaultdict(RoomIntervals)
+        room_of = {}
+        hold_of = {}
+        bookings = Booking.objects.filter(
+            status__in=Booking.BLOCKING_STATUSES
+        ).exclude(
+            status="pending", hold_expires_at__lte=now
+        ).values_list("id", "room_id", "check_in_date", "check_out_date", "hold_expires_at")
+
+        # Kept in sync by signals from here on, so never from a lagging replica
+        with primary():
+            for booking_id, room_id, check_in, check_out, expires in bookings.iterator(chunk_size=10000):
+                rooms[room_id].stays.append((check_in, check_out, booking_id))
+                room_of[booking_id] = room_id
+                if expires is not None:
+                    hold_of[booking_id] = expires
+
+        for intervals in rooms.values():
+            intervals.stays.sort()
+            intervals._reindex()
+
+        holds = [(expires, booking_id) for booking_id, expires in hold_of.items()]
+        heapq.heapify(holds)
+
+        with self._lock:
+            self._rooms = rooms
+            self._room_of = room_of
+            self._hold_of = hold_of
+            self._holds = holds
+            self._version = version
+            self._nights = nights
+
+    def refresh(self, check_in, check_out):
+        """Reload the bookings on the nights of a stay that other processes
+        changed since this index last saw them."""
+        from .models import Booking
+
+        current = versions.get_many(night_versions(check_in, check_out))
+        stale = sorted(name for name, value in current.items() if self._nights.get(name) != value)
+        if not stale:
+            return
+        start = date.fromisoformat(stale[0].split(":", 1)[1])
+        end = date.fromisoformat(stale[-1].split(":", 1)[1]) + timedelta(days=1)
+        with primary():
+            rows = list(Booking.objects.filter(
+                check_in_date__lt=end,
+                check_out_date__gt=start,
+                status__in=Booking.BLOCKING_STATUSES,
+            ).exclude(
+                status="pending", hold_expires_at__lte=timezone.now()
+            ).values_list("id", "room_id", "check_in_date", "check_out_date", "hold_expires_at"))
+
+        for intervals in list(self._rooms.values()):
+            for booking_id in intervals.overlapping(start, end):
+                self._discard(booking_id)
+        for booking_id, room_id, booking_in, booking_out, expires in rows:
+            self._discard(booking_id)
+            self._add(booking_id, room_id, booking_in, booking_out, expires)
+        self._nights.update(current)
+
+    def invalidate(self):
+        with self._lock:
+            self._rooms = None
+            self._room_of = {}
+            self._hold_of = {}
+            self._holds = []
+            self._nights = {}
+
+    def invalidate_everywhere(self):
+        """Make every worker's index reload, not just this process's."""
+        versions.bump(self.VERSION)
+        self.invalidate()
+
+    def _loaded(self, check_in, check_out):
+        if self._rooms is None or versions.get(self.VERSION) != self._version:
+            self.rebuild()
+        self.refresh(check_in, check_out)
+        self._drop_expired_holds(timezone.now())
+        return self._rooms
+
+    def _drop_expired_holds(self, now):
+        while self._holds and self._holds[0][0] <= now:
+            expires, booking_id = heapq.heappop(self._holds)
+            # Skip entries left behind by a booking confirmed or re-held since
+            if self._hold_of.get(booking_id) == expires:
+                self._discard(booking_id)
+
+    # UPDATES
+
+    def update(self, booking):
+        """Insert, move or drop ``booking`` according to its current state."""
+        from .models import Booking
+
+        with self._lock:
+            if self._rooms is None:
+                return
+            self._discard(booking.id)
+            if booking.status in Booking.BLOCKING_STATUSES and not booking.hold_expired:
+                self._add(
+                    booking.id, booking.room_id, booking.check_in_date, booking.check_out_date,
+                    booking.hold_expires_at if booking.status == "pending" else None,
+                )
+
+    def _add(self, booking_id, room_id, check_in, check_out, expires):
+        self._rooms[room_id].add(check_in, check_out, booking_id)
+        self._room_of[booking_id] = room_id
+        if expires is not None:
+            self._hold_of[booking_id] = expires
+            heapq.heappush(self._holds, (expires, booking_id))
+
+    def discard(self, booking_id):
+        with self._lock:
+            if self._rooms is not None:
+                self._discard(booking_id)
+
+    def _discard(self, booking_id):
+        self._hold_of.pop(booking_id, None)
+        room_id = self._room_of.pop(booking_id, None)
+        if room_id is not None:
+            self._rooms[room_id].discard(booking_id)
+
+    # QUERIES
+
+    def is_available(self, room_id, check_in, check_out):
+        with self._lock:
+            intervals = self._loaded(check_in, check_out).get(room_id)
+            return intervals is None or not intervals.overlaps(check_in, check_out)
+
+    def booked_room_ids(self, check_in, check_out):
+        """Ids of rooms with a blocking booking overlapping the stay."""
+        with self._lock:
+            return {
+                room_id
+                for room_id, intervals in self._loaded(check_in, check_out).items()
+                if intervals.overlaps(check_in, check_out)
+            }
+
+    def hold_expiry(self, check_in, check_out):
+        """When the first live hold overlapping the stay runs out, or None."""
+        with self._lock:
+            rooms = self._loaded(check_in, check_out)
+            return min((
+                self._hold_of[booking_id]
+                for intervals in rooms.values()
+                for booking_id in intervals.overlapping(check_in, check_out)
+                if booking_id in self._hold_of
+            ), default=None)
+
+
+index = AvailabilityIndex()
@@ -0,0 +1,232 @@
+"""Helpers shared by the ``bench_*`` management commands.
+
+Benchmarks never touch the configured database: they build a scratch copy
+of the schema with Django's test database machinery, seed it with
+``bulk_create`` and drop it again when done.
+"""
+import random
+import statistics
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+
+@contextmanager
+def scratch_database(on_disk=False):
+    """Create a throwaway test database for the duration of the block.
+
+    SQLite test databases live in memory by default, which is fastest but
+    cannot be shared between threads that each open their own connection;
+    pass ``on_disk=True`` for multi-threaded benchmarks.
+    """
+    from django.test.utils import (
+        setup_databases, setup_test_environment,
+        teardown_databases, teardown_test_environment,
+    )
+
+    test_settings = settings.DATABASES["default"].setdefault("TEST", {})
+    previous_name = test_settings.get("NAME")
+    tmpdir = None
+    if on_disk:
+        tmpdir = tempfile.TemporaryDirectory(prefix="hotel-bench-")
+        test_settings["NAME"] = str(Path(tmpdir.name) / "bench.sqlite3")
+
+    # The test environment lets benchmarks drive views with the test client.
+    setup_test_environment()
+    old_config = setup_databases(
+        verbosity=0, interactive=False, aliases={"default"}, serialized_aliases=set()
+    )
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+        test_settings["NAME"] = previous_name
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+
+# SEED DATA
+
+ROOM_TYPES = [
+    ("Standard", Decimal("2500.00"), 2),
+    ("Deluxe", Decimal("4000.00"), 3),
+    ("Suite", Decimal("7500.00"), 4),
+    ("Family", Decimal("5500.00"), 6),
+]
+
+
+def seed_catalogue(rooms, floors=10):
+    """Create the room types and ``rooms`` rooms spread over ``floors``."""
+    from . import search_cache
+    from .models import RoomType, Room
+
+    room_types = RoomType.objects.bulk_create([
+        RoomType(
+            name=name,
+            description=f"{name} room",
+            price_per_night=price,
+            capacity=capacity,
+            amenities="WiFi TV AC Minibar Safe",
+        )
+        for name, price, capacity in ROOM_TYPES
+    ])
+    per_floor = max(1, -(-rooms // floors))
+    width = max(2, len(str(per_floor - 1)))
+    Room.objects.bulk_create(
+        [
+            Room(
+                room_number=f"{1 + i // per_floor}{i % per_floor:0{width}d}",
+                room_type=room_types[i % len(room_types)],
+                floor_number=1 + i // per_floor,
+            )
+            for i in range(rooms)
+        ],
+        batch_size=1000,
+    )
+    # bulk_create skips the signals that expire the catalogue
+    search_cache.invalidate_all()
+    return list(Room.objects.values_list("id", flat=True))
+
+
+def seed_guests(count, prefix="guest"):
+    """Create ``count`` guest users (and their profiles) in bulk."""
+    from accounts.models import UserProfile
+
+    users = User.objects.bulk_create(
+        [User(username=f"{prefix}{i}", email=f"{prefix}{i}@example.com") for i in range(count)],
+        batch_size=1000,
+    )
+    UserProfile.objects.bulk_create(
+        [UserProfile(user=user) for user in users], batch_size=1000
+    )
+    return [user.id for user in users]
+
+
+def seed_bookings(count, room_ids, guest_ids, active_share=0.1, seed=0, batch_size=10000):
+    """Create ``count`` bookings of 1-7 nights.
+
+    Roughly ``active_share`` of them are pending or confirmed stays in the
+    next year; the rest are completed or cancelled stays from the last five
+    years, which is what a property with a long history looks like.
+    """
+    from .models import Booking
+
+    rng = random.Random(seed)
+    today = date.today()
+    batch = []
+    for _ in range(count):
+        nights = rng.randint(1, 7)
+        if rng.random() < active_share:
+            check_in = today + timedelta(days=rng.randint(0, 365))
+            status = rng.choice(Booking.BLOCKING_STATUSES)
+        else:
+            check_in = today - timedelta(days=rng.randint(8, 5 * 365))
+            status = rng.choice(["completed", "completed", "completed", "cancelled"])
+        batch.append(Booking(
+            guest_id=rng.choice(guest_ids),
+            room_id=rng.choice(room_ids),
+            check_in_date=check_in,
+            check_out_date=check_in + timedelta(days=nights),
+            number_of_guests=rng.randint(1, 2),
+            total_price=Decimal(2500 * nights),
+            status=status,
+        ))
+        if len(batch) >= batch_size:
+            Booking.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Booking.objects.bulk_create(batch)
+
+
+def seed_payments(batch_size=10000):
+    """Create a completed payment for every confirmed or completed booking."""
+    from .models import Booking, Payment
+
+    rng = random.Random(2)
+    methods = [method for method, _ in Payment.PAYMENT_METHOD]
+    bookings = Booking.objects.filter(status__in=["confirmed", "completed"]).values_list("id", "total_price")
+    batch = []
+    for booking_id, amount in bookings.iterator(chunk_size=batch_size):
+        batch.append(Payment(
+            booking_id=booking_id,
+            amount=amount,
+            payment_method=rng.choice(methods),
+            status="completed",
+            transaction_id=f"SEED{booking_id}",
+        ))
+        if len(batch) >= batch_size:
+            Payment.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Payment.objects.bulk_create(batch)
+
+
+def seed_reviews(count, room_ids, guest_ids, seed=3):
+    """Create up to ``count`` reviews (one per guest and room) and the
+    rooms' rating aggregates, which bulk_create does not maintain."""
+    from .models import Room, RoomReview
+
+    rng = random.Random(seed)
+    pairs = set()
+    for _ in range(count * 2):
+        if len(pairs) >= min(count, len(room_ids) * len(guest_ids)):
+            break
+        pairs.add((rng.choice(guest_ids), rng.choice(room_ids)))
+    reviews = [
+        RoomReview(user_id=guest_id, room_id=room_id, rating=rng.choice([3, 4, 4, 5, 5]), comment="Nice stay")
+        for guest_id, room_id in pairs
+    ]
+    RoomReview.objects.bulk_create(reviews, batch_size=10000)
+
+    rooms = {room.id: room for room in Room.objects.filter(id__in={room_id for _, room_id in pairs})}
+    for review in reviews:
+        room = rooms[review.room_id]
+        room.review_count += 1
+        room.rating_sum += review.rating
+        setattr(room, f"rating_{review.rating}", getattr(room, f"rating_{review.rating}") + 1)
+    Room.objects.bulk_update(rooms.values(), Room.REVIEW_FIELDS, batch_size=1000)
+    return len(reviews)
+
+
+def random_stays(count, seed=1, horizon=365):
+    """``count`` random (check_in, check_out) searches over the next year."""
+    rng = random.Random(seed)
+    today = date.today()
+    stays = []
+    for _ in range(count):
+        check_in = today + timedelta(days=rng.randint(0, horizon))
+        stays.append((check_in, check_in + timedelta(days=rng.randint(1, 7))))
+    return stays
+
+
+# MEASUREMENT
+
+def timed(func, *args, **kwargs):
+    """Run ``func`` and return ``(result, elapsed_seconds)``."""
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": ordered[-1] * 1000,
+    }
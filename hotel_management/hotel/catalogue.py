@@ -0,0 +1,170 @@
+"""
+In-process catalogue of active room types and rooms.
+
+Room types and rooms change a few times a day but are read on every
+catalogue request, so each worker process loads all the active ones once
+into read-only ``__slots__`` snapshots and answers lookups from memory.
+The snapshots are reloaded when the shared catalogue version counter
+(``search_cache.CATALOGUE_VERSION``) moves on; the Room and RoomType
+signals, ``RoomTypeImporter`` and ``build_image_variants`` bump it, so a
+change in one worker reaches the others on their next lookup. A lookup
+costs one cache read and no database query.
+
+Inside ``@read_replica`` views the snapshots load from a replica, which
+may not have the writes behind the latest bump yet. Such a load is only
+kept until the replica has had ``replicas.max_lag()`` to catch up, or
+until a lookup that reads from the primary; if the reload finds other
+rows, the version is bumped so that searches, cards and pages built from
+the lagging copy expire too.
+
+Snapshots carry what the catalogue pages show. Review aggregates change
+with every review and are not part of them; read those from ``Room``.
+"""
+import time
+from collections import namedtuple
+
+from django.core.files.storage import default_storage
+from hotel_management.replicas import max_lag, reads_from_replica
+
+from . import fragments, versions
+from .images import ResponsiveImage, static_image
+from .search_cache import CATALOGUE_VERSION
+
+
+class Snapshot:
+    """Read-only record; subclasses list their fields in ``__slots__``."""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.id}: {self}>"
+
+
+class RoomTypeSnapshot(Snapshot):
+    __slots__ = (
+        "id", "name", "description", "price_per_night", "capacity",
+        "amenities", "image", "image_variants",
+    )
+
+    # Same rules as RoomType; ``image`` is the stored file name here
+    @property
+    def fallback_image(self):
+        from .models import RoomType
+
+        return RoomType.fallback_image.fget(self)
+
+    @property
+    def responsive_image(self):
+        if self.image:
+            return ResponsiveImage(default_storage.url(self.image), self.image_variants)
+        return static_image(self.fallback_image)
+
+    @property
+    def image_url(self):
+        return self.responsive_image.src
+
+    def __str__(self):
+        return self.name
+
+
+class RoomSnapshot(Snapshot):
+    __slots__ = ("id", "room_number", "floor_number", "status", "room_type_id", "room_type")
+
+    def __str__(self):
+        return f"Room {self.room_number}"
+
+
+class Catalogue:
+    """Active room types and rooms of this process, reloaded on version change.
+
+    The loaded snapshots are swapped in as one ``_State`` tuple, so readers
+    never see a half-updated catalogue and need no lock.
+    """
+
+    VERSION = CATALOGUE_VERSION
+
+    def __init__(self):
+        self._state = None
+
+    def load(self):
+        from .models import RoomType, Room
+
+        current, bumped_at = versions.get_with_modified([self.VERSION])
+        version = current[self.VERSION]
+        settles_at = None
+        if reads_from_replica("hotel.room") and time.time() < bumped_at + max_lag():
+            settles_at = bumped_at + max_lag()
+
+        type_rows = list(RoomType.objects.filter(is_active=True).order_by("id").values(
+            *RoomTypeSnapshot.__slots__
+        ))
+        rows = list(Room.objects.filter(is_active=True).values(
+            *[name for name in RoomSnapshot.__slots__ if name != "room_type"]
+        ))
+        room_types = {row["id"]: RoomTypeSnapshot(**row) for row in type_rows}
+        rooms = {}
+        for row in rows:
+            room_type = room_types.get(row["room_type_id"])
+            if room_type is not None:
+                rooms[row["id"]] = RoomSnapshot(room_type=room_type, **row)
+        by_number = sorted(rooms.values(), key=lambda room: room.room_number)
+
+        previous = self._state
+        loaded = (type_rows, rows)
+        self._state = _State(
+            version, room_types, rooms, by_number,
+            settles_at, loaded if settles_at is not None else None,
+        )
+        if previous is not None and previous.loaded is not None \
+                and previous.version == version and previous.loaded != loaded:
+            # The replica was behind: expire what was built from its copy
+            fragments.invalidate_all()
+            versions.bump(self.VERSION)
+        return self._state
+
+    def invalidate(self):
+        self._state = None
+
+    def invalidate_everywhere(self):
+        """Make every worker reload, e.g. after writes that skip signals."""
+        versions.bump(self.VERSION)
+        self.invalidate()
+
+    def _current(self):
+        # Two threads may both reload after a bump; that is harmless.
+        state = self._state
+        if state is None or versions.get(self.VERSION) != state.version or (
+            state.settles_at is not None
+            and (time.time() >= state.settles_at or not reads_from_replica("hotel.room"))
+        ):
+            state = self.load()
+        return state
+
+    # LOOKUPS
+
+    def room_types(self):
+        return list(self._current().room_types.values())
+
+    def room_type(self, room_type_id):
+        return self._current().room_types.get(room_type_id)
+
+    def room(self, room_id):
+        return self._current().rooms.get(room_id)
+
+    def rooms(self):
+        """All active rooms, ordered by room number."""
+        return list(self._current().by_number)
+
+
+# ``settles_at``: when a load from a lagging replica must be redone, with
+# the rows it ``loaded`` to compare; None for a load that is kept
+_State = namedtuple("_State", "version room_types rooms by_number settles_at loaded")
+
+catalogue = Catalogue()
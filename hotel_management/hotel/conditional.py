@@ -0,0 +1,116 @@
+"""
+Conditional GET (``ETag`` / ``Last-Modified``) for the catalogue pages.
+
+A page declares the version counters (see ``hotel.versions``) its content
+depends on. The validators are computed from those counters alone, so a
+repeat visitor or a CDN revalidating an unchanged page gets a ``304`` after
+a single cache read, before the view runs any query or renders anything.
+
+Counters used by the catalogue:
+
+* ``rooms`` (``search_cache.CATALOGUE_VERSION``): any Room or RoomType
+  change, including a room's status;
+* ``night:<date>``: bookings touching that night (room search results);
+* ``reviews:<room id>``: reviews of one room, and so its rating summary.
+
+A page can also change with the clock alone: a room search when a hold
+behind it runs out (``hotel.holds``). Such a page passes the time it next
+changes and the time it last did, which go into the validators too.
+
+The pages also show who is logged in and any flash messages, so the
+``ETag`` includes the session and messages cookies; a visitor who logs in,
+out or has a message waiting gets a fresh page.
+"""
+import hashlib
+from datetime import date, datetime, time, timezone
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from . import versions
+
+
+def review_version(room_id):
+    return f"reviews:{room_id}"
+
+
+def invalidate_reviews(room_id):
+    versions.bump(review_version(room_id))
+
+
+def _cookie_names():
+    # Session (who is logged in) and pending flash messages
+    return [settings.SESSION_COOKIE_NAME, CookieStorage.cookie_name]
+
+
+def validators(request, names, expires=None, changed_at=None):
+    """``(etag, last_modified)`` for a page built from counters ``names``.
+
+    ``expires`` and ``changed_at`` are the datetimes the page next and
+    last changes without a counter moving on, if any.
+    """
+    values, last_modified = versions.get_with_modified(names)
+
+    today = date.today()
+    # RELEASE_ID changes on deploy, when templates may have changed
+    parts = [getattr(settings, "RELEASE_ID", ""), today.isoformat()]
+    parts += [f"{name}={values[name]}" for name in sorted(values)]
+    parts += [expires, changed_at]
+    parts += [request.COOKIES.get(name, "") for name in _cookie_names()]
+    digest = hashlib.blake2b("|".join(map(str, parts)).encode(), digest_size=16).hexdigest()
+
+    # Pages can change at midnight (dates in the past become invalid)
+    midnight = datetime.combine(today, time.min).astimezone(timezone.utc).timestamp()
+    if changed_at is not None:
+        last_modified = max(last_modified, changed_at.timestamp())
+    return "W/" + quote_etag(digest), int(max(last_modified, midnight))
+
+
+def conditional_page(counters, timing=None):
+    """Answer conditional GETs from version counters.
+
+    ``counters(request, *args, **kwargs)`` returns the names of the
+    counters the page depends on; ``timing``, called the same way, the
+    page's ``(expires, changed_at)`` (see ``validators``). Works on sync
+    and async views.
+    """
+    def page_validators(request, *args, **kwargs):
+        names = counters(request, *args, **kwargs)
+        expires, changed_at = timing(request, *args, **kwargs) if timing else (None, None)
+        return validators(request, names, expires, changed_at)
+
+    def decorator(view_func):
+        def respond(etag, last_modified, response):
+            if response.status_code in (200, 304):
+                response.headers.setdefault("ETag", etag)
+                response.headers.setdefault("Last-Modified", http_date(last_modified))
+                # Always revalidate; the 304 is what makes that cheap
+                patch_cache_control(response, no_cache=True)
+            return response
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view_func(request, *args, **kwargs)
+                etag, last_modified = await sync_to_async(page_validators)(request, *args, **kwargs)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = await view_func(request, *args, **kwargs)
+                return respond(etag, last_modified, response)
+        else:
+            @wraps(view_func)
+            def wrapper(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return view_func(request, *args, **kwargs)
+                etag, last_modified = page_validators(request, *args, **kwargs)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is None:
+                    response = view_func(request, *args, **kwargs)
+                return respond(etag, last_modified, response)
+        return wrapper
+    return decorator
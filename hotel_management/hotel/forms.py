@@ -1,6 +1,5 @@
 from django import forms
-from datetime import date
-from .models import Booking, Payment
+from .models import RoomType, Room, Booking, Payment, validate_stay_dates
 
 
 #  ROOM SEARCH FORM
@@ -22,16 +21,7 @@ class RoomSearchForm(forms.Form):
         check_in = cleaned_data.get("check_in")
         check_out = cleaned_data.get("check_out")
 
-        if check_in and check_out:
-            if check_in < date.today():
-                raise forms.ValidationError(
-                    "Check-in date cannot be in the past."
-                )
-
-            if check_out <= check_in:
-                raise forms.ValidationError(
-                    "Check-out date must be after check-in date."
-                )
+        validate_stay_dates(check_in, check_out)
 
         return cleaned_data
 
@@ -51,16 +41,7 @@ class BookingForm(forms.ModelForm):
         check_in = cleaned_data.get("check_in_date")
         check_out = cleaned_data.get("check_out_date")
 
-        if check_in and check_out:
-            if check_in < date.today():
-                raise forms.ValidationError(
-                    "Check-in date cannot be in the past."
-                )
-
-            if check_out <= check_in:
-                raise forms.ValidationError(
-                    "Check-out date must be after check-in date."
-                )
+        validate_stay_dates(check_in, check_out)
 
         return cleaned_data
 
@@ -126,3 +107,61 @@ class RoomReviewForm(forms.ModelForm):
                 "placeholder": "Write your review..."
             }),
         }
+
+
+# EXPORT FORM
+class ExportForm(forms.Form):
+    start = forms.DateField(widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}))
+    end = forms.DateField(widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}))
+    format = forms.ChoiceField(
+        choices=[("csv", "CSV"), ("ndjson", "NDJSON")],
+        initial="csv",
+        required=False,
+        widget=forms.Select(attrs={"class": "form-control"})
+    )
+    gzip = forms.BooleanField(required=False)
+
+    def clean_format(self):
+        return self.cleaned_data["format"] or "csv"
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get("start")
+        end = cleaned_data.get("end")
+
+        if start and end and end < start:
+            raise forms.ValidationError("End date must not be before start date.")
+
+        return cleaned_data
+
+
+# BULK IMPORT FORMS
+# Used by ``manage.py import_hotel_data`` to validate one input row at a time.
+class RoomTypeImportForm(forms.ModelForm):
+    class Meta:
+        model = RoomType
+        fields = ["name", "description", "price_per_night", "capacity", "amenities", "is_active"]
+
+
+class RoomImportForm(forms.ModelForm):
+    room_type = forms.CharField(max_length=100)
+
+    class Meta:
+        model = Room
+        fields = ["room_number", "floor_number", "status", "is_active"]
+
+
+class BookingImportForm(forms.ModelForm):
+    room_number = forms.CharField(max_length=10)
+    guest = forms.CharField(max_length=150)
+    created_at = forms.DateTimeField(required=False)
+
+    payment_amount = forms.DecimalField(max_digits=10, decimal_places=2, required=False)
+    payment_method = forms.ChoiceField(choices=Payment.PAYMENT_METHOD, required=False)
+    payment_status = forms.ChoiceField(choices=Payment.PAYMENT_STATUS, required=False)
+    transaction_id = forms.CharField(max_length=100, required=False)
+
+    class Meta:
+        model = Booking
+        # Booking.clean applies the date rules; history may start in the past
+        fields = ["check_in_date", "check_out_date", "number_of_guests", "total_price", "status"]
@@ -0,0 +1,133 @@
+"""
+Fragment cache for the room cards on the room list.
+
+Each card is cached per room under the version counters (see
+``hotel.versions``) of the room and of its room type, which the save and
+delete signals bump. The room type part of a card (picture, name,
+capacity, price, amenities) is cached on its own under the room type's
+version, so rooms sharing a type share one rendering of it, and a changed
+room type is rendered once rather than once per room.
+
+Entries are never deleted: a bump changes the keys, and the old entries
+age out of the cache named by ``settings.FRAGMENT_CACHE_ALIAS``.
+
+A search's stay total depends on the dates, so it is not part of the
+cached card; it is put in at ``STAY_TOTAL_SLOT`` on the way out.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import get_template
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from . import versions
+
+# Bumped when every card may be stale, e.g. new static image variants
+CARDS_VERSION = "cards"
+
+STAY_TOTAL_SLOT = "<!-- stay-total -->"
+
+
+def _cache():
+    return caches[getattr(settings, "FRAGMENT_CACHE_ALIAS", "default")]
+
+
+def room_version(room_id):
+    return f"room:{room_id}"
+
+
+def room_type_version(room_type_id):
+    return f"room_type:{room_type_id}"
+
+
+def invalidate_room(room_id):
+    versions.bump(room_version(room_id))
+
+
+def invalidate_room_type(room_type_id):
+    versions.bump(room_type_version(room_type_id))
+
+
+def invalidate_all():
+    versions.bump(CARDS_VERSION)
+
+
+def _room_type_parts(room_types, keys):
+    """``{room_type_id: (heading, details)}``, rendering only cache misses."""
+    cache = _cache()
+    found = cache.get_many(keys.values())
+    missing = {}
+    heading = details = None
+    for room_type in room_types:
+        if keys[room_type.id] not in found:
+            heading = heading or get_template("hotel/includes/room_type_heading.html")
+            details = details or get_template("hotel/includes/room_type_details.html")
+            missing[keys[room_type.id]] = (
+                heading.render({"room_type": room_type}),
+                details.render({"room_type": room_type}),
+            )
+    if missing:
+        cache.set_many(missing)
+        found.update(missing)
+    return {room_type_id: found[key] for room_type_id, key in keys.items()}
+
+
+def stay_total_html(total, nights):
+    return format_html(
+        '<p class="card-price stay-total">₹{} for {} night{}</p>',
+        total, nights, "" if nights == 1 else "s",
+    )
+
+
+def render_room_cards(rooms, authenticated, totals=None, nights=None):
+    """HTML of the cards of ``rooms`` (with ``room_type`` selected).
+
+    ``totals`` maps room type ids to the price of a stay of ``nights``
+    nights, shown on each card of that type.
+    """
+    rooms = list(rooms)
+    room_types = {room.room_type_id: room.room_type for room in rooms}
+    current = versions.get_many(
+        [CARDS_VERSION]
+        + [room_version(room.id) for room in rooms]
+        + [room_type_version(room_type_id) for room_type_id in room_types]
+    )
+    # Templates can change between releases
+    prefix = f"{getattr(settings, 'RELEASE_ID', '')}:{current[CARDS_VERSION]}"
+    type_keys = {
+        room_type_id: f"room_type:{prefix}:{room_type_id}:{current[room_type_version(room_type_id)]}"
+        for room_type_id in room_types
+    }
+    card_keys = {
+        room.id: f"card:{type_keys[room.room_type_id]}:{room.id}:{current[room_version(room.id)]}:{int(authenticated)}"
+        for room in rooms
+    }
+
+    cache = _cache()
+    cards = cache.get_many(card_keys.values())
+    missing = [room for room in rooms if card_keys[room.id] not in cards]
+    if missing:
+        parts = _room_type_parts(
+            {room.room_type_id: room.room_type for room in missing}.values(),
+            {room.room_type_id: type_keys[room.room_type_id] for room in missing},
+        )
+        template = get_template("hotel/includes/room_card.html")
+        rendered = {}
+        for room in missing:
+            heading, details = parts[room.room_type_id]
+            rendered[card_keys[room.id]] = template.render({
+                "room": room,
+                "heading": heading,
+                "details": details,
+                "authenticated": authenticated,
+            })
+        cache.set_many(rendered)
+        cards.update(rendered)
+    if not totals:
+        return mark_safe("".join(cards[card_keys[room.id]] for room in rooms))
+    return mark_safe("".join(
+        cards[card_keys[room.id]].replace(
+            STAY_TOTAL_SLOT, stay_total_html(totals[room.room_type_id], nights), 1
+        ) if room.room_type_id in totals else cards[card_keys[room.id]]
+        for room in rooms
+    ))
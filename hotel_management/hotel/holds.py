@@ -0,0 +1,73 @@
+"""
+Holds on pending bookings.
+
+A booking is created ``pending`` and claims its room nights before it is
+paid for. The claim is a hold that lasts ``settings.BOOKING_HOLD_MINUTES``
+(``Booking.hold_expires_at``); once it has expired the booking no longer
+blocks the room:
+
+* the availability index and ``booked_rooms_query`` ignore it straight away;
+* a cached room search it was hiding a room from is a miss from then on,
+  and the room list's ``ETag`` and ``Last-Modified`` change with it
+  (``search_cache.cached_search``, ``conditional.validators``);
+* a new booking that runs into its nights cancels it and takes them
+  (``inventory.reserve_nights``);
+* ``sweep()``, run periodically by the ``expire_holds`` command, cancels
+  the rest in batches and gives their nights back.
+
+Cancelling is set-based: one ``UPDATE`` and one ``DELETE`` per batch.
+They skip the model signals, so the dashboard counters and the search
+cache are updated here instead.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import search_cache
+from .models import Booking, DashboardStats, RoomNight
+
+
+def hold_expiry(start=None):
+    """When a hold placed at ``start`` (default: now) runs out."""
+    minutes = getattr(settings, "BOOKING_HOLD_MINUTES", 15)
+    return (start or timezone.now()) + timedelta(minutes=minutes)
+
+
+def expired_holds(now=None):
+    return Booking.objects.filter(status="pending", hold_expires_at__lte=now or timezone.now())
+
+
+def cancel_expired(booking_ids, now=None):
+    """Cancel those of ``booking_ids`` that are still expired holds.
+
+    Returns how many were cancelled. Must run inside a transaction.
+    """
+    now = now or timezone.now()
+    holds = expired_holds(now).filter(id__in=booking_ids)
+    stays = set(holds.values_list("check_in_date", "check_out_date"))
+    # The version bump makes a concurrent confirm_booking of the same
+    # booking fail its optimistic check instead of confirming it.
+    cancelled = holds.update(status="cancelled", version=F("version") + 1)
+    if not cancelled:
+        return 0
+
+    RoomNight.objects.filter(booking_id__in=booking_ids, booking__status="cancelled").delete()
+    DashboardStats.apply(cancelled_bookings=cancelled)
+
+    transaction.on_commit(lambda: search_cache.invalidate_stays(stays))
+    return cancelled
+
+
+def sweep(batch_size=1000, now=None):
+    """Cancel every hold that has expired by ``now``; return the count."""
+    now = now or timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(expired_holds(now).order_by("hold_expires_at").values_list("id", flat=True)[:batch_size])
+            if not batch:
+                return total
+            total += cancel_expired(batch, now)
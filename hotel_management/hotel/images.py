@@ -0,0 +1,216 @@
+"""
+Responsive image variants.
+
+Every room type image, uploaded or one of the static fallbacks, is resized
+into a few widths and encoded twice: WebP, plus JPEG (or PNG for images
+with transparency) for browsers without WebP. Variant files are named
+after a hash of the source bytes, so a new upload gets new URLs and the
+files can be cached forever.
+
+Variants of uploads are recorded on ``RoomType.image_variants``; variants
+of the static fallbacks are recorded in a manifest next to the files.
+Templates render them through ``ResponsiveImage`` and the ``{% picture %}``
+tag, which emit ``srcset`` so the browser downloads only the size it needs.
+"""
+import hashlib
+import io
+import json
+import logging
+import threading
+from pathlib import Path
+
+from django.contrib.staticfiles import finders
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANT_DIR = "variants"
+STATIC_MANIFEST = f"{VARIANT_DIR}/static.json"
+
+# Named widths, in CSS pixels at 1x
+VARIANTS = {
+    "card": 480,  # room list card
+    "detail": 1200,  # room detail page
+    "retina": 2400,  # room detail on 2x screens
+}
+
+# Static images that get variants, with the widths each one needs
+STATIC_IMAGES = {
+    "images/standard.jpeg": list(VARIANTS.values()),
+    "images/delux.jpeg": list(VARIANTS.values()),
+    "images/suite.jpeg": list(VARIANTS.values()),
+    "images/default-room.jpeg": list(VARIANTS.values()),
+    # Shown 46px high in the header; 1x, 2x and 3x
+    "images/logo.png": [48, 96, 144],
+}
+
+WEBP_OPTIONS = {"quality": 80, "method": 6}
+JPEG_OPTIONS = {"quality": 82, "optimize": True, "progressive": True}
+PNG_OPTIONS = {"optimize": True}
+
+
+# GENERATION
+
+def generate_variants(source, widths=None):
+    """Write resized variants of the image file ``source`` to storage.
+
+    Returns the manifest entry stored for it: the original size and, per
+    format, a list of ``[width, storage_name]`` from narrowest to widest.
+    Widths larger than the original are skipped rather than upscaled.
+    """
+    data = source.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    stem = Path(getattr(source, "name", "") or "image").stem
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+
+    has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    fallback = "png" if has_alpha else "jpeg"
+
+    wanted = sorted(set(widths or VARIANTS.values()))
+    fitting = [width for width in wanted if width < image.width]
+    if not fitting or (wanted[-1] >= image.width and image.width > fitting[-1] * 1.25):
+        # The original is narrower than the widest variant; it stands in at
+        # full size unless it is barely wider than the next variant down
+        fitting.append(image.width)
+
+    entry = {"width": image.width, "height": image.height, "webp": [], "fallback": [], "fallback_format": fallback}
+    for width in fitting:
+        height = round(image.height * width / image.width)
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for key, fmt in (("webp", "webp"), ("fallback", fallback)):
+            name = f"{VARIANT_DIR}/{stem}-{digest}-{width}w.{fmt}"
+            if not default_storage.exists(name):
+                default_storage.save(name, ContentFile(_encode(resized, fmt)))
+            entry[key].append([width, name])
+    return entry
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == "webp":
+        image.save(buffer, "WEBP", **WEBP_OPTIONS)
+    elif fmt == "png":
+        image.save(buffer, "PNG", **PNG_OPTIONS)
+    else:
+        image.save(buffer, "JPEG", **JPEG_OPTIONS)
+    return buffer.getvalue()
+
+
+def build_room_type_variants(room_type):
+    """(Re)generate the variants of an uploaded room type image."""
+    from .models import RoomType
+
+    variants = {}
+    if room_type.image:
+        with room_type.image.open("rb") as source:
+            variants = generate_variants(source)
+    RoomType.objects.filter(pk=room_type.pk).update(image_variants=variants)
+    room_type.image_variants = variants
+    return variants
+
+
+def build_static_variants():
+    """Generate variants of ``STATIC_IMAGES`` and write their manifest."""
+    manifest = {}
+    for path, widths in STATIC_IMAGES.items():
+        found = finders.find(path)
+        if not found:
+            logger.warning("Static image %s not found; skipped", path)
+            continue
+        with open(found, "rb") as source:
+            manifest[path] = generate_variants(source, widths)
+
+    if default_storage.exists(STATIC_MANIFEST):
+        default_storage.delete(STATIC_MANIFEST)
+    default_storage.save(STATIC_MANIFEST, ContentFile(json.dumps(manifest, indent=2).encode()))
+
+    global _static_manifest
+    _static_manifest = (_manifest_mtime(), manifest)
+    return manifest
+
+
+# RENDERING
+
+class ResponsiveImage:
+    """URLs for one image: the plain ``src`` plus ``srcset`` per format."""
+
+    def __init__(self, url, entry=None):
+        self.original_url = url
+        self.entry = entry or {}
+
+    def _srcset(self, key):
+        return ", ".join(
+            f"{default_storage.url(name)} {width}w" for width, name in self.entry.get(key, [])
+        )
+
+    @property
+    def webp_srcset(self):
+        return self._srcset("webp")
+
+    @property
+    def srcset(self):
+        return self._srcset("fallback")
+
+    @property
+    def fallback_type(self):
+        return f"image/{self.entry.get('fallback_format', 'jpeg')}"
+
+    def url(self, variant="card"):
+        """URL of the smallest fallback variant at least ``variant`` wide."""
+        candidates = self.entry.get("fallback")
+        if not candidates:
+            return self.original_url
+        width = VARIANTS.get(variant, variant)
+        for candidate_width, name in candidates:
+            if candidate_width >= width:
+                return default_storage.url(name)
+        return default_storage.url(candidates[-1][1])
+
+    @property
+    def src(self):
+        return self.url("card")
+
+    def __str__(self):
+        return self.src
+
+
+# Reread when the file changes, so variants built by ``build_image_variants``
+# show up without a restart; until it has run the originals are served.
+_static_manifest = None  # (mtime, manifest)
+_static_lock = threading.Lock()
+
+
+def _manifest_mtime():
+    try:
+        return default_storage.get_modified_time(STATIC_MANIFEST)
+    except (OSError, NotImplementedError):
+        return None
+
+
+def _load_static_manifest():
+    global _static_manifest
+    mtime = _manifest_mtime()
+    cached = _static_manifest
+    if cached is None or cached[0] != mtime:
+        with _static_lock:
+            if _static_manifest is None or _static_manifest[0] != mtime:
+                try:
+                    with default_storage.open(STATIC_MANIFEST) as f:
+                        manifest = json.load(f)
+                except (OSError, ValueError):
+                    manifest = {}
+                _static_manifest = (mtime, manifest)
+            cached = _static_manifest
+    return cached[1]
+
+
+def static_image(path):
+    """``ResponsiveImage`` for a static file, using its variants if built."""
+    return ResponsiveImage(static(path), _load_static_manifest().get(path))
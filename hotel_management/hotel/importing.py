@@ -0,0 +1,281 @@
+"""
+Streaming bulk import of room types, rooms and historical bookings.
+
+Rows are read lazily from CSV or JSON Lines, validated one at a time with
+the ``*ImportForm`` classes (so they follow the same rules as the site's
+forms and ``Booking.clean``) and written in batches with ``bulk_create``.
+Each batch is its own transaction, so memory use depends on the batch size
+and not on the size of the file.
+"""
+import csv
+import json
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from .forms import RoomTypeImportForm, RoomImportForm, BookingImportForm
+from .holds import hold_expiry
+from .inventory import RoomUnavailable, reserve_nights
+from .models import RoomType, Room, Booking, Payment, ArchivedPayment
+from .signals import muted
+
+
+# READING
+
+def read_rows(path, fmt=None):
+    """Yield ``(line_number, row_dict)`` from a CSV or JSONL file."""
+    fmt = fmt or ("jsonl" if Path(path).suffix in (".jsonl", ".ndjson") else "csv")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for line_number, row in enumerate(csv.DictReader(f), start=2):
+                yield line_number, row
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if line.strip():
+                    yield line_number, json.loads(line)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+FALSE_VALUES = {"0", "no", "n", "false", "f"}
+
+
+def _form_data(row, defaults):
+    """Drop empty cells so ``defaults`` apply, and spell booleans the way
+    ``CheckboxInput`` understands them."""
+    data = dict(defaults)
+    for key, value in row.items():
+        if value is None or value == "":
+            continue
+        if key == "is_active" and str(value).strip().lower() in FALSE_VALUES:
+            value = "false"
+        data[key] = value
+    return data
+
+
+def _errors(form):
+    return "; ".join(
+        f"{field}: {' '.join(messages)}" if field != "__all__" else " ".join(messages)
+        for field, messages in form.errors.items()
+    )
+
+
+# IMPORTERS
+
+class Importer:
+    """Validates and writes one chunk of rows at a time.
+
+    ``import_chunk`` returns the rejected rows as ``(line, row, error)``.
+    """
+
+    def __init__(self, batch_size=5000, create_guests=False):
+        self.batch_size = batch_size
+        self.create_guests = create_guests
+
+    def import_chunk(self, rows):
+        raise NotImplementedError
+
+    def finish(self):
+        pass
+
+
+class RoomTypeImporter(Importer):
+    def import_chunk(self, rows):
+        rejected, room_types = [], []
+        for line, row in rows:
+            form = RoomTypeImportForm(_form_data(row, {"is_active": "true"}))
+            if form.is_valid():
+                room_types.append(form.save(commit=False))
+            else:
+                rejected.append((line, row, _errors(form)))
+        RoomType.objects.bulk_create(room_types, batch_size=self.batch_size)
+        return rejected
+
+    def finish(self):
+        from . import search_cache
+        # The catalogue version: catalogue, rate calendar and searches reload
+        search_cache.invalidate_all()
+
+
+class RoomImporter(Importer):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.room_types = dict(RoomType.objects.values_list("name", "id"))
+
+    def import_chunk(self, rows):
+        rejected, rooms, numbers = [], [], set()
+        for line, row in rows:
+            form = RoomImportForm(_form_data(row, {"is_active": "true", "status": "available"}))
+            if not form.is_valid():
+                rejected.append((line, row, _errors(form)))
+                continue
+            room = form.save(commit=False)
+            room.room_type_id = self.room_types.get(form.cleaned_data["room_type"])
+            if room.room_type_id is None:
+                rejected.append((line, row, f"Unknown room type {form.cleaned_data['room_type']!r}."))
+            elif room.room_number in numbers:
+                rejected.append((line, row, f"Duplicate room number {room.room_number!r} in input."))
+            else:
+                numbers.add(room.room_number)
+                rooms.append(room)
+        Room.objects.bulk_create(rooms, batch_size=self.batch_size)
+        return rejected
+
+    def finish(self):
+        from . import search_cache
+        search_cache.invalidate_all()
+
+
+class BookingImporter(Importer):
+    """Bookings plus, optionally, one payment each (``payment_*`` columns).
+
+    Pending and confirmed bookings also claim their nights in the room-night
+    ledger; a row whose nights are already sold is rejected.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rooms = dict(Room.objects.values_list("room_number", "id"))
+
+    def import_chunk(self, rows):
+        rejected, valid = [], []
+        for line, row in rows:
+            form = BookingImportForm(_form_data(row, {}))
+            if not form.is_valid():
+                rejected.append((line, row, _errors(form)))
+                continue
+            room_id = self.rooms.get(form.cleaned_data["room_number"])
+            if room_id is None:
+                rejected.append((line, row, f"Unknown room {form.cleaned_data['room_number']!r}."))
+                continue
+            booking = form.save(commit=False)
+            booking.room_id = room_id
+            valid.append((line, row, form.cleaned_data, booking))
+
+        guests = self._guest_ids({data["guest"] for _, _, data, _ in valid})
+        transaction_ids = [data["transaction_id"] for _, _, data, _ in valid if data["transaction_id"]]
+        taken = set()
+        for model in (Payment, ArchivedPayment):
+            taken.update(model.objects.filter(
+                transaction_id__in=transaction_ids
+            ).values_list("transaction_id", flat=True))
+
+        accepted = []
+        for line, row, data, booking in valid:
+            booking.guest_id = guests.get(data["guest"])
+            if booking.guest_id is None:
+                rejected.append((line, row, f"Unknown guest {data['guest']!r}."))
+            elif data["transaction_id"] and data["transaction_id"] in taken:
+                rejected.append((line, row, f"Duplicate transaction id {data['transaction_id']!r}."))
+            else:
+                taken.add(data["transaction_id"])
+                accepted.append((line, row, data, booking))
+
+        now = timezone.now()
+        bookings = [booking for *_, booking in accepted]
+        created_at = [data["created_at"] or now for _, _, data, _ in accepted]
+        for booking, created in zip(bookings, created_at):
+            if booking.status == "pending":
+                booking.hold_expires_at = hold_expiry(created)
+        Booking.objects.bulk_create(bookings, batch_size=self.batch_size)
+        # bulk_create stamps created_at with the current time; put back the
+        # times from the file
+        for booking, created in zip(bookings, created_at):
+            booking.created_at = created
+        Booking.objects.bulk_update(bookings, ["created_at"], batch_size=self.batch_size)
+
+        # Active stays must not overlap anything already sold
+        kept, conflicted = [], []
+        for line, row, data, booking in accepted:
+            if booking.status in Booking.BLOCKING_STATUSES:
+                try:
+                    reserve_nights(booking)
+                except RoomUnavailable as exc:
+                    conflicted.append(booking.id)
+                    rejected.append((line, row, str(exc)))
+                    continue
+            kept.append((data, booking))
+        if conflicted:
+            # Like the inserts, without signals; finish() brings the
+            # counters, index and searches up to date
+            with muted():
+                Booking.objects.filter(pk__in=conflicted).delete()
+
+        Payment.objects.bulk_create([
+            Payment(
+                booking=booking,
+                amount=data["payment_amount"],
+                payment_method=data["payment_method"] or "cash",
+                status=data["payment_status"] or "completed",
+                transaction_id=data["transaction_id"] or None,
+            )
+            for data, booking in kept
+            if data["payment_amount"] is not None
+        ], batch_size=self.batch_size)
+        return sorted(rejected, key=lambda failure: failure[0])
+
+    def _guest_ids(self, usernames):
+        found = dict(User.objects.filter(username__in=usernames).values_list("username", "id"))
+        missing = usernames - found.keys()
+        if missing and self.create_guests:
+            users = [User(username=username) for username in sorted(missing)]
+            for user in users:
+                user.set_unusable_password()
+            User.objects.bulk_create(users, batch_size=self.batch_size)
+            UserProfile.objects.bulk_create([UserProfile(user=user) for user in users])
+            found.update((user.username, user.id) for user in users)
+        return found
+
+    def finish(self):
+        from . import search_cache
+        from .availability import index as availability_index
+        from .models import DashboardStats
+
+        # bulk_create skips the signals that keep these up to date
+        DashboardStats.rebuild()
+        availability_index.invalidate_everywhere()
+        search_cache.invalidate_all()
+
+
+IMPORTERS = {
+    "room_types": RoomTypeImporter,
+    "rooms": RoomImporter,
+    "bookings": BookingImporter,
+}
+
+
+def import_file(kind, path, fmt=None, batch_size=5000, create_guests=False, on_rejected=None, on_batch=None):
+    """Import ``path`` and return ``(accepted, rejected)`` row counts.
+
+    ``on_rejected(line, row, error)`` is called for every rejected row and
+    ``on_batch(accepted, rejected)`` after every committed batch.
+    """
+    importer = IMPORTERS[kind](batch_size=batch_size, create_guests=create_guests)
+    accepted = rejected = 0
+    committed = False
+    try:
+        for chunk in chunked(read_rows(path, fmt), batch_size):
+            with transaction.atomic():
+                failures = importer.import_chunk(chunk)
+            committed = True
+            accepted += len(chunk) - len(failures)
+            rejected += len(failures)
+            for failure in failures:
+                if on_rejected:
+                    on_rejected(*failure)
+            if on_batch:
+                on_batch(accepted, rejected)
+    finally:
+        # Batches already committed stay, even if a later one fails or the
+        # import is interrupted; they skipped the signals all the same
+        if committed:
+            importer.finish()
+    return accepted, rejected
@@ -0,0 +1,68 @@
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .holds import cancel_expired
+from .models import RoomNight
+
+
+class RoomUnavailable(Exception):
+    """Raised when one of the requested nights is already sold."""
+
+
+def reserve_nights(booking):
+    """Claim every night of ``booking`` in the room-night ledger.
+
+    All nights go in with a single ``bulk_create`` inside a savepoint, so
+    either the whole stay is claimed or nothing is and ``RoomUnavailable``
+    is raised. Two concurrent requests for the same night cannot both win:
+    the unique ``(room, night)`` index decides.
+    """
+    nights = [
+        RoomNight(room_id=booking.room_id, night=night, booking=booking)
+        for night in booking.night_dates()
+    ]
+    try:
+        with transaction.atomic():
+            RoomNight.objects.bulk_create(nights)
+    except IntegrityError:
+        # Nights held by abandoned checkouts are free once the hold expires
+        if not _release_expired_holds(booking):
+            raise RoomUnavailable(
+                f"Room {booking.room_id} is already booked for some of these nights."
+            )
+        try:
+            with transaction.atomic():
+                RoomNight.objects.bulk_create(nights)
+        except IntegrityError:
+            raise RoomUnavailable(
+                f"Room {booking.room_id} is already booked for some of these nights."
+            )
+
+
+def _release_expired_holds(booking):
+    now = timezone.now()
+    holders = RoomNight.objects.filter(
+        room_id=booking.room_id,
+        night__gte=booking.check_in_date,
+        night__lt=booking.check_out_date,
+        booking__status="pending",
+        booking__hold_expires_at__lte=now,
+    ).values_list("booking_id", flat=True).distinct()
+    with transaction.atomic():
+        return cancel_expired(list(holders), now)
+
+
+def release_nights(booking):
+    """Give the nights held by ``booking`` back to inventory."""
+    RoomNight.objects.filter(booking=booking).delete()
+
+
+def is_room_free(room_id, check_in, check_out):
+    """Check the stay against the ``(room, night)`` unique index."""
+    return not RoomNight.objects.filter(
+        room_id=room_id,
+        night__gte=check_in,
+        night__lt=check_out,
+    ).exclude(
+        booking__status="pending", booking__hold_expires_at__lte=timezone.now()
+    ).exists()
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from hotel import archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Move completed and cancelled bookings that checked out long ago, "
+        "with their payments, to the archive tables."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int,
+            help="Archive stays that checked out more than DAYS ago (default: ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = archive.cutoff_date(options["days"])
+        started = time.perf_counter()
+        moved = archive.archive(
+            cutoff,
+            batch_size=options["batch_size"],
+            on_batch=lambda total: self.stdout.write(f"  {total} archived"),
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Archived {moved} bookings checked out before {cutoff} in {elapsed * 1000:.0f} ms.")
@@ -0,0 +1,128 @@
+import asyncio
+import random
+import threading
+import time
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+
+from hotel import bench
+from hotel.availability import index as availability_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the public catalogue (home, room list/search, room detail) "
+        "through the WSGI and the ASGI request handlers with many concurrent "
+        "clients and report requests/sec and latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=200, help="Concurrent clients.")
+        parser.add_argument("--requests", type=int, default=20, help="Requests per client.")
+        parser.add_argument("--rooms", type=int, default=200)
+        parser.add_argument("--bookings", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        with bench.scratch_database(on_disk=True):
+            room_ids = bench.seed_catalogue(options["rooms"])
+            guest_ids = bench.seed_guests(100)
+            bench.seed_bookings(options["bookings"], room_ids, guest_ids)
+
+            total = options["clients"] * options["requests"]
+            self.stdout.write(
+                f"{options['clients']} clients x {options['requests']} requests "
+                f"(in-process handlers, no network)\n"
+            )
+            self.stdout.write(
+                f"{'handler':<8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+            )
+            for name, run in (("WSGI", self.run_wsgi), ("ASGI", self.run_asgi)):
+                self.reset()
+                workload = self.workload(room_ids, options)
+                started = time.perf_counter()
+                latencies, errors = run(workload)
+                elapsed = time.perf_counter() - started
+                summary = bench.summarize(latencies)
+                self.stdout.write(
+                    f"{name:<8} {total / elapsed:>8.0f} {summary['p50_ms']:>8.1f} "
+                    f"{summary['p95_ms']:>8.1f} {summary['p99_ms']:>8.1f} {errors:>7}"
+                )
+
+    def reset(self):
+        # Both handlers start from cold caches
+        availability_index.invalidate()
+        for cache in caches.all():
+            cache.clear()
+
+    def workload(self, room_ids, options):
+        """One list of URLs per client: a browse-heavy catalogue mix."""
+        stays = bench.random_stays(options["clients"] * options["requests"], horizon=60)
+        rng = random.Random(0)
+        workload = []
+        for client in range(options["clients"]):
+            urls = []
+            for i in range(options["requests"]):
+                roll = rng.random()
+                if roll < 0.2:
+                    urls.append("/")
+                elif roll < 0.35:
+                    urls.append("/rooms/")
+                elif roll < 0.65:
+                    check_in, check_out = stays[client * options["requests"] + i]
+                    urls.append(f"/rooms/?check_in={check_in}&check_out={check_out}&guests={rng.randint(1, 4)}")
+                else:
+                    urls.append(f"/room/{rng.choice(room_ids)}/")
+            workload.append(urls)
+        return workload
+
+    def run_wsgi(self, workload):
+        """A thread per client, as a threaded WSGI server would run them."""
+        latencies, errors = [], [0]
+        lock = threading.Lock()
+        barrier = threading.Barrier(len(workload))
+
+        def work(urls):
+            client = Client()
+            samples, failed = [], 0
+            barrier.wait()
+            try:
+                for url in urls:
+                    started = time.perf_counter()
+                    failed += client.get(url).status_code != 200
+                    samples.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(samples)
+                errors[0] += failed
+
+        threads = [threading.Thread(target=work, args=(urls,)) for urls in workload]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return latencies, errors[0]
+
+    def run_asgi(self, workload):
+        """A task per client on one event loop, as an ASGI server would run them."""
+        async def work(urls):
+            client = AsyncClient()
+            samples, failed = [], 0
+            for url in urls:
+                started = time.perf_counter()
+                # The ASGI handler gives every request its own sync worker
+                # thread; the test client does not, so do it here.
+                async with ThreadSensitiveContext():
+                    failed += (await client.get(url)).status_code != 200
+                samples.append(time.perf_counter() - started)
+            return samples, failed
+
+        async def main():
+            return await asyncio.gather(*(work(urls) for urls in workload))
+
+        results = asyncio.run(main())
+        return [s for samples, _ in results for s in samples], sum(failed for _, failed in results)
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+
+from hotel import bench
+from hotel.availability import AvailabilityIndex, booked_rooms_query
+from hotel.models import Room
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the ORM overlap query used by room_list with the in-memory "
+        "availability index on a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=1000)
+        parser.add_argument("--bookings", type=int, default=1_000_000)
+        parser.add_argument("--guests", type=int, default=1000)
+        parser.add_argument("--searches", type=int, default=200)
+
+    def handle(self, *args, **options):
+        with bench.scratch_database():
+            self.stdout.write(
+                f"Seeding {options['rooms']} rooms and {options['bookings']} bookings..."
+            )
+            room_ids = bench.seed_catalogue(options["rooms"])
+            guest_ids = bench.seed_guests(options["guests"])
+            _, seconds = bench.timed(
+                bench.seed_bookings, options["bookings"], room_ids, guest_ids
+            )
+            self.stdout.write(f"  seeded in {seconds:.1f}s")
+
+            stays = bench.random_stays(options["searches"])
+
+            orm_samples = []
+            for check_in, check_out in stays:
+                rooms = Room.objects.filter(status="available").exclude(
+                    id__in=booked_rooms_query(check_in, check_out)
+                )
+                _, seconds = bench.timed(lambda: list(rooms.values_list("id", flat=True)))
+                orm_samples.append(seconds)
+
+            index = AvailabilityIndex()
+            _, build_seconds = bench.timed(index.rebuild)
+
+            index_samples = []
+            for check_in, check_out in stays:
+                _, seconds = bench.timed(index.booked_room_ids, check_in, check_out)
+                index_samples.append(seconds)
+
+            # Both paths must agree before their timings mean anything.
+            for check_in, check_out in stays[:20]:
+                expected = set(booked_rooms_query(check_in, check_out))
+                assert index.booked_room_ids(check_in, check_out) == expected
+
+        self.stdout.write(f"Index build: {build_seconds * 1000:.0f} ms")
+        for label, samples in [("ORM overlap query", orm_samples), ("Interval index", index_samples)]:
+            stats = bench.summarize(samples)
+            self.stdout.write(
+                f"{label:<18} mean {stats['mean_ms']:8.3f} ms  "
+                f"p50 {stats['p50_ms']:8.3f} ms  p95 {stats['p95_ms']:8.3f} ms"
+            )
@@ -0,0 +1,102 @@
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from hotel import bench, services
+from hotel.models import Room
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent create/confirm/cancel workloads through the booking "
+        "service and report bookings/sec and conflict rate."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers", type=int, nargs="+", default=[1, 8, 32],
+            help="Concurrency levels to measure.",
+        )
+        parser.add_argument("--operations", type=int, default=40, help="Bookings attempted per worker.")
+        parser.add_argument(
+            "--rooms", type=int, default=10,
+            help="Rooms to spread bookings over; fewer rooms means more contention.",
+        )
+        parser.add_argument("--days", type=int, default=60, help="Booking horizon in days.")
+
+    def handle(self, *args, **options):
+        with bench.scratch_database(on_disk=True):
+            bench.seed_catalogue(options["rooms"])
+            bench.seed_guests(max(options["workers"]))
+            users = list(User.objects.order_by("id"))
+            rooms = list(Room.objects.select_related("room_type"))
+
+            self.stdout.write(
+                f"{'workers':>7} {'attempts':>9} {'booked':>7} {'booked/s':>9} "
+                f"{'unavailable':>12} {'conflicts':>10} {'retries':>8} {'p95 ms':>8}"
+            )
+            for level, workers in enumerate(options["workers"]):
+                # Each level books its own date window so it starts from empty inventory
+                first_night = date.today() + timedelta(days=1 + level * (options["days"] + 10))
+                self.run_level(workers, users, rooms, first_night, options)
+
+    def run_level(self, workers, users, rooms, first_night, options):
+        services.retry_stats.reset()
+        lock = threading.Lock()
+        totals = {"booked": 0, "unavailable": 0, "conflicts": 0}
+        latencies = []
+        barrier = threading.Barrier(workers)
+
+        def work(worker):
+            rng = random.Random(worker)
+            user = users[worker]
+            counts = {"booked": 0, "unavailable": 0, "conflicts": 0}
+            samples = []
+            barrier.wait()
+            try:
+                for _ in range(options["operations"]):
+                    room = rng.choice(rooms)
+                    check_in = first_night + timedelta(days=rng.randint(0, options["days"]))
+                    check_out = check_in + timedelta(days=rng.randint(1, 4))
+                    started = time.perf_counter()
+                    try:
+                        booking = services.create_booking(user, room, check_in, check_out, 1)
+                        if rng.random() < 0.2:
+                            services.cancel_booking(booking.id, user)
+                        else:
+                            services.confirm_booking(booking.id, user, "cash")
+                            counts["booked"] += 1
+                    except services.RoomUnavailable:
+                        counts["unavailable"] += 1
+                    except services.BookingConflict:
+                        counts["conflicts"] += 1
+                    samples.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            with lock:
+                for key, value in counts.items():
+                    totals[key] += value
+                latencies.extend(samples)
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        attempts = workers * options["operations"]
+        self.stdout.write(
+            f"{workers:>7} {attempts:>9} {totals['booked']:>7} "
+            f"{totals['booked'] / elapsed:>9.1f} "
+            f"{totals['unavailable'] / attempts:>11.1%} "
+            f"{totals['conflicts'] / attempts:>9.1%} "
+            f"{services.retry_stats.retries:>8} "
+            f"{bench.summarize(latencies)['p95_ms']:>8.1f}"
+        )
@@ -0,0 +1,75 @@
+import threading
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from hotel import bench
+from hotel.models import Booking, Room, RoomNight
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire N concurrent make_booking requests for the same room and "
+        "dates and check that exactly one of them wins."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--rounds", type=int, default=5)
+
+    def handle(self, *args, **options):
+        threads = options["threads"]
+
+        with bench.scratch_database(on_disk=True):
+            bench.seed_catalogue(options["rounds"])
+            bench.seed_guests(threads)
+            users = list(User.objects.order_by("id"))
+            rooms = list(Room.objects.order_by("id"))
+            check_in = date.today() + timedelta(days=30)
+            check_out = check_in + timedelta(days=3)
+
+            for room in rooms:
+                barrier = threading.Barrier(threads)
+                results = []
+
+                def attempt(user):
+                    client = Client()
+                    client.force_login(user)
+                    barrier.wait()
+                    try:
+                        response = client.post(
+                            reverse("book_room", args=[room.id]),
+                            {
+                                "check_in_date": check_in,
+                                "check_out_date": check_out,
+                                "number_of_guests": 1,
+                            },
+                        )
+                        results.append(response.status_code)
+                    except Exception as exc:
+                        results.append(type(exc).__name__)
+                    finally:
+                        connection.close()
+
+                workers = [threading.Thread(target=attempt, args=(user,)) for user in users]
+                started = time.perf_counter()
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                elapsed = time.perf_counter() - started
+
+                winners = Booking.objects.filter(room=room).count()
+                nights = RoomNight.objects.filter(room=room).count()
+                errors = [r for r in results if r not in (200, 302)]
+                self.stdout.write(
+                    f"Room {room.room_number}: {threads} requests in {elapsed * 1000:.0f} ms, "
+                    f"{winners} booking(s), {nights} night(s) sold, {len(errors)} error(s) {errors or ''}"
+                )
+                if winners != 1 or nights != (check_out - check_in).days:
+                    self.stderr.write(self.style.ERROR("Double booking detected!"))
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+
+from hotel import bench, fragments
+from hotel.models import Room
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the room list cards for many rooms without the fragment "
+        "cache, from a cold cache and from a warm one, and report timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=500)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with bench.scratch_database():
+            bench.seed_catalogue(options["rooms"])
+            rooms = list(Room.objects.select_related("room_type").order_by("room_number"))
+            cache = caches[settings.FRAGMENT_CACHE_ALIAS]
+
+            self.stdout.write(f"{len(rooms)} room cards, {options['repeat']} renders each\n")
+            self.stdout.write(f"{'mode':<10} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+
+            def cold():
+                cache.clear()
+                fragments.render_room_cards(rooms, authenticated=True)
+
+            for name, render in (
+                ("uncached", lambda: self.render_uncached(rooms)),
+                ("cold", cold),
+                ("warm", lambda: fragments.render_room_cards(rooms, authenticated=True)),
+            ):
+                samples = [bench.timed(render)[1] for _ in range(options["repeat"])]
+                summary = bench.summarize(samples)
+                self.stdout.write(
+                    f"{name:<10} {summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} {summary['max_ms']:>8.2f}"
+                )
+
+    def render_uncached(self, rooms):
+        """Every card rendered in full, as the template loop did before."""
+        heading = get_template("hotel/includes/room_type_heading.html")
+        details = get_template("hotel/includes/room_type_details.html")
+        card = get_template("hotel/includes/room_card.html")
+        return "".join(
+            card.render({
+                "room": room,
+                "heading": heading.render({"room_type": room.room_type}),
+                "details": details.render({"room_type": room.room_type}),
+                "authenticated": True,
+            })
+            for room in rooms
+        )
@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection
+
+from hotel import bench, services
+from hotel.availability import booked_rooms_query
+from hotel.models import Booking, Room, RoomReview
+
+# Stock Django SQLite (rollback journal, DEFERRED transactions) against the
+# settings in hotel_management.settings.
+MODES = {
+    "baseline": {"journal_mode": "DELETE"},
+    "tuned": settings.DATABASES["default"]["OPTIONS"],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Run concurrent readers and booking writers against an on-disk SQLite "
+        "database, once with stock settings and once with WAL, busy_timeout "
+        "and queued IMMEDIATE transactions, and report throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5, help="Duration of each run.")
+        parser.add_argument("--rooms", type=int, default=200)
+        parser.add_argument("--bookings", type=int, default=20000, help="Booking history to seed.")
+        parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=["baseline", "tuned"])
+
+    def handle(self, *args, **options):
+        database = settings.DATABASES["default"]
+        configured = database.get("OPTIONS", {})
+        self.stdout.write(
+            f"{'mode':>9} {'reads/s':>9} {'read p95':>9} {'writes/s':>9} {'write p95':>10} "
+            f"{'retries':>8} {'failed':>7} {'errors':>7}"
+        )
+        try:
+            for mode in options["modes"]:
+                # Connections opened from here on (the scratch database's and
+                # the workers') pick these up.
+                database["OPTIONS"] = dict(MODES[mode])
+                connection.close()
+                with bench.scratch_database(on_disk=True):
+                    self.run_mode(mode, options)
+        finally:
+            database["OPTIONS"] = configured
+            connection.close()
+
+    def run_mode(self, mode, options):
+        workers = options["readers"] + options["writers"]
+        room_ids = bench.seed_catalogue(options["rooms"])
+        guest_ids = bench.seed_guests(workers)
+        bench.seed_bookings(options["bookings"], room_ids, guest_ids)
+        users = list(User.objects.order_by("id"))
+        rooms = list(Room.objects.order_by("id"))
+        connection.close()
+
+        services.retry_stats.reset()
+        lock = threading.Lock()
+        reads, writes, errors = [], [], [0]
+        barrier = threading.Barrier(workers)
+        deadline = [0]
+
+        def read(worker):
+            rng = random.Random(worker)
+            user = users[worker]
+            samples, failed = [], 0
+            barrier.wait()
+            try:
+                while time.perf_counter() < deadline[0]:
+                    started = time.perf_counter()
+                    try:
+                        # My Bookings, a room's reviews and an availability search
+                        list(Booking.objects.filter(guest=user).order_by("-created_at", "id")[:20])
+                        list(RoomReview.objects.filter(room=rng.choice(rooms)).order_by("-created_at")[:10])
+                        check_in = date.today() + timedelta(days=rng.randint(1, 300))
+                        len(booked_rooms_query(check_in, check_in + timedelta(days=3)))
+                    except OperationalError:
+                        failed += 1
+                        continue
+                    samples.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            with lock:
+                reads.extend(samples)
+                errors[0] += failed
+
+        def write(worker):
+            rng = random.Random(worker)
+            user = users[worker]
+            samples, failed = [], 0
+            barrier.wait()
+            try:
+                while time.perf_counter() < deadline[0]:
+                    room = rng.choice(rooms)
+                    check_in = date.today() + timedelta(days=rng.randint(400, 800))
+                    started = time.perf_counter()
+                    try:
+                        booking = services.create_booking(
+                            user, room, check_in, check_in + timedelta(days=rng.randint(1, 4)), 1
+                        )
+                        services.confirm_booking(booking.id, user, "cash")
+                    except (services.RoomUnavailable, services.BookingConflict):
+                        pass
+                    except OperationalError:
+                        failed += 1
+                        continue
+                    samples.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            with lock:
+                writes.extend(samples)
+                errors[0] += failed
+
+        threads = [
+            threading.Thread(target=read, args=(i,)) for i in range(options["readers"])
+        ] + [
+            threading.Thread(target=write, args=(options["readers"] + i,)) for i in range(options["writers"])
+        ]
+        deadline[0] = time.perf_counter() + options["seconds"] + 0.5
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        def p95(samples):
+            return bench.summarize(samples)["p95_ms"] if samples else float("nan")
+
+        self.stdout.write(
+            f"{mode:>9} {len(reads) / elapsed:>9.1f} {p95(reads):>9.1f} "
+            f"{len(writes) / elapsed:>9.1f} {p95(writes):>10.1f} "
+            f"{services.retry_stats.retries:>8} {services.retry_stats.failures:>7} {errors[0]:>7}"
+        )
@@ -0,0 +1,205 @@
+import json
+import platform
+import random
+import resource
+import subprocess
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from hotel import bench
+from hotel.availability import index as availability_index
+from hotel.models import DashboardStats, Payment, Room
+
+VIEWS = [
+    "home", "room_list", "room_search", "room_detail",
+    "make_booking", "payment", "my_bookings", "admin_dashboard",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a scratch database and drive every hot view through the test "
+        "client; print p50/p95/p99 latency, queries per request and peak "
+        "memory per view as JSON for comparing commits."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rooms", type=int, default=200)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--bookings", type=int, default=20000)
+        parser.add_argument("--reviews", type=int, default=5000)
+        parser.add_argument("--requests", type=int, default=200, help="Measured requests per view.")
+        parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per view first.")
+        parser.add_argument(
+            "--memory-samples", type=int, default=5,
+            help="Requests per view run again under tracemalloc for the peak memory figure.",
+        )
+        parser.add_argument("--views", nargs="+", choices=VIEWS, default=VIEWS)
+        parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+
+    def handle(self, *args, **options):
+        with bench.scratch_database(on_disk=True):
+            seeded = self.seed(options)
+            guest = User.objects.get(username="guest0")
+            staff = User.objects.create_user("bench-staff", is_staff=True)
+            self.guest_client = Client()
+            self.guest_client.force_login(guest)
+            self.staff_client = Client()
+            self.staff_client.force_login(staff)
+            self.rng = random.Random(0)
+            self.prices = dict(Room.objects.values_list("id", "room_type__price_per_night"))
+            self.room_ids = list(self.prices)
+            self.stays = iter(bench.random_stays(10 ** 6, horizon=60))
+            # make_booking books distinct future nights; payment pays for them
+            self.next_night = date.today() + timedelta(days=400)
+            self.pending = []
+
+            for cache in caches.all():
+                cache.clear()
+            availability_index.invalidate()
+
+            results = {}
+            for name in VIEWS:
+                if name in options["views"]:
+                    results[name] = self.measure(name, options)
+
+        report = {
+            "commit": self.commit(),
+            "created_at": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": settings.DATABASES["default"]["ENGINE"],
+            "seed": seeded,
+            "requests_per_view": options["requests"],
+            "views": results,
+            "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+            self.print_table(results)
+        else:
+            self.stdout.write(output)
+
+    def seed(self, options):
+        room_ids = bench.seed_catalogue(options["rooms"])
+        guest_ids = bench.seed_guests(options["users"])
+        bench.seed_bookings(options["bookings"], room_ids, guest_ids)
+        bench.seed_payments()
+        reviews = bench.seed_reviews(options["reviews"], room_ids, guest_ids)
+        DashboardStats.rebuild()
+        return {
+            "rooms": len(room_ids),
+            "room_types": len(bench.ROOM_TYPES),
+            "users": len(guest_ids),
+            "bookings": options["bookings"],
+            "payments": Payment.objects.count(),
+            "reviews": reviews,
+        }
+
+    # REQUESTS
+
+    def request(self, name):
+        """Send one request for ``name``; return ``(response, expected_status)``."""
+        guest = self.guest_client
+        if name == "home":
+            return guest.get(reverse("home")), 200
+        if name == "room_list":
+            return guest.get(reverse("room_list")), 200
+        if name == "room_search":
+            check_in, check_out = next(self.stays)
+            return guest.get(reverse("room_list"), {
+                "check_in": check_in, "check_out": check_out, "guests": self.rng.randint(1, 4),
+            }), 200
+        if name == "room_detail":
+            return guest.get(reverse("room_detail", args=[self.rng.choice(self.room_ids)])), 200
+        if name == "make_booking":
+            check_in = self.next_night
+            self.next_night += timedelta(days=3)
+            room_id = self.rng.choice(self.room_ids)
+            response = guest.post(reverse("book_room", args=[room_id]), {
+                "check_in_date": check_in,
+                "check_out_date": check_in + timedelta(days=2),
+                "number_of_guests": 1,
+            })
+            if response.status_code == 302:
+                booking_id = int(response.url.rstrip("/").rsplit("/", 1)[1])
+                self.pending.append((booking_id, self.prices[room_id] * 2))
+            return response, 302
+        if name == "payment":
+            if not self.pending:
+                raise RuntimeError("payment needs the bookings made by make_booking")
+            booking_id, amount = self.pending.pop()
+            return guest.post(reverse("payment", args=[booking_id]), {
+                "payment_method": "cash", "amount": amount,
+            }), 302
+        if name == "my_bookings":
+            return guest.get(reverse("my_bookings")), 200
+        if name == "admin_dashboard":
+            return self.staff_client.get(reverse("admin_dashboard")), 200
+        raise ValueError(name)
+
+    def measure(self, name, options):
+        for _ in range(options["warmup"]):
+            self.request(name)
+
+        latencies, queries, errors = [], [], 0
+        for _ in range(options["requests"]):
+            started = time.perf_counter()
+            response, expected = self.request(name)
+            latencies.append(time.perf_counter() - started)
+            queries.append(len(response.wsgi_request.query_log))
+            errors += response.status_code != expected
+
+        # Separate pass: tracing slows requests down too much to time them
+        peak = 0
+        tracemalloc.start()
+        try:
+            for _ in range(options["memory_samples"]):
+                tracemalloc.reset_peak()
+                self.request(name)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+        summary = bench.summarize(latencies)
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            **{key: round(value, 3) for key, value in summary.items() if key != "count"},
+            "queries_mean": round(sum(queries) / len(queries), 2),
+            "queries_max": max(queries),
+            "peak_memory_kib": round(peak / 1024, 1),
+        }
+
+    # REPORT
+
+    def commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def print_table(self, results):
+        self.stdout.write(
+            f"{'view':<16} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'peak KiB':>9} {'errors':>7}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<16} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                f"{result['queries_mean']:>8.1f} {result['peak_memory_kib']:>9.1f} {result['errors']:>7}"
+            )
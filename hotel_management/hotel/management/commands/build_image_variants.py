@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from hotel import fragments, images
+from hotel.catalogue import catalogue
+from hotel.models import RoomType
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate resized WebP/JPEG variants of room type uploads and of the "
+        "static fallback images."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--missing", action="store_true",
+            help="Only room types whose variants have not been built yet.",
+        )
+
+    def handle(self, *args, **options):
+        manifest = images.build_static_variants()
+        self.stdout.write(f"Static images: {len(manifest)} processed.")
+
+        room_types = RoomType.objects.exclude(image="").exclude(image__isnull=True)
+        if options["missing"]:
+            room_types = room_types.filter(image_variants={})
+
+        built = failed = 0
+        for room_type in room_types.iterator():
+            try:
+                images.build_room_type_variants(room_type)
+                built += 1
+            except (OSError, ValueError) as exc:
+                failed += 1
+                self.stderr.write(f"{room_type.name}: {exc}")
+
+        # Cards and the catalogue hold image URLs, and
+        # build_room_type_variants skips signals
+        fragments.invalidate_all()
+        catalogue.invalidate_everywhere()
+        self.stdout.write(self.style.SUCCESS(
+            f"Room type images: {built} built, {failed} failed."
+        ))
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from hotel import holds
+
+
+class Command(BaseCommand):
+    help = (
+        "Cancel pending bookings whose hold has expired and give their "
+        "nights back. Run it from cron, or keep it running with --every."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--every", type=float, metavar="SECONDS",
+            help="Sweep again every SECONDS instead of exiting after one sweep.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            cancelled = holds.sweep(batch_size=options["batch_size"])
+            elapsed = time.perf_counter() - started
+            if cancelled or not options["every"]:
+                self.stdout.write(f"Expired {cancelled} holds in {elapsed * 1000:.0f} ms.")
+            if not options["every"]:
+                return
+            # Do not keep a connection open between sweeps
+            connection.close()
+            time.sleep(options["every"])
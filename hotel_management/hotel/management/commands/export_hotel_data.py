@@ -0,0 +1,45 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel import exports
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream bookings (by check-in date) or payments (by payment date) "
+        "between two dates, inclusive, as CSV or NDJSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(exports.EXPORTS))
+        parser.add_argument("start", type=date.fromisoformat, help="First day, YYYY-MM-DD.")
+        parser.add_argument("end", type=date.fromisoformat, help="Last day, YYYY-MM-DD.")
+        parser.add_argument("--format", choices=sorted(exports.FORMATS), default="csv")
+        parser.add_argument("--gzip", action="store_true", help="Compress the output.")
+        parser.add_argument(
+            "-o", "--output",
+            help="File to write; defaults to a file named after the export, '-' for stdout.",
+        )
+
+    def handle(self, *args, **options):
+        kind, start, end = options["kind"], options["start"], options["end"]
+        fmt, compress = options["format"], options["gzip"]
+        if end < start:
+            raise CommandError("End date must not be before start date.")
+
+        path = options["output"] or exports.filename(kind, start, end, fmt, compress)
+        blocks = exports.stream(kind, start, end, fmt, compress)
+        if path == "-":
+            for block in blocks:
+                sys.stdout.buffer.write(block)
+            sys.stdout.buffer.flush()
+            return
+
+        written = 0
+        with open(path, "wb") as f:
+            for block in blocks:
+                f.write(block)
+                written += len(block)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written:,} bytes to {path}."))
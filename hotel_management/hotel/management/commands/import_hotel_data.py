@@ -0,0 +1,75 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hotel.importing import IMPORTERS, import_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk import room types, rooms or historical bookings from a CSV or "
+        "JSON Lines file. Rows are validated one by one and written in batches; "
+        "invalid rows are skipped and reported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(IMPORTERS), help="What the file contains.")
+        parser.add_argument("path", help="CSV file with a header row, or .jsonl with one object per line.")
+        parser.add_argument(
+            "--format", choices=["csv", "jsonl"],
+            help="Input format; guessed from the file extension by default.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows per transaction.")
+        parser.add_argument(
+            "--rejects",
+            help="Write rejected rows with their errors to this JSON Lines file.",
+        )
+        parser.add_argument(
+            "--create-guests", action="store_true",
+            help="Create accounts (with unusable passwords) for unknown booking guests.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        rejects = open(options["rejects"], "w", encoding="utf-8") if options["rejects"] else None
+        started = last = time.perf_counter()
+        done = 0
+
+        def on_rejected(line, row, error):
+            if rejects:
+                rejects.write(json.dumps({"line": line, "row": row, "error": error}, default=str) + "\n")
+            elif options["verbosity"] > 1:
+                self.stderr.write(f"line {line}: {error}")
+
+        def on_batch(accepted, rejected):
+            nonlocal last, done
+            now = time.perf_counter()
+            rate = (accepted + rejected - done) / (now - last) if now > last else 0
+            done, last = accepted + rejected, now
+            self.stdout.write(f"{done} rows read, {accepted} imported, {rejected} rejected ({rate:,.0f} rows/s)")
+
+        try:
+            accepted, rejected = import_file(
+                options["kind"], options["path"],
+                fmt=options["format"],
+                batch_size=options["batch_size"],
+                create_guests=options["create_guests"],
+                on_rejected=on_rejected,
+                on_batch=on_batch,
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc)) from exc
+        finally:
+            if rejects:
+                rejects.close()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {accepted} {options['kind']}, rejected {rejected} "
+            f"in {elapsed:.2f}s ({(accepted + rejected) / elapsed if elapsed else 0:,.0f} rows/s)."
+        ))
+        if rejected and options["rejects"]:
+            self.stdout.write(f"Rejected rows written to {options['rejects']}.")
@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from hotel import audit
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the night audit: expire unpaid holds, complete stays that have "
+        "checked out and bring room status in line with who is in house."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date", type=date.fromisoformat,
+            help="Business date to audit (YYYY-MM-DD); defaults to today.",
+        )
+
+    def handle(self, *args, **options):
+        run = audit.run(options["date"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Night audit for {run.business_date} in {run.duration_ms} ms: "
+            f"{run.holds_expired} holds expired, {run.stays_completed} stays completed, "
+            f"{run.rooms_freed} rooms freed, {run.rooms_occupied} rooms occupied."
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from hotel.models import DashboardStats
+
+
+class Command(BaseCommand):
+    help = "Recompute the admin dashboard counters from the Booking, Payment and Room tables."
+
+    def handle(self, *args, **options):
+        stats = DashboardStats.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Dashboard stats rebuilt: {stats.total_bookings} bookings "
+            f"({stats.confirmed_bookings} confirmed, {stats.cancelled_bookings} cancelled), "
+            f"revenue {stats.total_revenue}, {stats.occupied_rooms} occupied rooms."
+        ))
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:01
+
+import sys
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_room_nights(apps, schema_editor):
+    Booking = apps.get_model("hotel", "Booking")
+    RoomNight = apps.get_model("hotel", "RoomNight")
+
+    # The table is new, so every claim can be checked here before inserting
+    claimed = {}  # (room_id, night) -> booking_id
+    conflicts = []
+    batch = []
+    bookings = Booking.objects.filter(status__in=["confirmed", "pending"]).order_by("created_at", "id")
+    for booking in bookings.iterator(chunk_size=2000):
+        for i in range((booking.check_out_date - booking.check_in_date).days):
+            night = booking.check_in_date + timedelta(days=i)
+            holder = claimed.setdefault((booking.room_id, night), booking.id)
+            if holder != booking.id:
+                # Overlaps that already exist keep the earliest booking's claim
+                conflicts.append((booking.id, holder, booking.room_id, night))
+                continue
+            batch.append(RoomNight(room_id=booking.room_id, night=night, booking_id=booking.id))
+        if len(batch) >= 5000:
+            RoomNight.objects.bulk_create(batch)
+            batch = []
+    RoomNight.objects.bulk_create(batch)
+
+    if conflicts:
+        lines = [
+            f"  booking {booking_id} overlaps booking {holder} in room {room_id} on {night}"
+            for booking_id, holder, room_id, night in conflicts
+        ]
+        sys.stdout.write(
+            f"\n  {len(conflicts)} night(s) of existing bookings overlap an earlier booking "
+            f"and were not claimed; resolve them by hand:\n" + "\n".join(lines) + "\n"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0003_alter_room_floor_number'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomNight',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('night', models.DateField()),
+                ('booking', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_nights', to='hotel.booking')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='room_nights', to='hotel.room')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('room', 'night'), name='unique_room_night')],
+            },
+        ),
+        migrations.RunPython(backfill_room_nights, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:07
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def seed_dashboard_stats(apps, schema_editor):
+    # The counters are only ever adjusted by deltas, so the row must exist
+    # before the first booking after this migration
+    Booking = apps.get_model("hotel", "Booking")
+    Payment = apps.get_model("hotel", "Payment")
+    Room = apps.get_model("hotel", "Room")
+    DashboardStats = apps.get_model("hotel", "DashboardStats")
+
+    bookings = Booking.objects.aggregate(
+        total=Count("id"),
+        confirmed=Count("id", filter=Q(status="confirmed")),
+        cancelled=Count("id", filter=Q(status="cancelled")),
+    )
+    revenue = Payment.objects.filter(status="completed").aggregate(total=Sum("amount"))
+    DashboardStats.objects.create(
+        pk=1,
+        total_bookings=bookings["total"],
+        confirmed_bookings=bookings["confirmed"],
+        cancelled_bookings=bookings["cancelled"],
+        total_revenue=revenue["total"] or 0,
+        occupied_rooms=Room.objects.filter(status="occupied").count(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_bookings', models.IntegerField(default=0)),
+                ('confirmed_bookings', models.IntegerField(default=0)),
+                ('cancelled_bookings', models.IntegerField(default=0)),
+                ('total_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('occupied_rooms', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'dashboard stats',
+            },
+        ),
+        migrations.RunPython(seed_dashboard_stats, migrations.RunPython.noop),
+    ]
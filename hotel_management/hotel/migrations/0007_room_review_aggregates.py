@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:08
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_review_aggregates(apps, schema_editor):
+    Room = apps.get_model("hotel", "Room")
+    RoomReview = apps.get_model("hotel", "RoomReview")
+
+    totals = RoomReview.objects.values("room_id").annotate(
+        review_count=Count("id"),
+        rating_sum=Sum("rating"),
+        **{f"rating_{stars}": Count("id", filter=Q(rating=stars)) for stars in range(1, 6)},
+    )
+    for row in totals.iterator():
+        room_id = row.pop("room_id")
+        Room.objects.filter(pk=room_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0006_dashboardstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_review_aggregates, migrations.RunPython.noop),
+    ]
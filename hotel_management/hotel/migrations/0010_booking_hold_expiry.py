@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:38
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def hold_existing_pending(apps, schema_editor):
+    # Pending bookings from before holds existed expire a hold's length
+    # after they were made, so long-abandoned ones free their rooms now.
+    Booking = apps.get_model("hotel", "Booking")
+    hold = timedelta(minutes=getattr(settings, "BOOKING_HOLD_MINUTES", 15))
+    Booking.objects.filter(status="pending").update(hold_expires_at=F("created_at") + hold)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0009_roomtype_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'hold_expires_at'], name='booking_hold_expiry_idx'),
+        ),
+        migrations.RunPython(hold_existing_pending, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0010_booking_hold_expiry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NightAuditRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('business_date', models.DateField()),
+                ('started_at', models.DateTimeField()),
+                ('duration_ms', models.PositiveIntegerField()),
+                ('holds_expired', models.PositiveIntegerField(default=0)),
+                ('stays_completed', models.PositiveIntegerField(default=0)),
+                ('rooms_freed', models.PositiveIntegerField(default=0)),
+                ('rooms_occupied', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'check_out_date'], name='booking_status_checkout_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='nightauditrun',
+            index=models.Index(fields=['business_date'], name='night_audit_date_idx'),
+        ),
+    ]
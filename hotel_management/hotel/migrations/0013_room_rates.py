@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:00
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hotel', '0012_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('weekdays', models.CharField(blank=True, max_length=7, validators=[django.core.validators.RegexValidator('^[0-6]*$', 'Use the digits 0 (Monday) to 6 (Sunday).')])),
+                ('price_per_night', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('priority', models.IntegerField(default=0)),
+                ('room_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rates', to='hotel.roomtype')),
+            ],
+            options={
+                'ordering': ['room_type', '-priority', 'start_date'],
+            },
+        ),
+    ]
@@ -1,8 +1,26 @@
+import logging
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from datetime import date
-from django.templatetags.static import static
+from django.core.validators import RegexValidator
+from datetime import date, timedelta
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from .images import ResponsiveImage, static_image
+
+logger = logging.getLogger(__name__)
+
+
+def validate_stay_dates(check_in, check_out, allow_past=False):
+    """Date rules shared by ``Booking.clean``, the booking forms and imports."""
+    if check_in is None or check_out is None:
+        return
+    if not allow_past and check_in < date.today():
+        raise ValidationError("Check-in date cannot be in the past.")
+    if check_out <= check_in:
+        raise ValidationError("Check-out date must be after check-in date.")
 
 
 class RoomType(models.Model):
@@ -15,32 +33,84 @@ class RoomType(models.Model):
     # Image uploaded from admin (optional)
     image = models.ImageField(upload_to="room_types/", null=True, blank=True)
 
+    # Resized copies of ``image``, see hotel.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
     is_active = models.BooleanField(default=True)
 
-    # SAFE IMAGE URL (NO ERRORS)
     @property
-    def image_url(self):
-        # If admin uploaded image → use it
-        if self.image:
-            return self.image.url
-
-        # 2Fallback images based on room type name
+    def fallback_image(self):
+        """Static image used when no image was uploaded, by room type name."""
         name = self.name.lower()
 
         if "standard" in name:
-            return static("images/standard.jpeg")
+            return "images/standard.jpeg"
         elif "deluxe" in name:
-            return static("images/delux.jpeg")
+            return "images/delux.jpeg"
         elif "suite" in name:
-            return static("images/suite.jpeg")
+            return "images/suite.jpeg"
 
-        # 3️⃣ Final fallback
-        return static("images/default-room.jpeg")
+        return "images/default-room.jpeg"
+
+    @property
+    def responsive_image(self):
+        """The uploaded or fallback image with its resized variants."""
+        if self.image:
+            return ResponsiveImage(self.image.url, self.image_variants)
+        return static_image(self.fallback_image)
+
+    # SAFE IMAGE URL (NO ERRORS)
+    @property
+    def image_url(self):
+        # Card-sized variant when one exists, else the original
+        return self.responsive_image.src
 
     def __str__(self):
         return self.name
 
 
+class RoomRate(models.Model):
+    """A nightly price for a room type over a date range and/or on weekdays.
+
+    Nights no rate covers cost ``RoomType.price_per_night``. Where rates
+    overlap, the highest ``priority`` wins, then one limited to weekdays
+    over an every-day one, then the newest; see ``hotel.rates``.
+    """
+    room_type = models.ForeignKey(RoomType, on_delete=models.CASCADE, related_name="rates")
+    name = models.CharField(max_length=100, blank=True)
+
+    # Inclusive; open-ended when empty
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+
+    # Digits of the weekdays it applies on, Monday=0 ("45" is Friday and
+    # Saturday nights); every night when empty
+    weekdays = models.CharField(
+        max_length=7, blank=True,
+        validators=[RegexValidator(r"^[0-6]*$", "Use the digits 0 (Monday) to 6 (Sunday).")],
+    )
+
+    price_per_night = models.DecimalField(max_digits=10, decimal_places=2)
+    priority = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["room_type", "-priority", "start_date"]
+
+    def clean(self):
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError("End date cannot be before the start date.")
+
+    def applies_on(self, day):
+        return (
+            (self.start_date is None or self.start_date <= day)
+            and (self.end_date is None or day <= self.end_date)
+            and (not self.weekdays or str(day.weekday()) in self.weekdays)
+        )
+
+    def __str__(self):
+        return f"{self.room_type.name} - {self.name or 'Rate'} ({self.price_per_night})"
+
+
 class Room(models.Model):
     ROOM_STATUS = [
         ('available', 'Available'),
@@ -60,6 +130,54 @@ class Room(models.Model):
 
     is_active = models.BooleanField(default=True)
 
+    # Review aggregates, maintained by the RoomReview signals in hotel.signals
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+
+    REVIEW_FIELDS = [
+        "review_count", "rating_sum",
+        "rating_1", "rating_2", "rating_3", "rating_4", "rating_5",
+    ]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status"], name="room_status_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Never write back review aggregates read earlier: reviews update them
+        # concurrently with F() expressions.
+        if self.pk and not self._state.adding and kwargs.get("update_fields") is None:
+            kwargs["update_fields"] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.REVIEW_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def average_rating(self):
+        if not self.review_count:
+            return None
+        return self.rating_sum / self.review_count
+
+    @property
+    def rating_histogram(self):
+        """``(stars, count, percent)`` for 5 down to 1 stars."""
+        return [
+            (
+                stars,
+                getattr(self, f"rating_{stars}"),
+                round(100 * getattr(self, f"rating_{stars}") / self.review_count)
+                if self.review_count else 0,
+            )
+            for stars in range(5, 0, -1)
+        ]
+
     def __str__(self):
         return f"Room {self.room_number}"
 
@@ -72,6 +190,9 @@ class Booking(models.Model):
         ('completed', 'Completed'),
     ]
 
+    # Statuses that hold the room for the booked nights
+    BLOCKING_STATUSES = ["confirmed", "pending"]
+
     guest = models.ForeignKey(User, on_delete=models.CASCADE)
     room = models.ForeignKey(Room, on_delete=models.CASCADE)
 
@@ -88,16 +209,90 @@ class Booking(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Bumped on every status change; used for optimistic concurrency control
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    # A pending booking stops blocking its room after this; see hotel.holds
+    hold_expires_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    is_archived = False
+
+    class Meta:
+        indexes = [
+            # Is this room free for these dates?
+            models.Index(
+                fields=["room", "status", "check_in_date", "check_out_date"],
+                name="booking_room_stay_idx",
+            ),
+            # Which rooms are booked for these dates? (room_list search)
+            models.Index(
+                fields=["status", "check_in_date", "check_out_date", "room"],
+                name="booking_status_stay_idx",
+            ),
+            # My Bookings, newest first
+            models.Index(fields=["guest", "-created_at"], name="booking_guest_created_idx"),
+            # Has this guest stayed in this room? (add_review)
+            models.Index(fields=["guest", "room", "status"], name="booking_guest_room_idx"),
+            # Stays that ended by a date (night audit)
+            models.Index(fields=["status", "check_out_date"], name="booking_status_checkout_idx"),
+            # Expired holds (hold sweeper). Not a partial index: SQLite can
+            # only use one when the status is a literal, and Django binds it.
+            models.Index(fields=["status", "hold_expires_at"], name="booking_hold_expiry_idx"),
+        ]
+
     def clean(self):
-        if self.check_in_date < date.today():
-            raise ValidationError("Check-in date cannot be in the past.")
-        if self.check_out_date <= self.check_in_date:
-            raise ValidationError("Check-out date must be after check-in date.")
+        # Only a new (pending) booking has to start in the future; completed
+        # or cancelled history naturally starts in the past.
+        validate_stay_dates(
+            self.check_in_date, self.check_out_date,
+            allow_past=self.status != "pending"
+        )
+
+    @property
+    def hold_expired(self):
+        return (
+            self.status == "pending"
+            and self.hold_expires_at is not None
+            and self.hold_expires_at <= timezone.now()
+        )
+
+    def is_in_house(self, today=None):
+        """Is ``today`` (default: the local date) one of the booked nights?"""
+        today = today or timezone.localdate()
+        return self.check_in_date <= today < self.check_out_date
+
+    @property
+    def nights(self):
+        return (self.check_out_date - self.check_in_date).days
+
+    def night_dates(self):
+        """Each night of the stay, from check-in up to (not including) check-out."""
+        return [self.check_in_date + timedelta(days=i) for i in range(self.nights)]
 
     def __str__(self):
         return f"Booking #{self.id} - {self.guest.username}"
 
 
+class RoomNight(models.Model):
+    """One sold night of one room.
+
+    The unique ``(room, night)`` constraint is what prevents double booking:
+    a booking claims all its nights in one ``bulk_create`` and the database
+    rejects the insert if any of them is already taken.
+    """
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="room_nights")
+    night = models.DateField()
+    booking = models.ForeignKey(Booking, on_delete=models.CASCADE, related_name="room_nights")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["room", "night"], name="unique_room_night"),
+        ]
+
+    def __str__(self):
+        return f"Room {self.room_id} - {self.night}"
+
+
 class Payment(models.Model):
     PAYMENT_STATUS = [
         ('pending', 'Pending'),
@@ -136,10 +331,75 @@ class Payment(models.Model):
         blank=True
     )
 
+    class Meta:
+        indexes = [
+            # Revenue is summed over completed payments only
+            models.Index(
+                fields=["amount"],
+                condition=models.Q(status="completed"),
+                name="payment_completed_amount_idx",
+            ),
+        ]
+
     def __str__(self):
         return f"Payment for Booking #{self.booking.id}"
 
 
+# ARCHIVE
+# Bookings that ended long ago, with their payments, are moved here by
+# hotel.archive so the hot tables only hold recent and active rows. Ids are
+# kept, so links and references to an archived booking stay valid.
+
+class ArchivedBooking(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    guest = models.ForeignKey(User, on_delete=models.CASCADE)
+    room = models.ForeignKey(Room, on_delete=models.CASCADE)
+
+    check_in_date = models.DateField()
+    check_out_date = models.DateField()
+    number_of_guests = models.PositiveIntegerField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20, choices=Booking.BOOKING_STATUS)
+    created_at = models.DateTimeField()
+
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    is_archived = True
+    nights = Booking.nights
+
+    class Meta:
+        indexes = [
+            # My Bookings, newest first
+            models.Index(fields=["guest", "-created_at"], name="archived_guest_created_idx"),
+            # Has this guest stayed in this room? (add_review)
+            models.Index(fields=["guest", "room", "status"], name="archived_guest_room_idx"),
+            # Exports by stay date
+            models.Index(fields=["check_in_date"], name="archived_check_in_idx"),
+        ]
+
+    def __str__(self):
+        return f"Archived booking #{self.id}"
+
+
+class ArchivedPayment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    booking = models.OneToOneField(ArchivedBooking, on_delete=models.CASCADE)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    payment_date = models.DateTimeField()
+    payment_method = models.CharField(max_length=20, choices=Payment.PAYMENT_METHOD)
+    status = models.CharField(max_length=20, choices=Payment.PAYMENT_STATUS)
+    transaction_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Exports by payment date
+            models.Index(fields=["payment_date"], name="archived_payment_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"Archived payment for booking #{self.booking_id}"
+
+
 class RoomReview(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name="reviews")
@@ -154,3 +414,91 @@ class RoomReview(models.Model):
 
     def __str__(self):
         return f"{self.room.room_number} - {self.rating}⭐"
+
+
+class DashboardStats(models.Model):
+    """Running totals for the admin dashboard, kept in a single row.
+
+    The ``hotel.signals`` handlers apply +/- deltas as bookings, payments
+    and rooms change, so the dashboard reads one row instead of counting
+    whole tables. The row is created by migration 0006. ``rebuild()``
+    recomputes everything from scratch (``manage.py rebuild_dashboard_stats``);
+    it scans every booking and payment, so it never runs on a write.
+    """
+    total_bookings = models.IntegerField(default=0)
+    confirmed_bookings = models.IntegerField(default=0)
+    cancelled_bookings = models.IntegerField(default=0)
+    total_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    occupied_rooms = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "dashboard stats"
+
+    SINGLETON_ID = 1
+
+    @classmethod
+    def load(cls):
+        stats = cls.objects.filter(pk=cls.SINGLETON_ID).first()
+        return stats or cls.rebuild()
+
+    @classmethod
+    def apply(cls, **deltas):
+        """Add ``deltas`` to the counters in one ``UPDATE``."""
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        updated = cls.objects.filter(pk=cls.SINGLETON_ID).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+        if not updated:
+            # Deleted by hand: the next load() recounts everything
+            logger.warning("Dashboard stats row is missing; dropped %s", deltas)
+
+    @classmethod
+    def rebuild(cls):
+        # Totals cover archived history too; archived bookings are never confirmed
+        bookings = Booking.objects.aggregate(
+            total=Count("id"),
+            confirmed=Count("id", filter=Q(status="confirmed")),
+            cancelled=Count("id", filter=Q(status="cancelled")),
+        )
+        archived = ArchivedBooking.objects.aggregate(
+            total=Count("id"),
+            cancelled=Count("id", filter=Q(status="cancelled")),
+        )
+        revenue = Payment.objects.filter(status="completed").aggregate(total=Sum("amount"))
+        archived_revenue = ArchivedPayment.objects.filter(status="completed").aggregate(total=Sum("amount"))
+        stats, _ = cls.objects.update_or_create(pk=cls.SINGLETON_ID, defaults={
+            "total_bookings": bookings["total"] + archived["total"],
+            "confirmed_bookings": bookings["confirmed"],
+            "cancelled_bookings": bookings["cancelled"] + archived["cancelled"],
+            "total_revenue": (revenue["total"] or 0) + (archived_revenue["total"] or 0),
+            "occupied_rooms": Room.objects.filter(status="occupied").count(),
+        })
+        return stats
+
+    def __str__(self):
+        return "Dashboard stats"
+
+
+class NightAuditRun(models.Model):
+    """One run of the night audit (``hotel.audit``) and what it changed."""
+    business_date = models.DateField()
+    started_at = models.DateTimeField()
+    duration_ms = models.PositiveIntegerField()
+
+    holds_expired = models.PositiveIntegerField(default=0)
+    stays_completed = models.PositiveIntegerField(default=0)
+    rooms_freed = models.PositiveIntegerField(default=0)
+    rooms_occupied = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-started_at"]
+        indexes = [
+            models.Index(fields=["business_date"], name="night_audit_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"Night audit {self.business_date} ({self.duration_ms} ms)"
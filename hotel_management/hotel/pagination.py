@@ -0,0 +1,215 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of ``OFFSET`` the next page is fetched with a ``WHERE`` on the sort
+key of the last row shown, so page 1000 costs the same as page 1. The
+cursor is that sort key, packed into an opaque URL-safe string.
+"""
+import base64
+import json
+from bisect import bisect_right
+from operator import attrgetter
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, items, has_more, next_cursor):
+        self.items = items
+        self.has_more = has_more
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+class KeysetPaginator:
+    """Paginate ``queryset`` on ``ordering``, e.g. ``("-created_at", "id")``.
+
+    The last field of ``ordering`` must be unique so every row has a
+    distinct position.
+    """
+
+    def __init__(self, queryset, ordering, page_size=DEFAULT_PAGE_SIZE):
+        self.queryset = queryset.order_by(*ordering)
+        self.fields = [(name.lstrip("-"), name.startswith("-")) for name in ordering]
+        self.page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+    def page(self, cursor=None):
+        return self._page(list(self._window(cursor)))
+
+    async def apage(self, cursor=None):
+        return self._page([row async for row in self._window(cursor)])
+
+    def _window(self, cursor):
+        queryset = self.queryset
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode(cursor)))
+        # One extra row tells us whether there is a next page without a COUNT(*)
+        return queryset[:self.page_size + 1]
+
+    def _page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        next_cursor = self.encode(rows[-1]) if has_more else None
+        return KeysetPage(rows, has_more, next_cursor)
+
+    def _after(self, values):
+        # (a, b) after (x, y)  ==  a > x  OR  (a = x AND b > y), with the
+        # comparison flipped for descending fields.
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            lookup = "lt" if descending else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return condition
+
+    # CURSORS
+
+    def encode(self, row):
+        return _pack([getattr(row, name) for name, _ in self.fields])
+
+    def decode(self, cursor):
+        model = self.queryset.model
+        values = _unpack(cursor, len(self.fields))
+        try:
+            return [
+                model._meta.get_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, values)
+            ]
+        except Exception as exc:
+            raise InvalidCursor(f"Invalid page cursor: {cursor!r}") from exc
+
+
+class MergedKeysetPaginator(KeysetPaginator):
+    """Keyset pagination over several querysets read as one.
+
+    Each queryset gives at most a page of rows after the cursor and the
+    windows are merged in Python, so a page costs one query per queryset.
+    The last field of ``ordering`` must be unique across all of them.
+    """
+
+    def __init__(self, querysets, ordering, page_size=DEFAULT_PAGE_SIZE):
+        super().__init__(querysets[0], ordering, page_size)
+        self.querysets = [queryset.order_by(*ordering) for queryset in querysets]
+
+    def page(self, cursor=None):
+        after = self._after(self.decode(cursor)) if cursor else Q()
+        rows = []
+        for queryset in self.querysets:
+            rows.extend(queryset.filter(after)[:self.page_size + 1])
+        # Sort on the last field first; stable sorts keep the earlier order
+        for name, descending in reversed(self.fields):
+            rows.sort(key=attrgetter(name), reverse=descending)
+        return self._page(rows)
+
+
+class ListKeysetPaginator:
+    """Keyset pagination of an in-memory list sorted on the unique ``key``.
+
+    Uses the same cursors as ``KeysetPaginator`` on the matching field, so
+    a view can switch between the two without breaking links. Finding the
+    start of a page is a binary search, without building a list of keys.
+    """
+
+    def __init__(self, items, key, page_size=DEFAULT_PAGE_SIZE):
+        self.items = items
+        self.key = key
+        self.page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+
+    def page(self, cursor=None):
+        start = 0
+        if cursor:
+            after = _unpack(cursor, 1)[0]
+            try:
+                start = bisect_right(self.items, after, key=self.key)
+            except TypeError as exc:
+                raise InvalidCursor(f"Invalid page cursor: {cursor!r}") from exc
+        rows = self.items[start:start + self.page_size + 1]
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        next_cursor = _pack([self.key(rows[-1])]) if has_more else None
+        return KeysetPage(rows, has_more, next_cursor)
+
+
+def _pack(values):
+    raw = json.dumps([
+        value.isoformat() if hasattr(value, "isoformat") else value
+        for value in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _unpack(cursor, count):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != count:
+            raise ValueError("wrong number of values")
+        return values
+    except Exception as exc:
+        raise InvalidCursor(f"Invalid page cursor: {cursor!r}") from exc
+
+
+def _page_size(request):
+    try:
+        return int(request.GET.get("page_size", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return DEFAULT_PAGE_SIZE
+
+
+def _paginator(request, queryset, ordering):
+    return KeysetPaginator(queryset, ordering, _page_size(request))
+
+
+def paginate(request, queryset, ordering):
+    """Return the page of ``queryset`` asked for by ``?cursor=&page_size=``.
+
+    A cursor that cannot be decoded falls back to the first page.
+    """
+    paginator = _paginator(request, queryset, ordering)
+    try:
+        return paginator.page(request.GET.get("cursor"))
+    except InvalidCursor:
+        return paginator.page()
+
+
+async def apaginate(request, queryset, ordering):
+    """``paginate`` for async views."""
+    paginator = _paginator(request, queryset, ordering)
+    try:
+        return await paginator.apage(request.GET.get("cursor"))
+    except InvalidCursor:
+        return await paginator.apage()
+
+
+def paginate_merged(request, querysets, ordering):
+    """``paginate`` for rows spread over several querysets of the same shape."""
+    paginator = MergedKeysetPaginator(querysets, ordering, _page_size(request))
+    try:
+        return paginator.page(request.GET.get("cursor"))
+    except InvalidCursor:
+        return paginator.page()
+
+
+def paginate_list(request, items, key):
+    """``paginate`` for a list already sorted on the unique ``key(item)``."""
+    paginator = ListKeysetPaginator(items, key, _page_size(request))
+    try:
+        return paginator.page(request.GET.get("cursor"))
+    except InvalidCursor:
+        return paginator.page()
@@ -0,0 +1,158 @@
+"""
+Nightly rate calendar and stay quotes.
+
+A night costs its room type's ``price_per_night`` unless a ``RoomRate``
+covers it (seasons, weekends, events). Where rates overlap, the highest
+``priority`` wins, then a weekday rate over an every-day one, then the
+newest.
+
+Each worker lays those rules out once as an array of nightly prices in
+cents per active room type, ``settings.RATE_CALENDAR_DAYS`` long from
+today, and keeps the running sums of each array. A stay then costs
+``sums[check_out] - sums[check_in]`` whatever its length, and
+``quote_many`` prices a whole page of search results without a query.
+The calendar is rebuilt when the rates counter (bumped by the RoomRate
+signals) or the catalogue counter moves on, or the day changes. Stays
+beyond the calendar are priced night by night.
+"""
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from hotel_management.replicas import primary
+
+from . import versions
+from .catalogue import catalogue
+from .search_cache import CATALOGUE_VERSION
+
+VERSION = "rates"
+
+
+def _cents(price):
+    return int(price * 100)
+
+
+def _precedence(rate):
+    # Ascending: a rate overrides the ones before it
+    return rate.priority, bool(rate.weekdays), rate.id
+
+
+def nightly_prices(base_cents, rates, start, days):
+    """Price in cents of each of ``days`` nights from ``start``.
+
+    ``rates`` must be in ``_precedence`` order.
+    """
+    prices = [base_cents] * days
+    for rate in rates:
+        first = 0 if rate.start_date is None else max(0, (rate.start_date - start).days)
+        stop = days if rate.end_date is None else min(days, (rate.end_date - start).days + 1)
+        if first >= stop:
+            continue
+        cents = _cents(rate.price_per_night)
+        if not rate.weekdays:
+            prices[first:stop] = [cents] * (stop - first)
+            continue
+        for weekday in {int(digit) for digit in rate.weekdays}:
+            # Every seventh night from the first one on that weekday
+            offset = first + (weekday - (start + timedelta(days=first)).weekday()) % 7
+            prices[offset:stop:7] = [cents] * len(range(offset, stop, 7))
+    return prices
+
+
+class RateCalendar:
+    """Nightly prices of this process, reloaded on version change."""
+
+    VERSION = VERSION
+
+    def __init__(self):
+        self._state = None
+
+    def load(self):
+        from .models import RoomRate
+
+        current = versions.get_many([self.VERSION, CATALOGUE_VERSION])
+        version = (current[self.VERSION], current[CATALOGUE_VERSION])
+        room_types = catalogue.room_types()
+        start = date.today()
+        days = getattr(settings, "RATE_CALENDAR_DAYS", 730)
+
+        # Kept until the next version bump, so never from a lagging replica
+        with primary():
+            rates = RoomRate.objects.filter(room_type_id__in=[room_type.id for room_type in room_types])
+            by_type = defaultdict(list)
+            for rate in sorted(rates, key=_precedence):
+                by_type[rate.room_type_id].append(rate)
+
+        base = {room_type.id: _cents(room_type.price_per_night) for room_type in room_types}
+        sums = {
+            room_type_id: list(accumulate(nightly_prices(cents, by_type[room_type_id], start, days), initial=0))
+            for room_type_id, cents in base.items()
+        }
+        self._state = _State(version, start, base, dict(by_type), sums)
+        return self._state
+
+    def invalidate(self):
+        self._state = None
+
+    def invalidate_everywhere(self):
+        """Make every worker rebuild, e.g. after writes that skip signals."""
+        versions.bump(self.VERSION)
+        self.invalidate()
+
+    def _current(self):
+        state = self._state
+        if state is None or state.start != date.today():
+            return self.load()
+        current = versions.get_many([self.VERSION, CATALOGUE_VERSION])
+        if (current[self.VERSION], current[CATALOGUE_VERSION]) != state.version:
+            state = self.load()
+        return state
+
+    # QUOTES
+
+    def quote(self, room_type_id, check_in, check_out):
+        """Total price of the nights from ``check_in`` to ``check_out``."""
+        return self.quote_many([(room_type_id, check_in, check_out)])[0]
+
+    def quote_many(self, stays):
+        """Totals of ``(room_type_id, check_in, check_out)`` stays, in order."""
+        state = self._current()
+        totals = {}
+        for stay in stays:
+            if stay in totals:
+                continue
+            room_type_id, check_in, check_out = stay
+            sums = state.sums.get(room_type_id)
+            first, stop = (check_in - state.start).days, (check_out - state.start).days
+            if sums is not None and 0 <= first <= stop < len(sums):
+                cents = sums[stop] - sums[first]
+            else:
+                cents = self._night_by_night(state, room_type_id, check_in, check_out)
+            totals[stay] = Decimal(cents).scaleb(-2)
+        return [totals[stay] for stay in stays]
+
+    def _night_by_night(self, state, room_type_id, check_in, check_out):
+        from .models import RoomType
+
+        if room_type_id in state.base:
+            base, rates = state.base[room_type_id], state.rates.get(room_type_id, [])
+        else:
+            # Not in the catalogue (inactive): read it directly
+            room_type = RoomType.objects.get(pk=room_type_id)
+            base, rates = _cents(room_type.price_per_night), sorted(room_type.rates.all(), key=_precedence)
+        nights = (check_out - check_in).days
+        return sum(nightly_prices(base, rates, check_in, nights))
+
+
+_State = namedtuple("_State", "version start base rates sums")
+
+calendar = RateCalendar()
+
+
+def stay_totals(rooms, check_in, check_out):
+    """``{room_type_id: total}`` for a stay in each of ``rooms``."""
+    room_type_ids = sorted({room.room_type_id for room in rooms})
+    totals = calendar.quote_many([(room_type_id, check_in, check_out) for room_type_id in room_type_ids])
+    return dict(zip(room_type_ids, totals))
@@ -0,0 +1,126 @@
+"""
+Room search result cache.
+
+Results of a ``RoomSearchForm`` search (the ids of the rooms free for the
+dates and party size) are cached per normalized ``(check_in, check_out,
+guests)``. Each entry records the version of every night it covers plus
+the version of the room catalogue. A booking change bumps only the
+versions of its own nights, so exactly the entries whose date range
+overlaps that booking go stale; everything else keeps hitting.
+
+A result can also change with no write at all: when a hold that hides a
+room runs out (see ``hotel.holds``). So an entry also records when the
+first such hold expires and is a miss from then on.
+
+The backend is the cache named by ``settings.SEARCH_CACHE_ALIAS``; its
+``TIMEOUT`` and ``MAX_ENTRIES`` give TTL and LRU eviction.
+"""
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from . import versions
+
+CATALOGUE_VERSION = "rooms"
+
+
+def _cache():
+    return caches[getattr(settings, "SEARCH_CACHE_ALIAS", "default")]
+
+
+def night_versions(check_in, check_out):
+    """Counter of each night of a stay, bumped when a booking on it changes."""
+    return [
+        f"night:{(check_in + timedelta(days=i)).isoformat()}"
+        for i in range((check_out - check_in).days)
+    ]
+
+
+def version_names(check_in, check_out):
+    """Counters a search for this stay depends on: its nights and the catalogue."""
+    return night_versions(check_in, check_out) + [CATALOGUE_VERSION]
+
+
+def search_key(check_in, check_out, guests):
+    return f"room-search:{check_in.isoformat()}:{check_out.isoformat()}:{int(guests or 0)}"
+
+
+# ``expires``: when the result runs out whatever the counters say, or None.
+# ``changed_at``: when it last did so, if the result was computed again at
+# the same counters because of that; for HTTP ``Last-Modified``.
+SearchResult = namedtuple("SearchResult", "room_ids expires changed_at")
+
+
+def cached_search(check_in, check_out, guests, compute):
+    """Return the ``SearchResult`` for a search, calling ``compute()`` on a miss.
+
+    ``compute()`` returns the room ids and when the earliest hold behind
+    them expires (None if none does).
+
+    Versions are read before ``compute`` runs, so a booking that commits
+    while the result is being computed leaves the stored entry stale
+    instead of hiding its own change.
+    """
+    cache = _cache()
+    key = search_key(check_in, check_out, guests)
+    current = versions.get_many(version_names(check_in, check_out))
+    now = timezone.now()
+
+    entry = cache.get(key)
+    changed_at = None
+    if entry is not None and entry["versions"] == current:
+        if entry["expires"] is None or now < entry["expires"]:
+            _count("hits")
+            return SearchResult(entry["room_ids"], entry["expires"], entry["changed_at"])
+        changed_at = entry["expires"]
+
+    _count("misses")
+    room_ids, expires = compute()
+    room_ids = list(room_ids)
+    cache.set(key, {"versions": current, "room_ids": room_ids, "expires": expires, "changed_at": changed_at})
+    return SearchResult(room_ids, expires, changed_at)
+
+
+# INVALIDATION
+
+def invalidate_stay(check_in, check_out):
+    """Expire every cached search overlapping the nights of a stay."""
+    versions.bump(*night_versions(check_in, check_out))
+
+
+def invalidate_stays(stays):
+    """``invalidate_stay`` for many ``(check_in, check_out)``, each night bumped once."""
+    names = set()
+    for check_in, check_out in stays:
+        names.update(night_versions(check_in, check_out))
+    versions.bump(*names)
+
+
+def invalidate_all():
+    """Expire every cached search (rooms or room types changed)."""
+    versions.bump(CATALOGUE_VERSION)
+
+
+# STATS
+
+def _count(name):
+    cache = _cache()
+    try:
+        cache.incr(f"room-search-stats:{name}")
+    except ValueError:
+        cache.add(f"room-search-stats:{name}", 1, timeout=None)
+
+
+def stats():
+    cache = _cache()
+    hits = cache.get("room-search-stats:hits", 0)
+    misses = cache.get("room-search-stats:misses", 0)
+    total = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / total if total else 0.0,
+    }
@@ -0,0 +1,212 @@
+"""
+Booking engine.
+
+Creating, confirming and cancelling a booking each touch several rows
+(booking, room nights, payment, room). Every operation here runs as one
+transaction so a request can never leave them half-updated.
+
+Concurrency control depends on the backend:
+
+* where ``SELECT ... FOR UPDATE`` is supported the booking (and room) rows
+  are locked before they are changed;
+* on SQLite, which has no row locks, the booking row carries a ``version``
+  and is only updated if nobody changed it since it was read.
+
+Conflicts (a stale version, a locked database, a serialization failure)
+are retried a few times with exponential backoff and jitter before giving
+up with ``BookingConflict``.
+"""
+import functools
+import random
+import threading
+import time
+import uuid
+
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+
+from . import rates
+from .holds import hold_expiry
+from .inventory import RoomUnavailable, reserve_nights, release_nights
+from .models import Room, Booking, Payment
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 0.01  # seconds
+BACKOFF_MAX = 0.2
+
+
+class BookingError(Exception):
+    pass
+
+
+class BookingConflict(BookingError):
+    """The booking kept changing underneath us; retries ran out."""
+
+
+class InvalidTransition(BookingError):
+    """The booking is not in a state that allows this operation."""
+
+
+class _StaleVersion(Exception):
+    pass
+
+
+# RETRIES
+
+class RetryStats:
+    """Process-wide counters, read by the contention benchmark."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.failures = 0
+
+    def record(self, retried=0, failed=False):
+        with self._lock:
+            self.retries += retried
+            self.failures += int(failed)
+
+    def reset(self):
+        with self._lock:
+            self.retries = 0
+            self.failures = 0
+
+
+retry_stats = RetryStats()
+
+
+def retry_on_conflict(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Inside an outer transaction a retry would replay a doomed
+        # transaction; let the caller deal with the conflict instead.
+        attempts = 1 if connection.in_atomic_block else MAX_ATTEMPTS
+        for attempt in range(attempts):
+            try:
+                result = func(*args, **kwargs)
+                retry_stats.record(retried=attempt)
+                return result
+            except (_StaleVersion, OperationalError) as exc:
+                error = exc
+                if attempt + 1 < attempts:
+                    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+                    time.sleep(delay * random.uniform(0.5, 1.5))
+        retry_stats.record(retried=attempts - 1, failed=True)
+        raise BookingConflict("The booking was changed by another request, please try again.") from error
+    return wrapper
+
+
+# LOCKING
+
+def _can_lock():
+    return connection.features.has_select_for_update
+
+
+def _load_booking(booking_id, guest=None):
+    """Read the booking inside the current transaction, locked if possible."""
+    bookings = Booking.objects.all()
+    if _can_lock():
+        bookings = bookings.select_for_update()
+    if guest is not None:
+        bookings = bookings.filter(guest=guest)
+    return bookings.get(pk=booking_id)
+
+
+def _claim(booking):
+    """Bump the version only if the row is still the one we read."""
+    claimed = Booking.objects.filter(
+        pk=booking.pk, version=booking.version
+    ).update(version=F("version") + 1)
+    if not claimed:
+        raise _StaleVersion()
+    booking.version += 1
+
+
+def _set_room_status(room_id, status):
+    rooms = Room.objects.all()
+    if _can_lock():
+        rooms = rooms.select_for_update()
+    room = rooms.get(pk=room_id)
+    if room.status != status:
+        room.status = status
+        room.save(update_fields=["status"])
+
+
+# OPERATIONS
+
+@retry_on_conflict
+def create_booking(guest, room, check_in, check_out, number_of_guests):
+    """Create a pending booking and claim its nights until its hold expires.
+
+    ``room`` is a ``Room`` or a catalogue ``RoomSnapshot``. Raises
+    ``RoomUnavailable`` if any night is already sold; that is not a
+    conflict and is never retried.
+    """
+    booking = Booking(
+        guest=guest,
+        room_id=room.id,
+        check_in_date=check_in,
+        check_out_date=check_out,
+        number_of_guests=number_of_guests,
+        status="pending",
+        hold_expires_at=hold_expiry(),
+    )
+    booking.total_price = rates.calendar.quote(room.room_type_id, check_in, check_out)
+
+    with transaction.atomic():
+        booking.save()
+        reserve_nights(booking)
+    return booking
+
+
+@retry_on_conflict
+def confirm_booking(booking_id, guest, payment_method):
+    """Take payment for a pending booking and confirm it."""
+    with transaction.atomic():
+        booking = _load_booking(booking_id, guest)
+        if booking.status != "pending":
+            raise InvalidTransition(f"Booking #{booking.id} is {booking.status}, not pending.")
+        if booking.hold_expired:
+            raise InvalidTransition(
+                f"The hold on booking #{booking.id} has expired; please book again."
+            )
+        _claim(booking)
+
+        payment = Payment.objects.create(
+            booking=booking,
+            amount=booking.total_price,
+            payment_method=payment_method,
+            transaction_id=str(uuid.uuid4())[:8],
+            status="completed",
+        )
+
+        booking.status = "confirmed"
+        booking.hold_expires_at = None
+        booking.save(update_fields=["status", "version", "hold_expires_at"])
+        # Future stays occupy the room when the night audit sees them arrive
+        if booking.is_in_house():
+            _set_room_status(booking.room_id, "occupied")
+    return booking, payment
+
+
+@retry_on_conflict
+def cancel_booking(booking_id, guest):
+    """Cancel a pending or confirmed booking and release its nights."""
+    with transaction.atomic():
+        booking = _load_booking(booking_id, guest)
+        if booking.status not in Booking.BLOCKING_STATUSES:
+            raise InvalidTransition(f"Booking #{booking.id} is already {booking.status}.")
+        _claim(booking)
+
+        booking.status = "cancelled"
+        booking.save(update_fields=["status", "version"])
+        release_nights(booking)
+        if booking.is_in_house():
+            _set_room_status(booking.room_id, "available")
+    return booking
+
+
+__all__ = [
+    "BookingError", "BookingConflict", "InvalidTransition", "RoomUnavailable",
+    "create_booking", "confirm_booking", "cancel_booking", "retry_stats",
+]
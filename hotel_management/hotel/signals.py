@@ -0,0 +1,295 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from . import conditional, fragments, images, rates, search_cache
+from .availability import index as availability_index
+from .catalogue import catalogue
+from .models import RoomType, Room, RoomRate, Booking, Payment, DashboardStats, RoomReview
+
+
+# MUTING
+# Archiving deletes rows that move to another table rather than disappear:
+# totals, availability and searches do not change. Receivers marked
+# @unless_muted do nothing in a thread inside muted().
+_muted = threading.local()
+
+
+@contextmanager
+def muted():
+    previous = getattr(_muted, "active", False)
+    _muted.active = True
+    try:
+        yield
+    finally:
+        _muted.active = previous
+
+
+def unless_muted(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not getattr(_muted, "active", False):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# AVAILABILITY INDEX SYNC
+@receiver(post_save, sender=Booking)
+def sync_availability_on_save(sender, instance, **kwargs):
+    transaction.on_commit(lambda: availability_index.update(instance))
+
+
+@receiver(post_delete, sender=Booking)
+@unless_muted
+def sync_availability_on_delete(sender, instance, **kwargs):
+    booking_id = instance.id
+    transaction.on_commit(lambda: availability_index.discard(booking_id))
+
+
+# SEARCH CACHE INVALIDATION
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+@unless_muted
+def expire_searches_for_booking(sender, instance, **kwargs):
+    check_in, check_out = instance.check_in_date, instance.check_out_date
+    transaction.on_commit(lambda: search_cache.invalidate_stay(check_in, check_out))
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+def expire_all_searches(sender, **kwargs):
+    transaction.on_commit(search_cache.invalidate_all)
+
+
+# CATALOGUE
+# The catalogue version is the search cache's, bumped on commit above; this
+# process also drops its copy right away so it sees its own writes.
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+def reload_catalogue(sender, **kwargs):
+    catalogue.invalidate()
+    rates.calendar.invalidate()
+
+
+# RATE CALENDAR
+# Like the catalogue: other workers rebuild once the bump commits, this one
+# right away. Base price changes come through the catalogue version.
+@receiver(post_save, sender=RoomRate)
+@receiver(post_delete, sender=RoomRate)
+def rebuild_rate_calendar(sender, **kwargs):
+    transaction.on_commit(rates.calendar.invalidate_everywhere)
+    rates.calendar.invalidate()
+
+
+# ROOM CARD FRAGMENTS
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def expire_room_card(sender, instance, **kwargs):
+    room_id = instance.id
+    transaction.on_commit(lambda: fragments.invalidate_room(room_id))
+
+
+@receiver(post_save, sender=RoomType)
+@receiver(post_delete, sender=RoomType)
+def expire_room_type_cards(sender, instance, **kwargs):
+    room_type_id = instance.id
+    transaction.on_commit(lambda: fragments.invalidate_room_type(room_type_id))
+
+
+# IMAGE VARIANTS
+@receiver(post_init, sender=RoomType)
+def remember_image(sender, instance, **kwargs):
+    instance._loaded_image = instance.image.name
+
+
+# Resizing is slow, so it runs after the save has committed rather than in
+# its transaction. Until it is done, or if it fails (logged), the original
+# image is served; ``manage.py build_image_variants --missing`` retries.
+@receiver(post_save, sender=RoomType)
+def build_image_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "image" not in update_fields:
+        return
+    if instance.image.name != instance._loaded_image:
+        if instance.image_variants:
+            # Those were of the previous image
+            RoomType.objects.filter(pk=instance.pk).update(image_variants={})
+            instance.image_variants = {}
+        transaction.on_commit(lambda: build_room_type_variants(instance), robust=True)
+        instance._loaded_image = instance.image.name
+
+
+def build_room_type_variants(room_type):
+    images.build_room_type_variants(room_type)
+    # The variants are written with update(), after this save's bumps
+    fragments.invalidate_room_type(room_type.id)
+    catalogue.invalidate_everywhere()
+
+
+# PAGE VERSIONS (conditional GET)
+# Room and RoomType changes bump the catalogue version and bookings their
+# nights' versions through the search cache receivers above.
+@receiver(post_save, sender=RoomReview)
+@receiver(post_delete, sender=RoomReview)
+def expire_room_reviews(sender, instance, **kwargs):
+    # Both rooms when a review was moved; runs before the aggregates below
+    # forget where it was
+    room_ids = {instance.room_id, getattr(instance, "_loaded_room_id", None)} - {None}
+    for room_id in room_ids:
+        transaction.on_commit(lambda room_id=room_id: conditional.invalidate_reviews(room_id))
+
+
+# DASHBOARD COUNTERS
+# post_init remembers the values each row was loaded with, so post_save can
+# turn a change into a delta without re-reading the old row.
+
+def _booking_counts(status):
+    return {
+        "confirmed_bookings": int(status == "confirmed"),
+        "cancelled_bookings": int(status == "cancelled"),
+    }
+
+
+def _payment_revenue(status, amount):
+    return amount if status == "completed" and amount else 0
+
+
+@receiver(post_init, sender=Booking)
+@receiver(post_init, sender=Room)
+def remember_loaded_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.__dict__.get("status") if instance.pk else None
+
+
+@receiver(post_init, sender=Payment)
+def remember_loaded_payment(sender, instance, **kwargs):
+    if instance.pk:
+        instance._loaded_revenue = _payment_revenue(
+            instance.__dict__.get("status"), instance.__dict__.get("amount")
+        )
+    else:
+        instance._loaded_revenue = 0
+
+
+@receiver(pre_delete, sender=Booking)
+@receiver(pre_delete, sender=Room)
+@receiver(pre_delete, sender=Payment)
+@unless_muted
+def reload_before_delete(sender, instance, **kwargs):
+    # The instance being deleted may have been loaded long before; count
+    # what is actually in the row.
+    current = sender.objects.filter(pk=instance.pk).values("status", *(
+        ["amount"] if sender is Payment else []
+    )).first()
+    if current is None:
+        return
+    if sender is Payment:
+        instance._loaded_revenue = _payment_revenue(current["status"], current["amount"])
+    else:
+        instance._loaded_status = current["status"]
+
+
+@receiver(post_save, sender=Booking)
+def count_booking_on_save(sender, instance, created, **kwargs):
+    old = _booking_counts(None if created else instance._loaded_status)
+    new = _booking_counts(instance.status)
+    DashboardStats.apply(
+        total_bookings=int(created),
+        **{field: new[field] - old[field] for field in new}
+    )
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Booking)
+@unless_muted
+def count_booking_on_delete(sender, instance, **kwargs):
+    old = _booking_counts(instance._loaded_status)
+    DashboardStats.apply(total_bookings=-1, **{field: -delta for field, delta in old.items()})
+
+
+@receiver(post_save, sender=Payment)
+def count_payment_on_save(sender, instance, **kwargs):
+    revenue = _payment_revenue(instance.status, instance.amount)
+    DashboardStats.apply(total_revenue=revenue - instance._loaded_revenue)
+    instance._loaded_revenue = revenue
+
+
+@receiver(post_delete, sender=Payment)
+@unless_muted
+def count_payment_on_delete(sender, instance, **kwargs):
+    DashboardStats.apply(total_revenue=-instance._loaded_revenue)
+
+
+@receiver(post_save, sender=Room)
+def count_room_on_save(sender, instance, created, **kwargs):
+    was_occupied = not created and instance._loaded_status == "occupied"
+    DashboardStats.apply(occupied_rooms=int(instance.status == "occupied") - int(was_occupied))
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Room)
+def count_room_on_delete(sender, instance, **kwargs):
+    DashboardStats.apply(occupied_rooms=-int(instance._loaded_status == "occupied"))
+
+
+# ROOM REVIEW AGGREGATES
+
+def _apply_review(room_id, added=None, removed=None):
+    """Move a review's rating in or out of the room's aggregates in one UPDATE."""
+    changes = {}
+    for rating, sign in [(added, 1), (removed, -1)]:
+        if rating is None:
+            continue
+        rating = int(rating)
+        field = f"rating_{rating}"
+        changes[field] = changes.get(field, 0) + sign
+        changes["rating_sum"] = changes.get("rating_sum", 0) + sign * rating
+        changes["review_count"] = changes.get("review_count", 0) + sign
+    changes = {field: delta for field, delta in changes.items() if delta}
+    if changes:
+        Room.objects.filter(pk=room_id).update(
+            **{field: F(field) + delta for field, delta in changes.items()}
+        )
+
+
+@receiver(post_init, sender=RoomReview)
+def remember_loaded_rating(sender, instance, **kwargs):
+    if instance.pk:
+        instance._loaded_rating = instance.__dict__.get("rating")
+        instance._loaded_room_id = instance.__dict__.get("room_id")
+    else:
+        instance._loaded_rating = instance._loaded_room_id = None
+
+
+@receiver(post_save, sender=RoomReview)
+def count_review_on_save(sender, instance, created, **kwargs):
+    if created or instance._loaded_room_id == instance.room_id:
+        removed = None if created else instance._loaded_rating
+        if removed != instance.rating:
+            _apply_review(instance.room_id, added=instance.rating, removed=removed)
+    else:
+        # Moved to another room: take the old rating off the old room
+        _apply_review(instance._loaded_room_id, removed=instance._loaded_rating)
+        _apply_review(instance.room_id, added=instance.rating)
+    instance._loaded_rating = instance.rating
+    instance._loaded_room_id = instance.room_id
+
+
+@receiver(pre_delete, sender=RoomReview)
+def reload_review_before_delete(sender, instance, **kwargs):
+    instance._loaded_rating, instance._loaded_room_id = (
+        RoomReview.objects.filter(pk=instance.pk).values_list("rating", "room_id").first()
+        or (None, instance.room_id)
+    )
+
+
+@receiver(post_delete, sender=RoomReview)
+def count_review_on_delete(sender, instance, **kwargs):
+    _apply_review(instance._loaded_room_id, removed=instance._loaded_rating)
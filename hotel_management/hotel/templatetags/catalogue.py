@@ -0,0 +1,12 @@
+from django import template
+
+from hotel import fragments
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def room_cards(context, rooms, totals=None, nights=None):
+    """Render the room list cards of ``rooms`` through the fragment cache,
+    with the stay ``totals`` by room type of a search."""
+    return fragments.render_room_cards(rooms, context["user"].is_authenticated, totals, nights)
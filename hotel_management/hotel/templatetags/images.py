@@ -0,0 +1,26 @@
+from django import template
+
+from hotel.images import ResponsiveImage, static_image
+
+register = template.Library()
+
+
+@register.inclusion_tag("hotel/includes/picture.html")
+def picture(image, alt="", sizes="100vw", variant="card", **attrs):
+    """Render ``image`` as a ``<picture>`` with WebP and fallback ``srcset``.
+
+    ``image`` is a ``ResponsiveImage`` (e.g. ``room_type.responsive_image``)
+    or the path of a static file. ``sizes`` tells the browser how wide the
+    image is displayed; ``variant`` picks the plain ``src`` for browsers
+    without ``srcset``. Extra keyword arguments become ``<img>`` attributes,
+    with ``class_`` for ``class``.
+    """
+    if not isinstance(image, ResponsiveImage):
+        image = static_image(image)
+    return {
+        "image": image,
+        "src": image.url(variant),
+        "alt": alt,
+        "sizes": sizes,
+        "attrs": {name.rstrip("_"): value for name, value in attrs.items()},
+    }
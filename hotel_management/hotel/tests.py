@@ -1,3 +1,1744 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import re
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from importlib import import_module
+from operator import attrgetter
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from decimal import Decimal
+
+from asgiref.sync import iscoroutinefunction
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.db.models import F
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from hotel_management import metrics, replicas
+from hotel_management.querybudget import QueryBudgetTestMixin
+from hotel_management.sqlite.base import DatabaseWrapper
+from . import archive, audit, bench, exports, holds, images, importing, rates, search_cache, services, versions, views
+from .catalogue import catalogue
+from .pagination import InvalidCursor, KeysetPaginator, ListKeysetPaginator
+from .forms import BookingForm, RoomSearchForm
+from .availability import AvailabilityIndex, booked_rooms_query, index as availability_index
+from .models import (
+    RoomType, Room, Booking, Payment, RoomNight, RoomReview, DashboardStats, NightAuditRun,
+    ArchivedBooking, ArchivedPayment, RoomRate,
+)
+
+
+@skipUnless(connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite specific")
+class QueryPlanTests(TestCase):
+    """Every hot-path query must be answered from an index.
+
+    SQLite reports a full table scan as ``SCAN <table>`` without a
+    ``USING ... INDEX`` clause; any such line fails the test.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("guest", password="secret")
+
+    def assertIndexed(self, queryset, ordered=False):
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            if re.search(r"\bSCAN\b", line) and "INDEX" not in line:
+                self.fail(f"Full table scan in plan:\n{plan}\n\nSQL: {queryset.query}")
+            if ordered and "TEMP B-TREE" in line:
+                self.fail(f"Sort not served by an index:\n{plan}\n\nSQL: {queryset.query}")
+
+    def test_room_list_overlap_query(self):
+        check_in = date.today()
+        check_out = check_in + timedelta(days=2)
+        self.assertIndexed(booked_rooms_query(check_in, check_out))
+        self.assertIndexed(
+            Room.objects.filter(status="available")
+            .exclude(id__in=booked_rooms_query(check_in, check_out))
+            .filter(room_type__capacity__gte=2)
+        )
+        self.assertIndexed(
+            Room.objects.filter(status="available")
+            .exclude(id__in=[1, 2, 3])
+            .filter(room_type__capacity__gte=2)
+        )
+
+    def test_room_free_check(self):
+        check_in = date.today()
+        self.assertIndexed(
+            Booking.objects.filter(
+                room_id=1,
+                status__in=Booking.BLOCKING_STATUSES,
+                check_in_date__lt=check_in + timedelta(days=2),
+                check_out_date__gt=check_in,
+            )
+        )
+        self.assertIndexed(
+            RoomNight.objects.filter(room_id=1, night__gte=check_in, night__lt=check_in + timedelta(days=2))
+        )
+
+    def test_my_bookings_query(self):
+        self.assertIndexed(
+            Booking.objects.filter(guest=self.user).order_by("-created_at", "id"), ordered=True
+        )
+
+    def test_add_review_stay_check(self):
+        self.assertIndexed(
+            Booking.objects.filter(guest=self.user, room_id=1, status="completed")
+        )
+
+    def test_dashboard_queries(self):
+        self.assertIndexed(Booking.objects.filter(status="confirmed"))
+        self.assertIndexed(Booking.objects.filter(status="cancelled"))
+        self.assertIndexed(Room.objects.filter(status="occupied"))
+        self.assertIndexed(Payment.objects.filter(status="completed"))
+        # Revenue is summed by walking the partial index of completed payments
+        plan = Payment.objects.filter(status="completed").values("amount").explain()
+        self.assertIn("payment_completed_amount_idx", plan)
+
+
+class InventoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.room = Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+
+    def setUp(self):
+        self.check_in = date.today() + timedelta(days=5)
+        self.check_out = self.check_in + timedelta(days=3)
+
+    def test_overlapping_booking_is_refused(self):
+        booking = services.create_booking(self.guest, self.room, self.check_in, self.check_out, 1)
+        self.assertEqual(
+            sorted(RoomNight.objects.filter(booking=booking).values_list("night", flat=True)),
+            booking.night_dates(),
+        )
+        with self.assertRaises(services.RoomUnavailable):
+            services.create_booking(
+                self.guest, self.room, self.check_out - timedelta(days=1), self.check_out + timedelta(days=1), 1
+            )
+        # Nothing of the refused stay was claimed
+        self.assertEqual(RoomNight.objects.count(), 3)
+        self.assertEqual(Booking.objects.count(), 1)
+        # Check-out day is free for the next guest
+        services.create_booking(self.guest, self.room, self.check_out, self.check_out + timedelta(days=1), 1)
+
+    def test_cancelling_releases_nights(self):
+        booking = services.create_booking(self.guest, self.room, self.check_in, self.check_out, 1)
+        services.cancel_booking(booking.id, self.guest)
+        self.assertFalse(RoomNight.objects.filter(booking=booking).exists())
+        services.create_booking(self.guest, self.room, self.check_in, self.check_out, 1)
+
+    def test_backfill_reports_existing_overlaps(self):
+        backfill = import_module("hotel.migrations.0004_roomnight").backfill_room_nights
+        first = Booking.objects.create(
+            guest=self.guest, room=self.room, check_in_date=self.check_in, check_out_date=self.check_out,
+            number_of_guests=1, total_price=0, status="confirmed",
+        )
+        second = Booking.objects.create(
+            guest=self.guest, room=self.room, check_in_date=self.check_out - timedelta(days=1),
+            check_out_date=self.check_out + timedelta(days=1),
+            number_of_guests=1, total_price=0, status="confirmed",
+        )
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            backfill(django_apps, None)
+        self.assertEqual(RoomNight.objects.filter(booking=first).count(), 3)
+        self.assertEqual(RoomNight.objects.filter(booking=second).count(), 1)
+        self.assertIn(
+            f"booking {second.id} overlaps booking {first.id} in room {self.room.id} "
+            f"on {self.check_out - timedelta(days=1)}",
+            stdout.getvalue(),
+        )
+
+
+class BookingServiceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        cls.other = User.objects.create_user("other", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.room = Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+
+    def setUp(self):
+        self.check_in = date.today() + timedelta(days=5)
+        self.check_out = self.check_in + timedelta(days=2)
+
+    def test_invalid_transitions(self):
+        booking = services.create_booking(self.guest, self.room, self.check_in, self.check_out, 1)
+        services.confirm_booking(booking.id, self.guest, "cash")
+        with self.assertRaises(services.InvalidTransition):
+            services.confirm_booking(booking.id, self.guest, "cash")
+
+        services.cancel_booking(booking.id, self.guest)
+        with self.assertRaises(services.InvalidTransition):
+            services.cancel_booking(booking.id, self.guest)
+        with self.assertRaises(services.InvalidTransition):
+            services.confirm_booking(booking.id, self.guest, "cash")
+        self.assertEqual(Payment.objects.filter(booking=booking).count(), 1)
+
+    def test_other_guests_booking_is_not_found(self):
+        booking = services.create_booking(self.guest, self.room, self.check_in, self.check_out, 1)
+        with self.assertRaises(Booking.DoesNotExist):
+            services.cancel_booking(booking.id, self.other)
+
+    def test_overlapping_nights_are_unavailable(self):
+        booking = services.create_booking(self.guest, self.room, self.check_in, self.check_out, 1)
+        services.confirm_booking(booking.id, self.guest, "cash")
+        with self.assertRaises(services.RoomUnavailable):
+            services.create_booking(
+                self.other, self.room, self.check_in + timedelta(days=1), self.check_out + timedelta(days=1), 1
+            )
+
+    def test_stale_version_inside_a_transaction_is_not_retried(self):
+        booking = services.create_booking(self.guest, self.room, self.check_in, self.check_out, 1)
+        with stale_reads(times=1) as loads:
+            with self.assertRaises(services.BookingConflict):
+                services.confirm_booking(booking.id, self.guest, "cash")
+        self.assertEqual(loads, [booking.id])
+
+
+@contextmanager
+def stale_reads(times):
+    """Make another writer bump each booking right after the first ``times`` loads."""
+    load = services._load_booking
+    loads = []
+
+    def load_then_bump(booking_id, guest=None):
+        booking = load(booking_id, guest)
+        loads.append(booking_id)
+        if len(loads) <= times:
+            Booking.objects.filter(pk=booking_id).update(version=F("version") + 1)
+        return booking
+
+    with mock.patch.object(services, "_load_booking", load_then_bump), \
+            mock.patch.object(services.time, "sleep"):
+        yield loads
+
+
+class BookingRetryTests(TransactionTestCase):
+    """Retries only happen outside a transaction, so these commit for real."""
+
+    # Restores the dashboard stats row the migrations create after each flush
+    serialized_rollback = True
+
+    def setUp(self):
+        self.guest = User.objects.create_user("guest", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        self.room = Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+        check_in = date.today() + timedelta(days=5)
+        self.booking = services.create_booking(self.guest, self.room, check_in, check_in + timedelta(days=2), 1)
+        services.retry_stats.reset()
+
+    def test_stale_version_is_retried(self):
+        with stale_reads(times=2) as loads:
+            booking, payment = services.confirm_booking(self.booking.id, self.guest, "cash")
+        self.assertEqual(len(loads), 3)
+        self.assertEqual(booking.status, "confirmed")
+        self.assertEqual(Payment.objects.filter(booking=booking).count(), 1)
+        self.assertEqual((services.retry_stats.retries, services.retry_stats.failures), (2, 0))
+
+    def test_gives_up_with_booking_conflict(self):
+        with stale_reads(times=services.MAX_ATTEMPTS) as loads:
+            with self.assertRaises(services.BookingConflict):
+                services.cancel_booking(self.booking.id, self.guest)
+        self.assertEqual(len(loads), services.MAX_ATTEMPTS)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "pending")
+        self.assertTrue(RoomNight.objects.filter(booking=self.booking).exists())
+        self.assertEqual(services.retry_stats.failures, 1)
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    """Views must stay within their query budget however many rows they show."""
+
+    ROWS = 20
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("staff", password="secret", is_staff=True)
+        cls.guest = User.objects.create_user("guest", password="secret")
+        cls.room_types = [
+            RoomType.objects.create(
+                name=f"Type {i}",
+                description="Room",
+                price_per_night=Decimal("2500.00"),
+                capacity=2 + i,
+                amenities="WiFi TV AC",
+            )
+            for i in range(3)
+        ]
+        cls.rooms = [
+            Room.objects.create(
+                room_number=str(100 + i),
+                room_type=cls.room_types[i % 3],
+                floor_number=1,
+            )
+            for i in range(cls.ROWS)
+        ]
+        start = date.today() - timedelta(days=60)
+        cls.bookings = [
+            Booking.objects.create(
+                guest=cls.guest,
+                room=room,
+                check_in_date=start,
+                check_out_date=start + timedelta(days=2),
+                number_of_guests=1,
+                total_price=Decimal("5000.00"),
+                status="completed",
+            )
+            for room in cls.rooms
+        ]
+        for i in range(cls.ROWS):
+            reviewer = User.objects.create(username=f"reviewer{i}")
+            RoomReview.objects.create(user=reviewer, room=cls.rooms[0], rating=1 + i % 5)
+
+    def setUp(self):
+        availability_index.invalidate()
+        for cache in caches.all():
+            cache.clear()
+
+    def test_catalogue_views(self):
+        self.assertWithinQueryBudget(self.client.get(reverse("home")))
+        self.assertWithinQueryBudget(self.client.get(reverse("room_list")))
+        check_in = date.today() + timedelta(days=5)
+        response = self.client.get(reverse("room_list"), {
+            "check_in": check_in,
+            "check_out": check_in + timedelta(days=2),
+            "guests": 2,
+        })
+        self.assertWithinQueryBudget(response)
+        self.assertWithinQueryBudget(
+            self.client.get(reverse("room_detail", args=[self.rooms[0].id]))
+        )
+
+    def test_guest_views(self):
+        self.client.force_login(self.guest)
+        booking = self.bookings[0]
+        self.assertWithinQueryBudget(self.client.get(reverse("my_bookings")))
+        self.assertWithinQueryBudget(
+            self.client.get(reverse("booking_details", args=[booking.id]))
+        )
+        self.assertWithinQueryBudget(self.client.get(reverse("book_room", args=[self.rooms[1].id])))
+        self.assertWithinQueryBudget(self.client.get(reverse("add_review", args=[self.rooms[1].id])))
+
+    def test_booking_flow(self):
+        self.client.force_login(self.guest)
+        check_in = date.today() + timedelta(days=5)
+        response = self.client.post(reverse("book_room", args=[self.rooms[1].id]), {
+            "check_in_date": check_in,
+            "check_out_date": check_in + timedelta(days=2),
+            "number_of_guests": 1,
+        })
+        self.assertWithinQueryBudget(response)
+        booking = Booking.objects.get(status="pending")
+        self.assertWithinQueryBudget(self.client.get(reverse("payment", args=[booking.id])))
+        response = self.client.post(reverse("payment", args=[booking.id]), {
+            "payment_method": "cash",
+            "amount": booking.total_price,
+        })
+        self.assertWithinQueryBudget(response)
+        self.assertWithinQueryBudget(self.client.get(reverse("cancel_booking", args=[booking.id])))
+
+    def test_admin_dashboard(self):
+        self.client.force_login(self.staff)
+        self.assertWithinQueryBudget(self.client.get(reverse("admin_dashboard")))
+
+    @override_settings(DEBUG=True)
+    def test_overrun_is_logged_not_raised(self):
+        # The booking is committed by the time the budget is checked
+        self.client.force_login(self.guest)
+        check_in = date.today() + timedelta(days=5)
+        with mock.patch.object(views.make_booking, "query_budget", 1), \
+                self.assertLogs("hotel_management.querybudget", "WARNING") as logs:
+            response = self.client.post(reverse("book_room", args=[self.rooms[1].id]), {
+                "check_in_date": check_in,
+                "check_out_date": check_in + timedelta(days=2),
+                "number_of_guests": 1,
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(f"/book/{self.rooms[1].id}/ ran", logs.output[0])
+
+
+class PaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        guest = User.objects.create_user("guest", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        room = Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+        start = date.today() - timedelta(days=100)
+        bookings = [
+            Booking.objects.create(
+                guest=guest, room=room, check_in_date=start + timedelta(days=2 * i),
+                check_out_date=start + timedelta(days=2 * i + 1),
+                number_of_guests=1, total_price=Decimal("4000.00"), status="completed",
+            )
+            for i in range(7)
+        ]
+        # Ties on created_at are broken by id
+        Booking.objects.filter(pk__in=[b.pk for b in bookings[2:5]]).update(
+            created_at=bookings[2].created_at
+        )
+
+    def pages(self, paginator):
+        pages, cursor = [], None
+        while True:
+            page = paginator.page(cursor)
+            pages.append([row.id for row in page])
+            if not page.has_more:
+                return pages
+            cursor = page.next_cursor
+
+    def test_cursor_walks_every_row_once(self):
+        ordering = ("-created_at", "id")
+        expected = list(Booking.objects.order_by(*ordering).values_list("id", flat=True))
+        for size in (1, 2, 3, 7, 8):
+            pages = self.pages(KeysetPaginator(Booking.objects.all(), ordering, size))
+            self.assertEqual([row for page in pages for row in page], expected)
+            self.assertTrue(all(len(page) == size for page in pages[:-1]))
+
+    def test_boundaries(self):
+        # Exactly a page: no next page and no cursor
+        page = KeysetPaginator(Booking.objects.all(), ("id",), 7).page()
+        self.assertEqual((len(page), page.has_more, page.next_cursor), (7, False, None))
+        page = KeysetPaginator(Booking.objects.all(), ("id",), 6).page()
+        self.assertTrue(page.has_more)
+        last = KeysetPaginator(Booking.objects.all(), ("id",), 6).page(page.next_cursor)
+        self.assertEqual((len(last), last.has_more), (1, False))
+
+    def test_empty_and_invalid(self):
+        page = KeysetPaginator(Booking.objects.none(), ("id",)).page()
+        self.assertEqual((list(page), page.has_more, bool(page)), ([], False, False))
+        with self.assertRaises(InvalidCursor):
+            KeysetPaginator(Booking.objects.all(), ("id",)).page("not-a-cursor")
+        self.assertEqual(ListKeysetPaginator([], int).page().items, [])
+
+    def test_list_paginator_shares_cursors(self):
+        rows = list(Booking.objects.order_by("id"))
+        from_list = ListKeysetPaginator(rows, attrgetter("id"), 3)
+        from_query = KeysetPaginator(Booking.objects.all(), ("id",), 3)
+        self.assertEqual(self.pages(from_list), self.pages(from_query))
+        cursor = from_query.page().next_cursor
+        self.assertEqual(
+            [row.id for row in from_list.page(cursor)], [row.id for row in from_query.page(cursor)]
+        )
+        # A cursor at or past the end gives an empty page
+        cursor = KeysetPaginator(Booking.objects.all(), ("id",), 6).page().next_cursor
+        self.assertEqual(ListKeysetPaginator(rows[:6], attrgetter("id")).page(cursor).items, [])
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("staff", password="secret", is_staff=True)
+        cls.guest = User.objects.create_user("guest", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe",
+            description="Room",
+            price_per_night=Decimal("2500.00"),
+            capacity=2,
+            amenities="WiFi",
+        )
+        room = Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+        cls.start = date(2024, 1, 1)
+        for day in range(3):
+            booking = Booking.objects.create(
+                guest=cls.guest,
+                room=room,
+                check_in_date=cls.start + timedelta(days=day * 10),
+                check_out_date=cls.start + timedelta(days=day * 10 + 2),
+                number_of_guests=1,
+                total_price=Decimal("5000.00"),
+                status="completed",
+            )
+            Payment.objects.create(booking=booking, amount=Decimal("5000.00"), status="completed")
+
+    def export(self, kind, **params):
+        params = {"start": self.start, "end": self.start + timedelta(days=15), **params}
+        return self.client.get(reverse("export_data", args=[kind]), params)
+
+    def test_staff_only(self):
+        self.client.force_login(self.guest)
+        self.assertEqual(self.export("bookings").status_code, 302)
+
+    def test_csv_is_streamed(self):
+        self.client.force_login(self.staff)
+        response = self.export("bookings")
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["booking_id", "created_at", "guest"])
+        # Only the two stays starting inside the range
+        self.assertEqual(len(lines), 3)
+        self.assertIn("Deluxe", lines[1])
+
+    def test_gzipped_ndjson(self):
+        self.client.force_login(self.staff)
+        today = date.today()
+        response = self.export("payments", start=today, end=today, format="ndjson", gzip="on")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertTrue(response["Content-Disposition"].endswith('.ndjson.gz"'))
+        rows = [
+            json.loads(line)
+            for line in gzip.decompress(b"".join(response.streaming_content)).splitlines()
+        ]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["amount"], "5000.00")
+
+    async def test_streamed_block_by_block_under_asgi(self):
+        await self.async_client.aforce_login(self.staff)
+        params = {"start": self.start, "end": self.start + timedelta(days=15)}
+        with mock.patch.object(exports, "BLOCK_SIZE", 1):
+            response = await self.async_client.get(reverse("export_data", args=["bookings"]), params)
+            self.assertTrue(response.is_async)
+            blocks = [block async for block in response.streaming_content]
+        # The header, then one block per row
+        self.assertEqual(len(blocks), 3)
+        self.assertTrue(blocks[0].startswith(b"booking_id,created_at,guest"))
+        self.assertIn(b"Deluxe", blocks[1])
+
+    def test_invalid_range(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.export("bookings", end=self.start - timedelta(days=1)).status_code, 400)
+        self.assertEqual(self.export("guests").status_code, 404)
+
+
+class ImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        availability_index.invalidate()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, text):
+        path = f"{self.tmpdir.name}/{name}"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def import_rows(self, kind, path, **kwargs):
+        rejected = []
+        with self.captureOnCommitCallbacks(execute=True):
+            counts = importing.import_file(
+                kind, path, on_rejected=lambda line, row, error: rejected.append((line, error)), **kwargs
+            )
+        return counts, rejected
+
+    def import_catalogue(self):
+        self.import_rows("room_types", self.write("types.csv", (
+            "name,description,price_per_night,capacity,amenities,is_active\n"
+            "Deluxe,Room,4000.00,2,WiFi,\n"
+            "Broken,Room,not a price,2,WiFi,\n"
+        )))
+        self.import_rows("rooms", self.write("rooms.csv", (
+            "room_number,floor_number,room_type\n"
+            "101,1,Deluxe\n"
+            "102,1,Deluxe\n"
+        )))
+
+    def test_room_types_reach_the_catalogue(self):
+        catalogue.room_types()
+        path = self.write("types.csv", (
+            "name,description,price_per_night,capacity,amenities,is_active\n"
+            "Deluxe,Room,4000.00,2,WiFi,\n"
+            "Broken,Room,not a price,2,WiFi,\n"
+            "Closed,Room,1000.00,2,WiFi,no\n"
+        ))
+        (accepted, rejected_count), rejected = self.import_rows("room_types", path)
+        self.assertEqual((accepted, rejected_count), (2, 1))
+        self.assertEqual(rejected[0][0], 3)
+        self.assertEqual([room_type.name for room_type in catalogue.room_types()], ["Deluxe"])
+        deluxe = catalogue.room_types()[0]
+        total = rates.calendar.quote(deluxe.id, date.today(), date.today() + timedelta(days=2))
+        self.assertEqual(total, Decimal("8000.00"))
+
+    def test_bookings_keep_history_and_skip_overlaps(self):
+        self.import_catalogue()
+        check_in = date.today() + timedelta(days=10)
+        rows = [
+            {"room_number": "101", "guest": "guest", "check_in_date": str(check_in),
+             "check_out_date": str(check_in + timedelta(days=2)), "number_of_guests": 1,
+             "total_price": "8000.00", "status": "confirmed", "created_at": "2024-01-02T03:04:05+00:00",
+             "payment_amount": "8000.00", "transaction_id": "T1"},
+            # Overlaps the first stay
+            {"room_number": "101", "guest": "guest", "check_in_date": str(check_in + timedelta(days=1)),
+             "check_out_date": str(check_in + timedelta(days=3)), "number_of_guests": 1,
+             "total_price": "8000.00", "status": "confirmed", "payment_amount": "8000.00",
+             "transaction_id": "T2"},
+            {"room_number": "102", "guest": "guest", "check_in_date": "2023-05-01",
+             "check_out_date": "2023-05-03", "number_of_guests": 1,
+             "total_price": "8000.00", "status": "completed", "transaction_id": "T1",
+             "payment_amount": "8000.00"},
+            {"room_number": "102", "guest": "newcomer", "check_in_date": "2023-06-01",
+             "check_out_date": "2023-06-02", "number_of_guests": 1,
+             "total_price": "4000.00", "status": "completed"},
+        ]
+        path = self.write("bookings.jsonl", "\n".join(json.dumps(row) for row in rows))
+        (accepted, _), rejected = self.import_rows("bookings", path, batch_size=2)
+
+        self.assertEqual(accepted, 1)
+        self.assertEqual([line for line, _ in rejected], [2, 3, 4])
+        self.assertIn("already booked", rejected[0][1])
+        self.assertIn("Duplicate transaction id", rejected[1][1])
+        self.assertIn("Unknown guest", rejected[2][1])
+
+        booking = Booking.objects.get()
+        self.assertEqual(booking.created_at.year, 2024)
+        self.assertEqual(RoomNight.objects.filter(booking=booking).count(), 2)
+        self.assertEqual(Payment.objects.get().booking, booking)
+        stats = DashboardStats.load()
+        self.assertEqual((stats.total_bookings, stats.confirmed_bookings), (1, 1))
+        self.assertFalse(availability_index.is_available(booking.room_id, check_in, check_in + timedelta(days=1)))
+
+    def test_batches_committed_before_a_failure_are_finished(self):
+        self.import_catalogue()
+        other_worker = AvailabilityIndex()
+        check_in = date.today() + timedelta(days=10)
+        other_worker.booked_room_ids(check_in, check_in + timedelta(days=2))
+        rows = [
+            {"room_number": number, "guest": "guest", "check_in_date": str(check_in),
+             "check_out_date": str(check_in + timedelta(days=2)), "number_of_guests": 1,
+             "total_price": "8000.00", "status": "confirmed"}
+            for number in ("101", "102")
+        ]
+        path = self.write("bookings.jsonl", "\n".join(json.dumps(row) for row in rows))
+        import_chunk = importing.BookingImporter.import_chunk
+
+        def fails_second_chunk(importer, chunk):
+            if chunk[0][0] > 1:
+                raise KeyboardInterrupt
+            return import_chunk(importer, chunk)
+
+        with mock.patch.object(importing.BookingImporter, "import_chunk", fails_second_chunk), \
+                self.assertRaises(KeyboardInterrupt):
+            self.import_rows("bookings", path, batch_size=1)
+
+        booking = Booking.objects.get()
+        stats = DashboardStats.load()
+        self.assertEqual((stats.total_bookings, stats.confirmed_bookings), (1, 1))
+        self.assertEqual(
+            other_worker.booked_room_ids(check_in, check_in + timedelta(days=2)), {booking.room_id}
+        )
+
+    def test_create_guests(self):
+        self.import_catalogue()
+        path = self.write("bookings.csv", (
+            "room_number,guest,check_in_date,check_out_date,number_of_guests,total_price,status\n"
+            "102,newcomer,2023-06-01,2023-06-02,1,4000.00,completed\n"
+        ))
+        (accepted, _), _ = self.import_rows("bookings", path, create_guests=True)
+        self.assertEqual(accepted, 1)
+        self.assertFalse(User.objects.get(username="newcomer").has_usable_password())
+
+    def test_forms_share_the_stay_rules(self):
+        today = date.today()
+        for form in (
+            RoomSearchForm({"check_in": today, "check_out": today, "guests": 1}),
+            BookingForm({"check_in_date": today - timedelta(days=1), "check_out_date": today,
+                         "number_of_guests": 1}),
+        ):
+            self.assertFalse(form.is_valid())
+
+
+class SearchCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        cls.room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.room = Room.objects.create(room_number="101", room_type=cls.room_type, floor_number=1)
+
+    def setUp(self):
+        availability_index.invalidate()
+        for cache in caches.all():
+            cache.clear()
+        self.night = date.today() + timedelta(days=10)
+        self.covering = (self.night - timedelta(days=1), self.night + timedelta(days=2))
+        self.disjoint = (self.night + timedelta(days=5), self.night + timedelta(days=7))
+
+    def search(self, stay):
+        return self.client.get(reverse("room_list"), {
+            "check_in": stay[0], "check_out": stay[1], "guests": 1,
+        })
+
+    def test_booking_expires_only_overlapping_searches(self):
+        self.search(self.covering)
+        self.search(self.disjoint)
+        self.assertEqual(search_cache.stats()["misses"], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.create_booking(self.guest, self.room, self.night, self.night + timedelta(days=1), 1)
+
+        self.assertEqual(len(self.search(self.disjoint).context["rooms"]), 1)
+        self.assertEqual(search_cache.stats(), {"hits": 1, "misses": 2, "hit_rate": 1 / 3})
+        self.assertEqual(len(self.search(self.covering).context["rooms"]), 0)
+        self.assertEqual(search_cache.stats()["misses"], 3)
+
+    def test_room_and_room_type_writes_expire_everything(self):
+        for write in (
+            lambda: Room.objects.get(pk=self.room.pk).save(),
+            lambda: RoomType.objects.get(pk=self.room_type.pk).save(),
+        ):
+            self.search(self.disjoint)
+            misses = search_cache.stats()["misses"]
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.search(self.disjoint)
+            self.assertEqual(search_cache.stats()["misses"], misses + 1)
+
+    def test_counters(self):
+        self.assertEqual(search_cache.stats(), {"hits": 0, "misses": 0, "hit_rate": 0.0})
+        calls = []
+        for _ in range(3):
+            result = search_cache.cached_search(*self.disjoint, 2, lambda: calls.append(1) or ([7], None))
+        self.assertEqual(result.room_ids, [7])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(search_cache.stats(), {"hits": 2, "misses": 1, "hit_rate": 2 / 3})
+
+
+class DashboardStatsTests(TestCase):
+    FIELDS = ("total_bookings", "confirmed_bookings", "cancelled_bookings", "total_revenue", "occupied_rooms")
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.room = Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+
+    def counters(self):
+        return DashboardStats.objects.filter(pk=DashboardStats.SINGLETON_ID).values(*self.FIELDS).get()
+
+    def assertMatchesRecount(self, **expected):
+        counters = self.counters()
+        for field, value in expected.items():
+            self.assertEqual(counters[field], value, field)
+        DashboardStats.rebuild()
+        self.assertEqual(counters, self.counters())
+
+    def book(self, status="pending"):
+        check_in = date.today() + timedelta(days=5)
+        return Booking.objects.create(
+            guest=self.guest, room=self.room, check_in_date=check_in,
+            check_out_date=check_in + timedelta(days=2), number_of_guests=1,
+            total_price=Decimal("8000.00"), status=status,
+        )
+
+    def test_booking_status_changes(self):
+        booking = self.book()
+        self.assertMatchesRecount(total_bookings=1, confirmed_bookings=0)
+        booking.status = "confirmed"
+        booking.save()
+        self.assertMatchesRecount(confirmed_bookings=1)
+        booking.status = "cancelled"
+        booking.save()
+        self.assertMatchesRecount(confirmed_bookings=0, cancelled_bookings=1)
+        booking.save()
+        self.assertMatchesRecount(total_bookings=1, cancelled_bookings=1)
+
+    def test_payment_edits(self):
+        payment = Payment.objects.create(
+            booking=self.book("confirmed"), amount=Decimal("8000.00"),
+            payment_method="cash", status="completed",
+        )
+        self.assertMatchesRecount(total_revenue=Decimal("8000.00"))
+        payment.amount = Decimal("7500.00")
+        payment.save()
+        self.assertMatchesRecount(total_revenue=Decimal("7500.00"))
+        payment.status = "refunded"
+        payment.save()
+        self.assertMatchesRecount(total_revenue=0)
+        payment.status = "completed"
+        payment.save()
+        payment.delete()
+        self.assertMatchesRecount(total_revenue=0)
+
+    def test_deletes_count_the_stored_row(self):
+        booking = self.book("confirmed")
+        # A copy loaded before the booking was cancelled elsewhere
+        stale = Booking.objects.get(pk=booking.pk)
+        booking.status = "cancelled"
+        booking.save()
+        stale.delete()
+        self.assertMatchesRecount(total_bookings=0, confirmed_bookings=0, cancelled_bookings=0)
+
+        self.room.status = "occupied"
+        self.room.save()
+        self.assertMatchesRecount(occupied_rooms=1)
+        Room.objects.get(pk=self.room.pk).delete()
+        self.assertMatchesRecount(occupied_rooms=0)
+
+    def test_missing_row_is_not_rebuilt_on_write(self):
+        DashboardStats.objects.all().delete()
+        with self.assertNumQueries(1), self.assertLogs("hotel.models", "WARNING"):
+            DashboardStats.apply(total_bookings=1)
+        self.assertFalse(DashboardStats.objects.exists())
+        with self.assertLogs("hotel.models", "WARNING"):
+            self.book()
+        self.assertEqual(DashboardStats.load().total_bookings, 1)
+
+
+class ReviewAggregateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.rooms = [
+            Room.objects.create(room_number=number, room_type=room_type, floor_number=1)
+            for number in ("101", "102")
+        ]
+        cls.users = [User.objects.create_user(f"reviewer{i}") for i in range(25)]
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def assertAggregates(self, room, *ratings):
+        room.refresh_from_db()
+        self.assertEqual(room.review_count, len(ratings))
+        self.assertEqual(room.rating_sum, sum(ratings))
+        for stars in range(1, 6):
+            self.assertEqual(getattr(room, f"rating_{stars}"), ratings.count(stars), stars)
+
+    def test_reviews_keep_room_aggregates(self):
+        first = RoomReview.objects.create(user=self.users[0], room=self.rooms[0], rating=5)
+        RoomReview.objects.create(user=self.users[1], room=self.rooms[0], rating=3)
+        self.assertAggregates(self.rooms[0], 5, 3)
+        self.assertEqual(self.rooms[0].average_rating, 4)
+
+        first.rating = 2
+        first.save()
+        self.assertAggregates(self.rooms[0], 2, 3)
+
+        first.room = self.rooms[1]
+        first.save()
+        self.assertAggregates(self.rooms[0], 3)
+        self.assertAggregates(self.rooms[1], 2)
+
+        # Deleting a copy loaded before the move counts the stored row
+        stale = RoomReview.objects.get(pk=first.pk)
+        first.room = self.rooms[0]
+        first.rating = 4
+        first.save()
+        stale.delete()
+        self.assertAggregates(self.rooms[0], 3)
+        self.assertAggregates(self.rooms[1])
+
+    def test_room_detail_pages_reviews(self):
+        for i, user in enumerate(self.users):
+            RoomReview.objects.create(user=user, room=self.rooms[0], rating=1 + i % 5)
+        url = reverse("room_detail", args=[self.rooms[0].id])
+        response = self.client.get(url)
+        self.assertEqual(response.context["avg_rating"], 3)
+        self.assertEqual(len(response.context["reviews"]), 20)
+        self.assertTrue(response.context["page"].has_more)
+
+        rest = self.client.get(url, {"cursor": response.context["page"].next_cursor})
+        self.assertEqual(len(rest.context["reviews"]), 5)
+        self.assertFalse(rest.context["page"].has_more)
+        seen = {review.id for review in response.context["reviews"]} | {review.id for review in rest.context["reviews"]}
+        self.assertEqual(seen, set(RoomReview.objects.values_list("id", flat=True)))
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+
+    def upload(self, size, mode="RGB", name="room.jpg", fmt="JPEG"):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new(mode, size, "navy").save(buffer, fmt)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    def test_upload_builds_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            room_type = RoomType.objects.create(
+                name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+                capacity=2, amenities="WiFi", image=self.upload((3000, 2000)),
+            )
+        room_type.refresh_from_db()
+        widths = [width for width, _ in room_type.image_variants["webp"]]
+        self.assertEqual(widths, [480, 1200, 2400])
+        self.assertEqual(room_type.image_variants["fallback_format"], "jpeg")
+        self.assertTrue(room_type.image_url.endswith("-480w.jpeg"))
+
+        html = Template('{% load images %}{% picture image alt="Deluxe" %}').render(
+            Context({"image": room_type.responsive_image})
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn("-2400w.webp 2400w", html)
+
+    def test_small_image_is_not_upscaled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            room_type = RoomType.objects.create(
+                name="Suite", description="Room", price_per_night=Decimal("7500.00"),
+                capacity=4, amenities="WiFi", image=self.upload((800, 600), "RGBA", "room.png", "PNG"),
+            )
+        room_type.refresh_from_db()
+        self.assertEqual([w for w, _ in room_type.image_variants["fallback"]], [480, 800])
+        # Transparency survives in a PNG fallback
+        self.assertEqual(room_type.image_variants["fallback_format"], "png")
+
+    def test_fallback_without_variants_serves_original(self):
+        room_type = RoomType(name="Standard")
+        self.assertTrue(room_type.image_url.endswith("images/standard.jpeg"))
+
+    def test_variants_are_built_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            room_type = RoomType.objects.create(
+                name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+                capacity=2, amenities="WiFi", image=self.upload((3000, 2000)),
+            )
+        with self.captureOnCommitCallbacks() as callbacks:
+            room_type.image = self.upload((1000, 800), name="new.jpg")
+            room_type.save()
+            # The previous image's variants are dropped, the new ones not built yet
+            room_type.refresh_from_db()
+            self.assertEqual(room_type.image_variants, {})
+        for callback in callbacks:
+            callback()
+        room_type.refresh_from_db()
+        self.assertEqual([w for w, _ in room_type.image_variants["webp"]], [480, 1000])
+
+    def test_static_manifest_reloads_when_rebuilt(self):
+        self.enterContext(mock.patch.object(images, "_static_manifest", None))
+        self.assertIsNone(images.static_image("images/logo.png").entry.get("fallback"))
+        # As if build_image_variants ran in another process
+        entry = {"fallback": [[48, "variants/logo-48w.png"]], "fallback_format": "png"}
+        default_storage.save(images.STATIC_MANIFEST, ContentFile(json.dumps({"images/logo.png": entry}).encode()))
+        self.assertTrue(images.static_image("images/logo.png").src.endswith("variants/logo-48w.png"))
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.room = Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def test_unchanged_page_is_not_modified(self):
+        url = reverse("room_detail", args=[self.room.id])
+        etag = self.client.get(url)["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RoomReview.objects.create(user=self.guest, room=self.room, rating=5)
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_booking_changes_search_etag(self):
+        check_in = date.today() + timedelta(days=5)
+        search = {"check_in": check_in, "check_out": check_in + timedelta(days=2), "guests": 1}
+        etag = self.client.get(reverse("room_list"), search)["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Booking.objects.create(
+                guest=self.guest, room=self.room, check_in_date=check_in,
+                check_out_date=check_in + timedelta(days=1), number_of_guests=1,
+                total_price=Decimal("4000.00"),
+            )
+        response = self.client.get(reverse("room_list"), search, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+        # Logging in changes the header, so the page must not be reused
+        etag = response["ETag"]
+        self.client.force_login(self.guest)
+        response = self.client.get(reverse("room_list"), search, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+
+class RoomCardCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        for number in ("101", "102", "103"):
+            Room.objects.create(room_number=number, room_type=cls.room_type, floor_number=1)
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def rendered(self, response, name):
+        return [template.name for template in response.templates].count(name)
+
+    def test_cards_are_cached_and_share_room_type(self):
+        response = self.client.get(reverse("room_list"))
+        self.assertEqual(self.rendered(response, "hotel/includes/room_card.html"), 3)
+        self.assertEqual(self.rendered(response, "hotel/includes/room_type_heading.html"), 1)
+
+        response = self.client.get(reverse("room_list"))
+        self.assertEqual(self.rendered(response, "hotel/includes/room_card.html"), 0)
+        self.assertContains(response, "Room 102")
+
+    def test_room_type_change_rerenders_cards(self):
+        self.client.get(reverse("room_list"))
+        self.room_type.price_per_night = Decimal("4500.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room_type.save()
+        response = self.client.get(reverse("room_list"))
+        self.assertContains(response, "4500.00", count=3)
+        self.assertEqual(self.rendered(response, "hotel/includes/room_type_heading.html"), 1)
+
+
+class CatalogueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        cls.room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.rooms = [
+            Room.objects.create(room_number=number, room_type=cls.room_type, floor_number=1)
+            for number in ("101", "102", "103")
+        ]
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def test_lookups_are_served_from_memory(self):
+        catalogue.room(self.rooms[0].id)
+        with self.assertNumQueries(0):
+            room = catalogue.room(self.rooms[0].id)
+            self.assertEqual(room.room_type.price_per_night, Decimal("4000.00"))
+            self.assertEqual([r.room_number for r in catalogue.rooms()], ["101", "102", "103"])
+        with self.assertRaises(AttributeError):
+            room.status = "occupied"
+
+    def test_change_reloads_catalogue(self):
+        catalogue.room(self.rooms[0].id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Room.objects.filter(pk=self.rooms[1].pk).update(is_active=False)
+            self.rooms[0].status = "maintenance"
+            self.rooms[0].save()
+        self.assertEqual(catalogue.room(self.rooms[0].id).status, "maintenance")
+        self.assertIsNone(catalogue.room(self.rooms[1].id))
+
+    def test_room_list_pages_through_catalogue(self):
+        response = self.client.get(reverse("room_list"), {"page_size": 2})
+        self.assertEqual([room.room_number for room in response.context["rooms"]], ["101", "102"])
+        response = self.client.get(reverse("room_list"), {
+            "page_size": 2, "cursor": response.context["page"].next_cursor,
+        })
+        self.assertEqual([room.room_number for room in response.context["rooms"]], ["103"])
+
+
+class AsyncCatalogueViewTests(TestCase):
+    """home, room_list and room_detail through the async request handler."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        cls.room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.rooms = [
+            Room.objects.create(room_number=number, room_type=cls.room_type, floor_number=1)
+            for number in ("101", "102")
+        ]
+        reviewer = User.objects.create(username="reviewer")
+        RoomReview.objects.create(user=reviewer, room=cls.rooms[0], rating=4, comment="Good")
+
+    def setUp(self):
+        availability_index.invalidate()
+        for cache in caches.all():
+            cache.clear()
+
+    def test_views_stay_async_through_their_decorators(self):
+        for view in (views.home, views.room_list, views.room_detail):
+            self.assertTrue(iscoroutinefunction(view), view.__name__)
+
+    async def test_home(self):
+        response = await self.async_client.get(reverse("home"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([room_type.name for room_type in response.context["room_types"]], ["Deluxe"])
+
+    async def test_room_list_search(self):
+        check_in = date.today() + timedelta(days=5)
+        await Booking.objects.acreate(
+            guest=self.guest, room=self.rooms[0], check_in_date=check_in,
+            check_out_date=check_in + timedelta(days=2), number_of_guests=1,
+            total_price=Decimal("8000.00"), status="confirmed",
+        )
+        response = await self.async_client.get(reverse("room_list"), {
+            "check_in": check_in, "check_out": check_in + timedelta(days=2), "guests": 2,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([room.room_number for room in response.context["rooms"]], ["102"])
+
+    async def test_room_detail(self):
+        await self.async_client.aforce_login(self.guest)
+        response = await self.async_client.get(reverse("room_detail", args=[self.rooms[0].id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([review.comment for review in response.context["reviews"]], ["Good"])
+        # Resolved before rendering, not left lazy for the template
+        self.assertIsInstance(response.context["user"], User)
+        self.assertEqual(response.context["user"].username, "guest")
+
+    async def test_room_detail_missing_room(self):
+        response = await self.async_client.get(reverse("room_detail", args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class AvailabilityIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.rooms = [
+            Room.objects.create(room_number=number, room_type=room_type, floor_number=1)
+            for number in ("101", "102")
+        ]
+
+    def setUp(self):
+        availability_index.invalidate()
+        for cache in caches.all():
+            cache.clear()
+        self.check_in = date.today() + timedelta(days=5)
+        self.check_out = self.check_in + timedelta(days=2)
+
+    def book(self, room):
+        with self.captureOnCommitCallbacks(execute=True):
+            return services.create_booking(self.guest, room, self.check_in, self.check_out, 1)
+
+    def test_matches_query(self):
+        self.book(self.rooms[0])
+        day = timedelta(days=1)
+        for stay in [
+            (self.check_in, self.check_out),
+            (self.check_in - day, self.check_in),
+            (self.check_out, self.check_out + day),
+            (self.check_in - day, self.check_in + day),
+            (self.check_out - day, self.check_out + day),
+        ]:
+            self.assertEqual(availability_index.booked_room_ids(*stay), set(booked_rooms_query(*stay)))
+            self.assertEqual(
+                availability_index.is_available(self.rooms[0].id, *stay),
+                self.rooms[0].id not in booked_rooms_query(*stay),
+            )
+
+    def test_sees_writes_of_other_processes(self):
+        # Another worker's copy: the booking signals here never update it
+        other = AvailabilityIndex()
+        self.assertEqual(other.booked_room_ids(self.check_in, self.check_out), set())
+
+        booking = self.book(self.rooms[0])
+        self.assertEqual(other.booked_room_ids(self.check_in, self.check_out), {self.rooms[0].id})
+        # Nights nobody booked are answered from memory
+        with self.assertNumQueries(0):
+            self.assertEqual(other.booked_room_ids(self.check_out, self.check_out + timedelta(days=3)), set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            services.cancel_booking(booking.id, self.guest)
+        self.assertEqual(other.booked_room_ids(self.check_in, self.check_out), set())
+
+    def test_search_after_another_process_books(self):
+        self.client.get(reverse("room_list"), {
+            "check_in": self.check_in, "check_out": self.check_out, "guests": 1,
+        })
+        # Written as another worker would: bump the nights, leave this index alone
+        booking = services.create_booking(self.guest, self.rooms[0], self.check_in, self.check_out, 1)
+        search_cache.invalidate_stay(booking.check_in_date, booking.check_out_date)
+
+        response = self.client.get(reverse("room_list"), {
+            "check_in": self.check_in, "check_out": self.check_out, "guests": 1,
+        })
+        self.assertEqual([room.room_number for room in response.context["rooms"]], ["102"])
+
+
+class HoldExpiryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.room = Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+
+    def setUp(self):
+        availability_index.invalidate()
+        for cache in caches.all():
+            cache.clear()
+        self.check_in = date.today() + timedelta(days=5)
+        self.check_out = self.check_in + timedelta(days=2)
+
+    def expired_hold(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = services.create_booking(self.guest, self.room, self.check_in, self.check_out, 1)
+        self.assertFalse(availability_index.is_available(self.room.id, self.check_in, self.check_out))
+        Booking.objects.filter(pk=booking.pk).update(
+            hold_expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        booking.refresh_from_db()
+        return booking
+
+    def test_sweep_cancels_expired_holds(self):
+        booking = self.expired_hold()
+        availability_index.invalidate()
+        self.assertTrue(availability_index.is_available(self.room.id, self.check_in, self.check_out))
+        self.assertNotIn(self.room.id, booked_rooms_query(self.check_in, self.check_out))
+
+        with self.assertRaises(services.InvalidTransition):
+            services.confirm_booking(booking.id, self.guest, "cash")
+
+        self.assertEqual(holds.sweep(), 1)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, "cancelled")
+        self.assertFalse(RoomNight.objects.filter(booking=booking).exists())
+        self.assertEqual(DashboardStats.load().cancelled_bookings, 1)
+
+    def test_new_booking_takes_over_expired_hold(self):
+        booking = self.expired_hold()
+        with self.captureOnCommitCallbacks(execute=True):
+            services.create_booking(self.guest, self.room, self.check_in, self.check_out, 1)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, "cancelled")
+        self.assertEqual(holds.sweep(), 0)
+
+    def test_cached_search_shows_room_once_hold_expires(self):
+        search = {"check_in": self.check_in, "check_out": self.check_out, "guests": 1}
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = services.create_booking(self.guest, self.room, self.check_in, self.check_out, 1)
+        response = self.client.get(reverse("room_list"), search)
+        self.assertEqual(list(response.context["rooms"]), [])
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+
+        # No sweep, no write: only the clock moves on
+        later = booking.hold_expires_at + timedelta(seconds=1)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            response = self.client.get(reverse("room_list"), search, headers={"if-none-match": etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual([room.id for room in response.context["rooms"]], [self.room.id])
+            self.assertNotEqual(response["ETag"], etag)
+            response = self.client.get(
+                reverse("room_list"), search, headers={"if-modified-since": last_modified}
+            )
+            self.assertEqual(response.status_code, 200)
+
+
+class NightAuditTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.rooms = [
+            Room.objects.create(room_number=str(101 + i), room_type=room_type, floor_number=1)
+            for i in range(3)
+        ]
+
+    def stay(self, room, check_in, nights=2):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(
+                guest=self.guest, room=room, check_in_date=check_in,
+                check_out_date=check_in + timedelta(days=nights), number_of_guests=1,
+                total_price=Decimal("8000.00"), status="confirmed",
+            )
+        return booking
+
+    def test_paying_for_a_future_stay_does_not_occupy_the_room(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = services.create_booking(
+                self.guest, self.rooms[0], date.today() + timedelta(days=30),
+                date.today() + timedelta(days=32), 1,
+            )
+            services.confirm_booking(booking.id, self.guest, "cash")
+        self.rooms[0].refresh_from_db()
+        self.assertEqual(self.rooms[0].status, "available")
+
+    def test_audit_completes_stays_and_syncs_rooms(self):
+        today = date.today()
+        departed = self.stay(self.rooms[0], today - timedelta(days=2))
+        self.stay(self.rooms[1], today)
+        Room.objects.filter(pk=self.rooms[0].pk).update(status="occupied")
+        Room.objects.filter(pk=self.rooms[2].pk).update(status="maintenance")
+        DashboardStats.rebuild()
+
+        run = audit.run(today)
+        self.assertEqual((run.stays_completed, run.rooms_freed, run.rooms_occupied), (1, 1, 1))
+        departed.refresh_from_db()
+        self.assertEqual(departed.status, "completed")
+        self.assertEqual(
+            list(Room.objects.order_by("room_number").values_list("status", flat=True)),
+            ["available", "occupied", "maintenance"],
+        )
+        self.assertEqual(DashboardStats.load().occupied_rooms, 1)
+        self.assertEqual(DashboardStats.load().confirmed_bookings, 1)
+
+        # A second run for the same day changes nothing
+        run = audit.run(today)
+        self.assertEqual((run.stays_completed, run.rooms_freed, run.rooms_occupied), (0, 0, 0))
+        self.assertEqual(NightAuditRun.objects.count(), 2)
+
+
+class ArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.room = Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+
+    def setUp(self):
+        caches["default"].clear()
+        self.client.login(username="guest", password="secret")
+        today = date.today()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.old = Booking.objects.create(
+                guest=self.guest, room=self.room, check_in_date=today - timedelta(days=500),
+                check_out_date=today - timedelta(days=498), number_of_guests=1,
+                total_price=Decimal("8000.00"), status="completed",
+            )
+            Payment.objects.create(
+                booking=self.old, amount=Decimal("8000.00"), payment_method="cash",
+                transaction_id="OLD1", status="completed",
+            )
+            self.recent = Booking.objects.create(
+                guest=self.guest, room=self.room, check_in_date=today + timedelta(days=10),
+                check_out_date=today + timedelta(days=12), number_of_guests=1,
+                total_price=Decimal("8000.00"), status="pending",
+            )
+
+    def test_archive_moves_old_bookings_and_keeps_totals(self):
+        stats = DashboardStats.load()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(archive.archive(archive.cutoff_date(365), batch_size=1), 1)
+
+        self.assertEqual(list(Booking.objects.values_list("id", flat=True)), [self.recent.id])
+        self.assertFalse(Payment.objects.exists())
+        archived = ArchivedBooking.objects.get()
+        self.assertEqual((archived.id, archived.status, archived.nights), (self.old.id, "completed", 2))
+        self.assertEqual(ArchivedPayment.objects.get().transaction_id, "OLD1")
+
+        after = DashboardStats.load()
+        self.assertEqual(
+            (after.total_bookings, after.total_revenue), (stats.total_bookings, stats.total_revenue)
+        )
+        rebuilt = DashboardStats.rebuild()
+        self.assertEqual(
+            (rebuilt.total_bookings, rebuilt.total_revenue), (stats.total_bookings, stats.total_revenue)
+        )
+
+        # Nothing left to archive
+        self.assertEqual(archive.archive(archive.cutoff_date(365)), 0)
+
+    def test_guest_history_reads_both_tables(self):
+        archive.archive(archive.cutoff_date(365))
+
+        response = self.client.get(reverse("my_bookings"))
+        self.assertEqual([booking.id for booking in response.context["bookings"]], [self.recent.id, self.old.id])
+
+        response = self.client.get(reverse("my_bookings"), {"page_size": 1})
+        self.assertEqual([booking.id for booking in response.context["bookings"]], [self.recent.id])
+        response = self.client.get(
+            reverse("my_bookings"), {"page_size": 1, "cursor": response.context["page"].next_cursor}
+        )
+        self.assertEqual([booking.id for booking in response.context["bookings"]], [self.old.id])
+
+        response = self.client.get(reverse("booking_details", args=[self.old.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["payment"].transaction_id, "OLD1")
+        self.assertNotContains(response, reverse("payment", args=[self.old.id]))
+
+        # Still counts as a stay for reviews
+        response = self.client.get(reverse("add_review", args=[self.room.id]))
+        self.assertEqual(response.status_code, 200)
+
+        rows = list(exports.EXPORTS["bookings"].rows(
+            date.today() - timedelta(days=600), date.today() + timedelta(days=30)
+        ))
+        self.assertEqual([row[0] for row in rows], [self.old.id, self.recent.id])
+
+
+class ReplicaRouterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.room = Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+
+    def setUp(self):
+        caches["default"].clear()
+
+    def routed(self, model, cookies=None):
+        """Where a ``@read_replica`` view behind the middleware reads ``model`` from."""
+        router = replicas.ReplicaRouter()
+
+        @replicas.read_replica
+        def view(request):
+            return router.db_for_read(model)
+
+        request = RequestFactory().get("/")
+        request.COOKIES.update(cookies or {})
+        return replicas.PrimaryPinMiddleware(view)(request)
+
+    @override_settings(DATABASE_REPLICAS=["replica"])
+    def test_catalogue_reads_go_to_the_replica_unless_pinned(self):
+        router = replicas.ReplicaRouter()
+        self.assertEqual(self.routed(Room), "replica")
+        # Sessions and users, and reads outside @read_replica views, stay on the primary
+        self.assertIsNone(self.routed(User))
+        self.assertIsNone(router.db_for_read(Room))
+        self.assertEqual(router.db_for_write(Room), "default")
+
+        pinned = {replicas.PIN_COOKIE: str(time.time() + 60)}
+        self.assertIsNone(self.routed(Room, pinned))
+        expired = {replicas.PIN_COOKIE: str(time.time() - 1)}
+        self.assertEqual(self.routed(Room, expired), "replica")
+
+        @replicas.read_replica
+        def loads_a_mirror(request):
+            with replicas.primary():
+                return router.db_for_read(Room)
+        self.assertIsNone(loads_a_mirror(None))
+
+    # The primary stands in for the replica so the pages can be requested
+    @override_settings(DATABASE_REPLICAS=["default"])
+    def test_writing_pins_the_browser_to_the_primary(self):
+        self.client.login(username="guest", password="secret")
+        response = self.client.get(reverse("room_list"))
+        self.assertNotIn(replicas.PIN_COOKIE, response.cookies)
+
+        check_in = date.today() + timedelta(days=5)
+        response = self.client.post(reverse("book_room", args=[self.room.id]), {
+            "check_in_date": check_in,
+            "check_out_date": check_in + timedelta(days=2),
+            "number_of_guests": 1,
+        })
+        self.assertEqual(response.status_code, 302)
+        cookie = response.cookies[replicas.PIN_COOKIE]
+        self.assertGreater(float(cookie.value), time.time())
+        self.assertEqual(cookie["max-age"], 10)
+
+    @override_settings(DATABASE_REPLICAS=["default"])
+    def test_catalogue_reloads_once_the_replica_has_caught_up(self):
+        @replicas.read_replica
+        def lookup(request):
+            return catalogue.room(self.room.id)
+
+        catalogue.invalidate_everywhere()
+        self.assertEqual(lookup(None).status, "available")
+        version = versions.get(search_cache.CATALOGUE_VERSION)
+        # The replica had not applied this write when the catalogue loaded
+        Room.objects.filter(pk=self.room.pk).update(status="maintenance")
+        self.assertEqual(lookup(None).status, "available")
+
+        later = time.time() + replicas.max_lag()
+        with mock.patch("hotel.catalogue.time.time", return_value=later):
+            self.assertEqual(lookup(None).status, "maintenance")
+        # Searches and pages built from the lagging copy expire
+        self.assertNotEqual(versions.get(search_cache.CATALOGUE_VERSION), version)
+
+    @override_settings(DATABASE_REPLICAS=["default"])
+    def test_primary_reads_reload_a_catalogue_from_the_replica(self):
+        @replicas.read_replica
+        def lookup(request):
+            return catalogue.room(self.room.id)
+
+        catalogue.invalidate_everywhere()
+        lookup(None)
+        Room.objects.filter(pk=self.room.pk).update(status="maintenance")
+        # e.g. make_booking, which is not a @read_replica view
+        self.assertEqual(catalogue.room(self.room.id).status, "maintenance")
+        self.assertEqual(lookup(None).status, "maintenance")
+
+    def test_middleware_is_skipped_without_replicas(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            replicas.PrimaryPinMiddleware(lambda request: None)
+
+
+class SQLiteTuningTests(TestCase):
+    def test_file_database_gets_wal_and_a_queued_write_lock(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            wrapper = DatabaseWrapper({
+                **connection.settings_dict,
+                "NAME": f"{tmpdir}/tuned.sqlite3",
+                "OPTIONS": {
+                    "journal_mode": "WAL", "synchronous": "NORMAL", "busy_timeout": 250,
+                    "mmap_size": 1024 * 1024, "transaction_mode": "IMMEDIATE",
+                    "serialize_writes": True,
+                },
+            }, alias="tuned")
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    self.assertEqual(cursor.fetchone()[0], "wal")
+                    cursor.execute("PRAGMA synchronous")
+                    self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+                    cursor.execute("PRAGMA busy_timeout")
+                    self.assertEqual(cursor.fetchone()[0], 250)
+
+                # What atomic() does around the outermost block
+                wrapper._start_transaction_under_autocommit()
+                self.assertTrue(wrapper.write_lock.locked())
+                wrapper.commit()
+                self.assertFalse(wrapper.write_lock.locked())
+
+                wrapper._start_transaction_under_autocommit()
+                wrapper.rollback()
+                self.assertFalse(wrapper.write_lock.locked())
+            finally:
+                wrapper.close()
+
+
+class BenchSeedTests(TestCase):
+    def test_seeded_reviews_and_payments_match_the_aggregates(self):
+        room_ids = bench.seed_catalogue(5)
+        guest_ids = bench.seed_guests(10)
+        bench.seed_bookings(200, room_ids, guest_ids)
+        bench.seed_payments()
+        self.assertEqual(
+            Payment.objects.count(),
+            Booking.objects.filter(status__in=["confirmed", "completed"]).count(),
+        )
+
+        created = bench.seed_reviews(30, room_ids, guest_ids)
+        self.assertEqual(RoomReview.objects.count(), created)
+        for room in Room.objects.all():
+            ratings = list(room.reviews.values_list("rating", flat=True))
+            self.assertEqual((room.review_count, room.rating_sum), (len(ratings), sum(ratings)))
+
+
+class ProfilingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+
+    def setUp(self):
+        for alias in ("default", "search", "fragments"):
+            caches[alias].clear()
+
+    def test_disabled_by_default(self):
+        self.assertNotIn("Server-Timing", self.client.get(reverse("room_list")).headers)
+
+    @override_settings(PROFILING_ENABLED=True, PROFILING_SLOW_MS=0, PROFILING_SAMPLE_RATE=1)
+    def test_server_timing_and_slow_request_log(self):
+        with self.assertLogs("hotel_management.profiling", "WARNING") as logs:
+            response = self.client.get(reverse("room_list"))
+
+        timing = dict(
+            re.match(r"(\w+);dur=([\d.]+)", part.strip()).groups()
+            for part in response.headers["Server-Timing"].split(",")
+        )
+        self.assertEqual(set(timing), {"db", "tpl", "app", "total"})
+        self.assertGreater(float(timing["tpl"]), 0)
+        self.assertIn("queries", response.headers["Server-Timing"])
+
+        self.assertIn("GET /rooms/ 200", logs.output[0])
+
+
+class MetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user("staff", password="secret", is_staff=True)
+        room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        Room.objects.create(room_number="101", room_type=room_type, floor_number=1)
+
+    def setUp(self):
+        for alias in ("default", "search", "fragments"):
+            caches[alias].clear()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.enterContext(override_settings(METRICS_ENABLED=True, METRICS_DB=f"{tmpdir.name}/metrics.sqlite3"))
+        metrics.registry.reset()
+
+    def test_staff_only(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_latency_queries_and_funnel(self):
+        check_in = date.today() + timedelta(days=3)
+        self.client.get(reverse("room_list"), {
+            "check_in": check_in, "check_out": check_in + timedelta(days=2), "guests": 1,
+        })
+        self.client.get(reverse("home"))
+        self.client.login(username="staff", password="secret")
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn("# TYPE hotel_http_request_duration_seconds histogram", text)
+        self.assertIn(
+            'hotel_http_request_duration_seconds_count{method="GET",route="room_list",status="2xx"} 1', text
+        )
+        self.assertIn(
+            'hotel_http_request_duration_seconds_bucket{le="+Inf",method="GET",route="home",status="2xx"} 1', text
+        )
+        self.assertIn('hotel_http_request_queries_count{route="room_list"} 1', text)
+        self.assertIn('hotel_booking_funnel_total{step="search"} 1', text)
+
+    def test_nothing_is_recorded_unless_enabled(self):
+        with override_settings(METRICS_ENABLED=False):
+            metrics.BOOKING_FUNNEL.inc(step="search")
+            with self.assertRaises(MiddlewareNotUsed):
+                metrics.MetricsMiddleware(lambda request: None)
+        self.assertEqual(metrics.registry._pending, {})
+
+    def test_failed_flush_keeps_increments(self):
+        with mock.patch.object(metrics.threading, "Thread") as thread:
+            metrics.BOOKING_FUNNEL.inc(step="search")
+            thread.reset_mock()
+            metrics.registry._last_flush = 0  # a flush is due
+            with override_settings(METRICS_DB="/nonexistent/metrics.sqlite3"), \
+                    self.assertRaises(sqlite3.Error):
+                metrics.registry.flush()
+        # Merged back without scheduling another flush
+        thread.assert_not_called()
+        metrics.registry.flush()
+        self.assertEqual(
+            metrics.registry.samples(), [("hotel_booking_funnel_total", 'step="search"', 1.0)]
+        )
+
+    def test_scrape_renders_totals_when_flush_fails(self):
+        metrics.BOOKING_FUNNEL.inc(step="search")
+        metrics.registry.flush()
+        self.client.login(username="staff", password="secret")
+        with mock.patch.object(metrics.registry, "flush", side_effect=sqlite3.OperationalError("locked")), \
+                self.assertLogs("hotel_management.metrics", "WARNING"):
+            response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('hotel_booking_funnel_total{step="search"} 1', response.content.decode())
+
+
+class RateCalendarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guest = User.objects.create_user("guest", password="secret")
+        cls.room_type = RoomType.objects.create(
+            name="Deluxe", description="Room", price_per_night=Decimal("4000.00"),
+            capacity=2, amenities="WiFi",
+        )
+        cls.room = Room.objects.create(room_number="101", room_type=cls.room_type, floor_number=1)
+        # A Monday to Monday week a month out
+        cls.monday = date.today() + timedelta(days=30)
+        cls.monday -= timedelta(days=cls.monday.weekday())
+        cls.sunday = cls.monday + timedelta(days=6)
+        # Wednesday on: 6000; Friday and Saturday 5000; Saturday's event 9000
+        RoomRate.objects.create(
+            room_type=cls.room_type, name="Season", price_per_night=Decimal("6000.00"),
+            start_date=cls.monday + timedelta(days=2), end_date=cls.sunday,
+        )
+        RoomRate.objects.create(
+            room_type=cls.room_type, name="Weekend", price_per_night=Decimal("5000.00"), weekdays="45",
+        )
+        RoomRate.objects.create(
+            room_type=cls.room_type, name="Event", price_per_night=Decimal("9000.00"), priority=1,
+            start_date=cls.sunday - timedelta(days=1), end_date=cls.sunday - timedelta(days=1),
+        )
+        cls.week = (cls.room_type.id, cls.monday, cls.monday + timedelta(days=7))
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def test_overrides_by_precedence(self):
+        nights = [
+            rates.calendar.quote(self.room_type.id, day, day + timedelta(days=1))
+            for day in (self.monday + timedelta(days=i) for i in range(7))
+        ]
+        self.assertEqual(nights, [Decimal(price) for price in (
+            "4000.00", "4000.00", "6000.00", "6000.00", "5000.00", "9000.00", "6000.00",
+        )])
+        self.assertEqual(rates.calendar.quote(*self.week), Decimal("40000.00"))
+
+    def test_beyond_calendar_priced_night_by_night(self):
+        with override_settings(RATE_CALENDAR_DAYS=7):
+            rates.calendar.invalidate()
+            self.assertEqual(rates.calendar.quote(*self.week), Decimal("40000.00"))
+        rates.calendar.invalidate()
+
+    def test_quote_many_without_queries(self):
+        rates.calendar.quote(*self.week)
+        two_nights = (self.room_type.id, self.monday, self.monday + timedelta(days=2))
+        with self.assertNumQueries(0):
+            totals = rates.calendar.quote_many([self.week, two_nights, self.week])
+        self.assertEqual(totals, [Decimal("40000.00"), Decimal("8000.00"), Decimal("40000.00")])
+
+    def test_rate_change_rebuilds_calendar(self):
+        rates.calendar.quote(*self.week)
+        with self.captureOnCommitCallbacks(execute=True):
+            RoomRate.objects.filter(name="Event").delete()
+        self.assertEqual(rates.calendar.quote(*self.week), Decimal("36000.00"))
+
+    def test_search_and_booking_use_quotes(self):
+        check_in, check_out = self.week[1:]
+        response = self.client.get(reverse("room_list"), {
+            "check_in": check_in, "check_out": check_out, "guests": 1,
+        })
+        self.assertEqual(response.context["stay_totals"], {self.room_type.id: Decimal("40000.00")})
+        self.assertContains(response, "₹40000.00 for 7 nights")
+
+        booking = services.create_booking(self.guest, catalogue.room(self.room.id), check_in, check_out, 1)
+        self.assertEqual(booking.total_price, Decimal("40000.00"))
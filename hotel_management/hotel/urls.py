@@ -12,5 +12,6 @@ urlpatterns = [
     path("booking/cancel/<int:booking_id>/",views.cancel_booking,name="cancel_booking"),
     path("room/<int:room_id>/review/", views.add_review, name="add_review"),
     path("admin-dashboard/", views.admin_dashboard, name="admin_dashboard"),
+    path("admin-dashboard/export/<str:kind>/", views.export_data, name="export_data"),
 
 ]
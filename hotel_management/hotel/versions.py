@@ -0,0 +1,84 @@
+"""
+Shared version counters.
+
+A counter is a cache key holding an integer that is bumped whenever the
+data it stands for changes. Anything derived from that data can store the
+versions it was built from and treat itself as stale once they move on.
+Counters live in the cache named by ``settings.VERSION_CACHE_ALIAS`` so
+every worker sees the same values when that cache is shared (Redis,
+Memcached, database cache). Each bump also records when it happened, for
+HTTP ``Last-Modified``.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+KEY_PREFIX = "version:"
+MODIFIED_PREFIX = "modified:"
+
+
+def _cache():
+    return caches[getattr(settings, "VERSION_CACHE_ALIAS", "default")]
+
+
+def _seed():
+    # A counter that was evicted or never set starts from the clock, so it
+    # can never come back with a value that older derived data recorded.
+    return time.time_ns()
+
+
+def get_many(names):
+    """Current value of each counter in ``names`` as a dict."""
+    cache = _cache()
+    keys = {KEY_PREFIX + name: name for name in names}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        cache.add(key, _seed(), timeout=None)
+        found[key] = cache.get(key)
+    return {keys[key]: value for key, value in found.items()}
+
+
+def get(name):
+    return get_many([name])[name]
+
+
+def get_with_modified(names):
+    """``(get_many(names), last_modified)`` in one cache read.
+
+    ``last_modified`` is the latest time, as a Unix timestamp, any of the
+    counters was bumped. A counter with no recorded time counts as
+    changed now.
+    """
+    cache = _cache()
+    found = cache.get_many(
+        [KEY_PREFIX + name for name in names] + [MODIFIED_PREFIX + name for name in names]
+    )
+    now = time.time()
+    values = {}
+    last_modified = 0
+    for name in names:
+        value = found.get(KEY_PREFIX + name)
+        if value is None:
+            cache.add(KEY_PREFIX + name, _seed(), timeout=None)
+            value = cache.get(KEY_PREFIX + name)
+        values[name] = value
+
+        modified = found.get(MODIFIED_PREFIX + name)
+        if modified is None:
+            cache.add(MODIFIED_PREFIX + name, now, timeout=None)
+            modified = now
+        last_modified = max(last_modified, modified)
+    return values, last_modified
+
+
+def bump(*names):
+    cache = _cache()
+    now = time.time()
+    for name in names:
+        key = KEY_PREFIX + name
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _seed(), timeout=None)
+    cache.set_many({MODIFIED_PREFIX + name: now for name in names}, timeout=None)
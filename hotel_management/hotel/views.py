@@ -2,81 +2,216 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from datetime import date
-import uuid
-from django.db.models import Q
+import asyncio
+from operator import attrgetter
+from asgiref.sync import sync_to_async
 from .models import RoomReview
 from .forms import RoomReviewForm
-from django.db.models import Avg
 from django.contrib.admin.views.decorators import staff_member_required
-from django.db.models import Count, Sum
 
-
-
-from .models import RoomType, Room, Booking, Payment
-from .forms import RoomSearchForm, BookingForm, PaymentForm
+from .models import Room, Booking, Payment, DashboardStats
+from .forms import RoomSearchForm, BookingForm, PaymentForm, ExportForm
+from .availability import index as availability_index
+from .inventory import RoomUnavailable
+from . import services
+from .pagination import apaginate, paginate_list, paginate_merged
+from .catalogue import catalogue
+from . import search_cache
+from . import exports
+from . import conditional
+from . import archive
+from . import rates
+from .conditional import conditional_page
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
+from hotel_management.metrics import BOOKING_FUNNEL
+from hotel_management.querybudget import query_budget
+from hotel_management.replicas import read_replica
+
+
+# ASYNC CATALOGUE VIEWS
+# home, room_list and room_detail are public, read-only and the most
+# requested pages, so they are async and do not tie up a worker thread
+# under ASGI (hotel_management.asgi) while they wait on the database or a
+# slow client. Each hop between the event loop and a sync thread has a
+# cost, so in-process and CPU-bound (manage.py bench_asgi) they are slower
+# than under WSGI; deploy with ASGI only where requests mostly wait.
+async def load_request_state(request):
+    """Resolve the lazy user and session with the async API.
+
+    base.html reads ``user`` and ``messages``, and the template is rendered
+    synchronously; without this the first access would query the database
+    from inside the event loop.
+    """
+    request.user = await request.auser()
+    await request.session.akeys()
+
+
+# CONDITIONAL GET
+# The counters each catalogue page is built from; see hotel.conditional.
+def catalogue_counters(request, *args, **kwargs):
+    return [search_cache.CATALOGUE_VERSION]
+
+
+def room_list_counters(request):
+    form = RoomSearchForm(request.GET)
+    if form.is_valid() and form.cleaned_data.get("check_in") and form.cleaned_data.get("check_out"):
+        return search_cache.version_names(
+            form.cleaned_data["check_in"], form.cleaned_data["check_out"]
+        ) + [rates.VERSION]
+    return [search_cache.CATALOGUE_VERSION]
+
+
+def room_list_timing(request):
+    # A search also changes when a hold hiding a room runs out
+    form = RoomSearchForm(request.GET)
+    if form.is_valid() and form.cleaned_data.get("check_in") and form.cleaned_data.get("check_out"):
+        # Kept for the view, so the search is looked up once
+        result = request.room_search = room_search(
+            form.cleaned_data["check_in"], form.cleaned_data["check_out"], form.cleaned_data.get("guests")
+        )
+        return result.expires, result.changed_at
+    return None, None
+
+
+def room_detail_counters(request, pk):
+    return [search_cache.CATALOGUE_VERSION, conditional.review_version(pk)]
 
 
 # HOME PAGE
-def home(request):
-    room_types = RoomType.objects.all()[:3]
-    return render(request, "hotel/home.html", {"room_types": room_types})
+# Two of the four queries only when this worker (re)loads the catalogue
+@query_budget(4)
+@conditional_page(catalogue_counters)
+@read_replica
+async def home(request):
+    room_types, _ = await asyncio.gather(
+        sync_to_async(catalogue.room_types)(),
+        load_request_state(request),
+    )
+    return render(request, "hotel/home.html", {"room_types": room_types[:3]})
 
 
 # ROOM LIST WITH SEARCH
-from django.db.models import Q
-
-def room_list(request):
-    rooms = Room.objects.filter(status="available")
-    form = RoomSearchForm(request.GET or None)
-
-    if request.GET and form.is_valid():
-        check_in = form.cleaned_data.get("check_in")
-        check_out = form.cleaned_data.get("check_out")
-        guests = form.cleaned_data.get("guests")
-
-        if check_in and check_out:
-            booked_rooms = Booking.objects.filter(
-                Q(check_in_date__lt=check_out) &
-                Q(check_out_date__gt=check_in),
-                status__in=["confirmed", "pending"]
-            ).values_list("room_id", flat=True)
-
-            rooms = rooms.exclude(id__in=booked_rooms)
-
-        if guests:
-            rooms = rooms.filter(room_type__capacity__gte=guests)
+def available_room_ids(check_in, check_out, guests):
+    booked = availability_index.booked_room_ids(check_in, check_out)
+    return [
+        room.id for room in catalogue.rooms()
+        if room.status == "available"
+        and room.id not in booked
+        and (not guests or room.room_type.capacity >= guests)
+    ]
+
+
+def room_search(check_in, check_out, guests):
+    """The ``search_cache.SearchResult`` for a stay."""
+    return search_cache.cached_search(
+        check_in, check_out, guests,
+        lambda: (
+            available_room_ids(check_in, check_out, guests),
+            availability_index.hold_expiry(check_in, check_out),
+        )
+    )
+
+
+def listed_rooms(search=None, result=None):
+    """Available rooms by room number; only those free for ``search``
+    (``check_in, check_out, guests``) when given, using its ``result``
+    if it has been looked up already."""
+    rooms = [room for room in catalogue.rooms() if room.status == "available"]
+    if search:
+        room_ids = set((result or room_search(*search)).room_ids)
+        rooms = [room for room in rooms if room.id in room_ids]
+    return rooms
+
+
+def search_results(search=None, result=None):
+    """``listed_rooms(search, result)`` and, for a search, the stay's total by room type."""
+    rooms = listed_rooms(search, result)
+    totals = rates.stay_totals(rooms, search[0], search[1]) if search else None
+    return rooms, totals
+
+
+@query_budget(5)
+@conditional_page(room_list_counters, room_list_timing)
+@read_replica
+async def room_list(request):
+    # Only bind the form for an actual search, not for ?cursor= paging links
+    searching = any(field in request.GET for field in RoomSearchForm.base_fields)
+    form = RoomSearchForm(request.GET if searching else None)
+
+    search = None
+    if searching and form.is_valid():
+        search = (
+            form.cleaned_data.get("check_in"),
+            form.cleaned_data.get("check_out"),
+            form.cleaned_data.get("guests"),
+        )
+
+    # The catalogue, search cache and availability index are blocking calls
+    # (the catalogue may reload); make them in one hop to the thread pool.
+    (rooms, stay_totals), _ = await asyncio.gather(
+        sync_to_async(search_results)(search, getattr(request, "room_search", None)),
+        load_request_state(request),
+    )
+    page = paginate_list(request, rooms, attrgetter("room_number"))
+    if search and "cursor" not in request.GET:
+        BOOKING_FUNNEL.inc(step="search")
 
     return render(request, "hotel/room_list.html", {
         "form": form,
-        "rooms": rooms
+        "rooms": page,
+        "page": page,
+        "stay_totals": stay_totals,
+        "nights": (search[1] - search[0]).days if search else None,
     })
 
 
 # ROOM DETAILS
-def room_detail(request, pk):
-    room = get_object_or_404(Room, pk=pk)
-    reviews = room.reviews.all()
-    avg_rating = reviews.aggregate(Avg("rating"))["rating__avg"]
+@query_budget(4)
+@conditional_page(room_detail_counters)
+@read_replica
+async def room_detail(request, pk):
+    # The rating summary is stored on the room row, so the room, its page
+    # of reviews and the session are independent and fetched together.
+    try:
+        room, reviews, _ = await asyncio.gather(
+            Room.objects.select_related("room_type").aget(pk=pk),
+            apaginate(
+                request,
+                RoomReview.objects.filter(room_id=pk).select_related("user"),
+                ("-created_at", "id")
+            ),
+            load_request_state(request),
+        )
+    except Room.DoesNotExist:
+        raise Http404("No Room matches the given query.")
 
     return render(request, "hotel/room_detail.html", {
         "room": room,
         "reviews": reviews,
-        "avg_rating": avg_rating,
+        "page": reviews,
+        "avg_rating": room.average_rating,
     })
 
 
 
 # MAKE BOOKING
+# Session, user, the booking, its dashboard counter and its nights; three
+# more when this worker reloads the catalogue and rate calendar, and the
+# savepoints TestCase wraps the transaction in
+@query_budget(12)
 @login_required
 def make_booking(request, room_id):
-    room = get_object_or_404(Room, id=room_id)
+    room = catalogue.room(room_id)
+    if room is None:
+        raise Http404("No Room matches the given query.")
 
     if request.method == "POST":
         form = BookingForm(request.POST)
         if form.is_valid():
             booking = form.save(commit=False)
             booking.guest = request.user
-            booking.room = room
+            booking.room_id = room.id
 
             # DATE VALIDATION
             if booking.check_out_date <= booking.check_in_date:
@@ -86,11 +221,28 @@ def make_booking(request, room_id):
                     "room": room
                 })
 
-            nights = (booking.check_out_date - booking.check_in_date).days
-            booking.total_price = nights * room.room_type.price_per_night
-            booking.status = "pending"
-            booking.save()
+            try:
+                booking = services.create_booking(
+                    guest=request.user,
+                    room=room,
+                    check_in=booking.check_in_date,
+                    check_out=booking.check_out_date,
+                    number_of_guests=booking.number_of_guests,
+                )
+            except RoomUnavailable:
+                messages.error(request, "Sorry, this room is already booked for those dates.")
+                return render(request, "hotel/make_booking.html", {
+                    "form": form,
+                    "room": room
+                })
+            except services.BookingConflict as exc:
+                messages.error(request, str(exc))
+                return render(request, "hotel/make_booking.html", {
+                    "form": form,
+                    "room": room
+                })
 
+            BOOKING_FUNNEL.inc(step="booking")
             messages.success(request, "Booking created successfully! Please complete payment.")
             return redirect("payment", booking_id=booking.id)
     else:
@@ -100,25 +252,29 @@ def make_booking(request, room_id):
 
 
 # PAYMENT
+@query_budget(14)
 @login_required
 def payment(request, booking_id):
-    booking = get_object_or_404(Booking, id=booking_id, guest=request.user)
+    booking = get_object_or_404(
+        Booking.objects.select_related("room__room_type"),
+        id=booking_id,
+        guest=request.user
+    )
 
     if request.method == "POST":
         form = PaymentForm(request.POST)
         if form.is_valid():
-            payment = form.save(commit=False)
-            payment.booking = booking
-            payment.transaction_id = str(uuid.uuid4())[:8]
-            payment.status = "completed"
-            payment.save()
-
-            booking.status = "confirmed"
-            booking.save()
-
-            booking.room.status = "occupied"
-            booking.room.save()
-
+            try:
+                services.confirm_booking(
+                    booking.id,
+                    request.user,
+                    payment_method=form.cleaned_data["payment_method"],
+                )
+            except services.BookingError as exc:
+                messages.error(request, str(exc))
+                return redirect("booking_details", booking_id=booking.id)
+
+            BOOKING_FUNNEL.inc(step="payment")
             messages.success(request, "Payment successful. Booking confirmed!")
             return redirect("booking_details", booking_id=booking.id)
     else:
@@ -131,20 +287,25 @@ def payment(request, booking_id):
 
 
 # MY BOOKINGS
+@query_budget(4)
 @login_required
 def my_bookings(request):
-    bookings = Booking.objects.filter(
-        guest=request.user
-    ).order_by("-created_at")
+    # Recent bookings and the archived ones, newest first
+    page = paginate_merged(request, archive.guest_bookings(request.user), ("-created_at", "id"))
 
-    return render(request, "hotel/my_bookings.html", {"bookings": bookings})
+    return render(request, "hotel/my_bookings.html", {
+        "bookings": page,
+        "page": page
+    })
 
 
 # BOOKING DETAILS
+@query_budget(5)
 @login_required
 def booking_details(request, booking_id):
-    booking = get_object_or_404(Booking, id=booking_id, guest=request.user)
-    payment = Payment.objects.filter(booking=booking).first()
+    booking, payment = archive.find_booking(booking_id, request.user)
+    if booking is None:
+        raise Http404("No Booking matches the given query.")
     return render(request, "hotel/booking_detail.html", {
         "booking": booking,
         "payment": payment
@@ -152,31 +313,29 @@ def booking_details(request, booking_id):
 
 
 # CANCEL BOOKING
+@query_budget(13)
 @login_required
 def cancel_booking(request, booking_id):
     booking = get_object_or_404(Booking, id=booking_id, guest=request.user)
 
-    if booking.status in ["pending", "confirmed"]:
-        booking.status = "cancelled"
-        booking.save()
-
-        booking.room.status = "available"
-        booking.room.save()
-
-        messages.success(request, "Booking cancelled successfully")
+    if booking.status in Booking.BLOCKING_STATUSES:
+        try:
+            services.cancel_booking(booking.id, request.user)
+        except services.BookingError as exc:
+            messages.error(request, str(exc))
+        else:
+            BOOKING_FUNNEL.inc(step="cancellation")
+            messages.success(request, "Booking cancelled successfully")
 
     return redirect("my_bookings")
 
+@query_budget(7)
 @login_required
 def add_review(request, room_id):
     room = get_object_or_404(Room, id=room_id)
 
     # Check completed booking
-    has_stayed = Booking.objects.filter(
-        guest=request.user,
-        room=room,
-        status="completed"
-    ).exists()
+    has_stayed = archive.has_stayed(request.user, room)
 
     if not has_stayed:
         messages.error(request, "You can review only after completing your stay.")
@@ -199,34 +358,46 @@ def add_review(request, room_id):
         "room": room
     })
 
+@query_budget(3)
 @staff_member_required
 def admin_dashboard(request):
-    total_bookings = Booking.objects.count()
-    confirmed_bookings = Booking.objects.filter(status="confirmed").count()
-    cancelled_bookings = Booking.objects.filter(status="cancelled").count()
-
-    total_revenue = Payment.objects.filter(
-        status="completed"
-    ).aggregate(total=Sum("amount"))["total"] or 0
-
-    occupied_rooms = Room.objects.filter(status="occupied").count()
+    stats = DashboardStats.load()
 
     return render(request, "hotel/admin_dashboard.html", {
-        "total_bookings": total_bookings,
-        "confirmed_bookings": confirmed_bookings,
-        "cancelled_bookings": cancelled_bookings,
-        "total_revenue": total_revenue,
-        "occupied_rooms": occupied_rooms,
+        "total_bookings": stats.total_bookings,
+        "confirmed_bookings": stats.confirmed_bookings,
+        "cancelled_bookings": stats.cancelled_bookings,
+        "total_revenue": stats.total_revenue,
+        "occupied_rooms": stats.occupied_rooms,
+        "search_cache": search_cache.stats(),
+        "export_form": ExportForm(initial={"start": date.today().replace(day=1), "end": date.today()}),
     })
 
 
-   
-
-      
-      
-      
-
-
-
-
-       
\ No newline at end of file
+# ACCOUNTING EXPORTS
+# The rows are streamed after the view returns, so they are not counted
+# against the query budget.
+@query_budget(3)
+@staff_member_required
+def export_data(request, kind):
+    if kind not in exports.EXPORTS:
+        raise Http404("Unknown export")
+
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text(), content_type="text/plain")
+
+    start = form.cleaned_data["start"]
+    end = form.cleaned_data["end"]
+    fmt = form.cleaned_data["format"]
+    compress = form.cleaned_data["gzip"]
+
+    # Under ASGI a sync iterator would be read into memory before sending
+    stream = exports.astream if isinstance(request, ASGIRequest) else exports.stream
+    response = StreamingHttpResponse(
+        stream(kind, start, end, fmt, compress),
+        content_type="application/gzip" if compress else exports.FORMATS[fmt],
+    )
+    name = exports.filename(kind, start, end, fmt, compress)
+    response["Content-Disposition"] = f'attachment; filename="{name}"'
+    return response
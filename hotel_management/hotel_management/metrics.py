@@ -0,0 +1,266 @@
+"""
+Runtime metrics in the Prometheus text format, with no metrics server.
+
+Each process adds to counters in memory; that is one dict update under a
+lock held for microseconds. Every ``settings.METRICS_FLUSH_SECONDS`` a
+background thread adds them to a small SQLite file
+(``settings.METRICS_DB``) with one upsert per series, so all the workers
+on a host share one set of totals. ``/metrics/`` (staff only) flushes
+this process and renders the file. Nothing is recorded unless
+``settings.METRICS_ENABLED``.
+
+Histograms are stored as their cumulative ``_bucket``, ``_sum`` and
+``_count`` series, as Prometheus expects them.
+"""
+import atexit
+import logging
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _labels(labels):
+    return ",".join(f'{name}="{value}"' for name, value in sorted(labels.items()))
+
+
+def _bucket_order(sample):
+    # Buckets in ascending "le" order within each label set, +Inf last
+    name, labels, _ = sample
+    match = _LE.search(labels)
+    if match is None:
+        return name, labels, 0.0
+    return name, _LE.sub("", labels), float(match.group(1))
+
+
+_LE = re.compile(r'le="([^"]+)",?')
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}  # name -> (type, help)
+        self._lock = threading.Lock()
+        self._pending = defaultdict(float)  # (series name, labels) -> increment
+        self._flushing = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._local = threading.local()
+
+    def define(self, name, kind, help):
+        self.metrics[name] = (kind, help)
+
+    # RECORDING
+
+    def add(self, samples):
+        """Add ``{(series name, labels): increment}`` to the pending totals."""
+        if not getattr(settings, "METRICS_ENABLED", False):
+            return
+        with self._lock:
+            for key, value in samples.items():
+                self._pending[key] += value
+        if time.monotonic() - self._last_flush >= getattr(settings, "METRICS_FLUSH_SECONDS", 5):
+            self._last_flush = time.monotonic()
+            threading.Thread(target=self._flush_in_background, daemon=True).start()
+
+    # STORAGE
+
+    def _connection(self):
+        path = str(settings.METRICS_DB)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.path != path:
+            conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS samples ("
+                " name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL,"
+                " PRIMARY KEY (name, labels)) WITHOUT ROWID"
+            )
+            self._local.conn, self._local.path = conn, path
+        return conn
+
+    def flush(self):
+        """Add this process's pending increments to the shared file."""
+        with self._flushing:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(float)
+            if not pending:
+                return
+            conn = None
+            try:
+                conn = self._connection()
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    "INSERT INTO samples (name, labels, value) VALUES (?, ?, ?)"
+                    " ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value",
+                    [(name, labels, value) for (name, labels), value in pending.items()],
+                )
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                if conn is not None and conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                # Keep the increments for the next flush; not through add(),
+                # which could start another flush while this one fails
+                with self._lock:
+                    for key, value in pending.items():
+                        self._pending[key] += value
+                raise
+
+    def _flush_in_background(self):
+        try:
+            self.flush()
+        except sqlite3.Error:
+            logger.warning("Could not flush metrics to %s", settings.METRICS_DB, exc_info=True)
+
+    def samples(self):
+        return self._connection().execute(
+            "SELECT name, labels, value FROM samples ORDER BY name, labels"
+        ).fetchall()
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+        self._connection().execute("DELETE FROM samples")
+
+    # EXPOSITION
+
+    def render(self):
+        by_metric = defaultdict(list)
+        for name, labels, value in self.samples():
+            base = name
+            for suffix in ("_bucket", "_sum", "_count"):
+                if name.endswith(suffix) and name[:-len(suffix)] in self.metrics:
+                    base = name[:-len(suffix)]
+            by_metric[base].append((name, labels, value))
+
+        lines = []
+        for base in sorted(by_metric):
+            kind, help = self.metrics.get(base, ("untyped", ""))
+            lines += [f"# HELP {base} {help}", f"# TYPE {base} {kind}"]
+            for name, labels, value in sorted(by_metric[base], key=_bucket_order):
+                value = int(value) if value == int(value) else value
+                lines.append(f"{name}{{{labels}}} {value}" if labels else f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+atexit.register(lambda: registry.flush() if registry._pending else None)
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self._series = {}
+        registry.define(name, "counter", help)
+
+    def inc(self, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = (self.name, _labels(labels))
+        registry.add({series: value})
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.buckets = buckets
+        self._series = {}
+        registry.define(name, "histogram", help)
+
+    def _series_for(self, labels):
+        # Formatting label strings is most of the cost; do it once per series
+        key = tuple(sorted(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = (
+                (f"{self.name}_sum", _labels(labels)),
+                (f"{self.name}_count", _labels(labels)),
+                [(f"{self.name}_bucket", _labels({**labels, "le": bound})) for bound in self.buckets]
+                + [(f"{self.name}_bucket", _labels({**labels, "le": "+Inf"}))],
+            )
+        return series
+
+    def observe(self, value, **labels):
+        sum_series, count_series, buckets = self._series_for(labels)
+        # Lower buckets get 0 so every bucket is exposed from the start
+        first = bisect_left(self.buckets, value)
+        samples = {**dict.fromkeys(buckets[:first], 0), **dict.fromkeys(buckets[first:], 1)}
+        samples[sum_series] = value
+        samples[count_series] = 1
+        registry.add(samples)
+
+
+REQUEST_DURATION = Histogram(
+    "hotel_http_request_duration_seconds", "Request latency by URL name.", LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    "hotel_http_request_queries", "SQL queries per request by URL name.", QUERY_BUCKETS
+)
+BOOKING_FUNNEL = Counter(
+    "hotel_booking_funnel_total", "Searches, bookings, payments and cancellations."
+)
+
+
+# MIDDLEWARE
+
+class MetricsMiddleware:
+    """Time every request by URL name; query counts come from the query log
+    ``QueryBudgetMiddleware`` (which must come after this one) leaves on it."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, elapsed):
+        match = request.resolver_match
+        labels = {
+            "route": match.view_name if match else "unmatched",
+            "method": request.method,
+            "status": f"{response.status_code // 100}xx",
+        }
+        REQUEST_DURATION.observe(elapsed, **labels)
+        log = getattr(request, "query_log", None)
+        if log is not None:
+            REQUEST_QUERIES.observe(len(log), route=labels["route"])
+
+
+@staff_member_required
+def metrics_view(request):
+    try:
+        registry.flush()
+    except sqlite3.Error:
+        # The increments are kept for the next flush; show what the file has
+        logger.warning("Could not flush metrics to %s", settings.METRICS_DB, exc_info=True)
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,171 @@
+"""
+Opt-in per-request profiling.
+
+With ``settings.PROFILING_ENABLED`` on, ``ProfilingMiddleware`` times each
+request's SQL, template rendering and the rest (view code and middleware),
+and sends the split back in a ``Server-Timing`` header, which browser dev
+tools show next to the request::
+
+    Server-Timing: db;dur=12.4;desc="7 queries", tpl;dur=30.2, app;dur=8.1, total;dur=50.7
+
+Requests slower than ``settings.PROFILING_SLOW_MS`` are logged to the
+``hotel_management.profiling`` logger (a rotating file, see ``LOGGING``).
+A fraction ``settings.PROFILING_SAMPLE_RATE`` of requests also run under
+cProfile, one at a time per process; when such a request turns out slow,
+its top functions go into the log entry too. Under ASGI only the event
+loop thread is profiled.
+
+When profiling is off the middleware removes itself from the chain and the
+template timer is never installed, so it costs nothing.
+"""
+import cProfile
+import io
+import logging
+import pstats
+import random
+import threading
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .querybudget import record_queries
+
+logger = logging.getLogger(__name__)
+
+PROFILE_LINES = 30
+
+_timings = ContextVar("profiling_timings", default=None)
+# cProfile cannot run two profilers at once on Python 3.12+
+_profiler_lock = threading.Lock()
+
+
+class RequestTimings:
+    def __init__(self):
+        self.template = 0.0
+        self.rendering = False
+
+
+def install_template_timer():
+    """Time top-level template renders for requests being profiled."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, "timed", False):
+        return
+    original = Template.render
+
+    @wraps(original)
+    def render(self, *args, **kwargs):
+        timings = _timings.get()
+        # Templates included from a timed render are already counted
+        if timings is None or timings.rendering:
+            return original(self, *args, **kwargs)
+        timings.rendering = True
+        started = time.perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            timings.template += time.perf_counter() - started
+            timings.rendering = False
+
+    render.timed = True
+    Template.render = render
+
+
+class ProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, "PROFILING_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow = getattr(settings, "PROFILING_SLOW_MS", 500) / 1000
+        self.sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0.0)
+        install_template_timer()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        profiler = self.start_profiler()
+        started = time.perf_counter()
+        try:
+            with record_queries() as log:
+                response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stop_profiler(profiler)
+            _timings.reset(token)
+        return self.finish(request, response, elapsed, timings, log, profiler)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = _timings.set(timings)
+        # See QueryBudgetMiddleware: queries run on the thread-sensitive worker
+        recorder = record_queries()
+        log = await sync_to_async(recorder.__enter__)()
+        profiler = self.start_profiler()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.stop_profiler(profiler)
+            _timings.reset(token)
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        return self.finish(request, response, elapsed, timings, log, profiler)
+
+    # CPROFILE SAMPLING
+
+    def start_profiler(self):
+        if random.random() >= self.sample_rate or not _profiler_lock.acquire(blocking=False):
+            return None
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler (a debugger, coverage) is active
+            _profiler_lock.release()
+            return None
+        return profiler
+
+    def stop_profiler(self, profiler):
+        if profiler is not None:
+            profiler.disable()
+            _profiler_lock.release()
+
+    # REPORTING
+
+    def finish(self, request, response, elapsed, timings, log, profiler):
+        db = sum(duration for _, duration in log.queries)
+        app = max(0.0, elapsed - db - timings.template)
+        response.headers["Server-Timing"] = ", ".join([
+            f'db;dur={db * 1000:.1f};desc="{len(log)} queries"',
+            f"tpl;dur={timings.template * 1000:.1f}",
+            f"app;dur={app * 1000:.1f}",
+            f"total;dur={elapsed * 1000:.1f}",
+        ])
+        if elapsed >= self.slow:
+            self.log_slow(request, response, elapsed, db, timings.template, log, profiler)
+        return response
+
+    def log_slow(self, request, response, elapsed, db, template, log, profiler):
+        lines = [
+            f"{request.method} {request.get_full_path()} {response.status_code} "
+            f"took {elapsed * 1000:.0f} ms: db {db * 1000:.0f} ms in {len(log)} queries, "
+            f"templates {template * 1000:.0f} ms",
+        ]
+        slowest = sorted(log.queries, key=lambda query: query[1], reverse=True)[:5]
+        lines += [f"  {duration * 1000:8.1f} ms  {sql}" for sql, duration in slowest]
+        if profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            lines.append(stream.getvalue())
+        logger.warning("\n".join(lines))
@@ -0,0 +1,121 @@
+"""
+Per-request SQL query recording and per-view query budgets.
+
+A view declares how many queries it may run with ``@query_budget(n)``.
+``QueryBudgetMiddleware`` records every query issued while the request is
+handled; when a view goes over its budget the middleware logs a warning.
+It never fails the request: by then the view has run and may have
+committed its writes. Tests enforce the budgets with
+``QueryBudgetTestMixin.assertWithinQueryBudget``.
+"""
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryLog:
+    """``execute_wrapper`` that keeps the SQL and duration of each query."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    def __len__(self):
+        return len(self.queries)
+
+    def __str__(self):
+        return "\n".join(f"{i}. {sql}" for i, (sql, _) in enumerate(self.queries, 1))
+
+
+@contextmanager
+def record_queries():
+    """Record the queries run on every configured database inside the block."""
+    log = QueryLog()
+    with ExitStack() as stack:
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(log))
+        yield log
+
+
+def query_budget(max_queries):
+    """Declare the maximum number of SQL queries a view may run.
+
+    The count covers the whole request, including the session and user
+    lookups done by the auth middleware.
+    """
+    def decorator(view_func):
+        view_func.query_budget = max_queries
+        return view_func
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    # Works in both modes so async views are not pushed onto a thread
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.query_budget = None
+        with record_queries() as log:
+            response = self.get_response(request)
+        return self.check(request, log, response)
+
+    async def __acall__(self, request):
+        # Connections belong to a thread and the async ORM runs queries on
+        # the request's thread-sensitive worker, so record them there.
+        request.query_budget = None
+        recorder = record_queries()
+        log = await sync_to_async(recorder.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(recorder.__exit__)(None, None, None)
+        return self.check(request, log, response)
+
+    def check(self, request, log, response):
+        request.query_log = log
+
+        budget = request.query_budget
+        if budget is not None and len(log) > budget:
+            logger.warning(
+                "%s ran %d queries, budget is %d:\n%s", request.path, len(log), budget, log
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, "query_budget", None)
+
+
+class QueryBudgetTestMixin:
+    """``TestCase`` mixin to check responses against their view's budget."""
+
+    def assertWithinQueryBudget(self, response):
+        request = response.wsgi_request
+        self.assertIsNotNone(
+            getattr(request, "query_budget", None),
+            f"{request.path} does not declare a query budget",
+        )
+        self.assertLessEqual(
+            len(request.query_log),
+            request.query_budget,
+            f"{request.path} ran {len(request.query_log)} queries, "
+            f"budget is {request.query_budget}:\n{request.query_log}",
+        )
@@ -0,0 +1,173 @@
+"""
+Read replicas for catalogue and search pages.
+
+``settings.DATABASE_REPLICAS`` lists aliases in ``DATABASES`` that are
+read-only copies of ``default``. Inside views marked ``@read_replica``,
+``ReplicaRouter`` sends reads of the catalogue and booking models
+(``REPLICATED_MODELS``) to one of them; every other read and every write
+goes to ``default``.
+
+A replica may be a little behind. So that a guest always sees what they
+just did, a request that writes one of those models gets a cookie
+(``PrimaryPinMiddleware``) that sends that browser's reads to the primary
+for ``settings.REPLICA_PIN_SECONDS``.
+
+The in-process mirrors are tagged with the current version counter and
+kept until the next bump. ``hotel.catalogue`` loads from a replica when
+its reader may; a load made less than ``max_lag()`` after the last bump
+is kept only until then (see ``Catalogue.load``). ``hotel.availability``
+loads inside ``primary()``: it decides which rooms can be booked.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+PIN_COOKIE = "db_primary"
+
+REPLICATED_MODELS = {
+    "hotel.roomtype",
+    "hotel.room",
+    "hotel.roomreview",
+    "hotel.booking",
+    "hotel.roomnight",
+}
+
+# Set while a @read_replica view runs (and not inside primary())
+_replica_reads = ContextVar("replica_reads", default=False)
+# The current request's routing state, set by PrimaryPinMiddleware
+_request = ContextVar("replica_request", default=None)
+
+
+class RequestRouting:
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.wrote = False
+
+
+def replicas():
+    return list(getattr(settings, "DATABASE_REPLICAS", []))
+
+
+def max_lag():
+    """Seconds a replica may be behind: as long as a writer stays pinned."""
+    return getattr(settings, "REPLICA_PIN_SECONDS", 10)
+
+
+def reads_from_replica(label):
+    """Whether a read of the model ``label`` (e.g. ``"hotel.room"``) here goes to a replica."""
+    if not _replica_reads.get() or label not in REPLICATED_MODELS or not replicas():
+        return False
+    state = _request.get()
+    return state is None or not state.pinned
+
+
+@contextmanager
+def primary():
+    """Read from ``default`` inside the block, even in a ``@read_replica`` view."""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def read_replica(view_func):
+    """Let this view's catalogue and search reads go to a replica."""
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    else:
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    return wrapper
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not reads_from_replica(model._meta.label_lower):
+            return None
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        state = _request.get()
+        if state is not None and model._meta.label_lower in REPLICATED_MODELS:
+            state.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {"default", *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+class PrimaryPinMiddleware:
+    """Pin a browser to the primary for a while after it writes."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replicas():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.pin_seconds = max_lag()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = self.state_for(request)
+        token = _request.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        state = self.state_for(request)
+        token = _request.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        return self.pin(state, response)
+
+    def state_for(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        return RequestRouting(pinned=pinned_until > time.time())
+
+    def pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, str(int(time.time()) + self.pin_seconds),
+                max_age=self.pin_seconds, httponly=True, samesite="Lax",
+            )
+        return response
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -33,7 +34,11 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'hotel_management.profiling.ProfilingMiddleware',   # no-op unless PROFILING_ENABLED
     'django.middleware.security.SecurityMiddleware',
+    'hotel_management.metrics.MetricsMiddleware',   # before QueryBudgetMiddleware
+    'hotel_management.querybudget.QueryBudgetMiddleware',
+    'hotel_management.replicas.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',   # MUST be before auth
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -41,13 +46,123 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
+# SQLite in WAL mode with write transactions queued per process; see
+# hotel_management.sqlite.base for the options.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'hotel_management.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000)),
+            'mmap_size': int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)),
+            'transaction_mode': 'IMMEDIATE',
+            'serialize_writes': True,
+        },
     }
 }
 
+# READ REPLICAS
+# DATABASE_REPLICA_PATH points at a read-only copy of db.sqlite3 (kept up to
+# date by e.g. Litestream or a periodic backup) that the catalogue and search
+# pages read from; see hotel_management.replicas. Tests use the primary.
+if os.environ.get("DATABASE_REPLICA_PATH"):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ["DATABASE_REPLICA_PATH"],
+        'OPTIONS': {'init_command': 'PRAGMA query_only = ON;'},
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['hotel_management.replicas.ReplicaRouter']
+# Seconds a browser reads from the primary after it writes
+REPLICA_PIN_SECONDS = int(os.environ.get("REPLICA_PIN_SECONDS", 10))
+
+
+# CACHES
+# Search results live in their own cache so promotions cannot evict other
+# entries; TIMEOUT is the TTL and MAX_ENTRIES the LRU size. Point these at
+# Redis/Memcached in production so all workers share them.
+CACHES = {
+    # Also holds the version counters (VERSION_CACHE_ALIAS): one per
+    # night, room and room type, so well above locmem's default 300 entries.
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get("DEFAULT_CACHE_MAX_ENTRIES", 50000))},
+    },
+    'search': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'room-search',
+        'TIMEOUT': int(os.environ.get("SEARCH_CACHE_TIMEOUT", 300)),
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", 5000))},
+    },
+    # Rendered room cards (hotel.fragments); keys carry the versions they
+    # were rendered from, so entries never need deleting, only evicting.
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get("FRAGMENT_CACHE_MAX_ENTRIES", 20000))},
+    },
+}
+SEARCH_CACHE_ALIAS = 'search'
+FRAGMENT_CACHE_ALIAS = 'fragments'
+VERSION_CACHE_ALIAS = 'default'
+
+# Minutes a pending (unpaid) booking holds its room; see hotel.holds
+BOOKING_HOLD_MINUTES = int(os.environ.get("BOOKING_HOLD_MINUTES", 15))
+
+# Days after check-out before a finished booking moves to the archive
+# tables; see hotel.archive
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", 365))
+
+# Nights ahead each worker keeps priced in memory; later stays are priced
+# night by night. See hotel.rates
+RATE_CALENDAR_DAYS = int(os.environ.get("RATE_CALENDAR_DAYS", 730))
+
+# PROFILING
+# Server-Timing headers and a slow request log; see hotel_management.profiling
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "") == "1"
+PROFILING_SLOW_MS = int(os.environ.get("PROFILING_SLOW_MS", 500))
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0.01))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'slow_requests': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            # Outside the source tree; set PROFILING_LOG_FILE to move it
+            'filename': os.environ.get(
+                "PROFILING_LOG_FILE", Path(tempfile.gettempdir()) / "hotel-slow-requests.log"
+            ),
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+        },
+    },
+    'loggers': {
+        'hotel_management.profiling': {
+            'handlers': ['slow_requests'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# METRICS
+# Per-process counters flushed to a SQLite file shared by the workers on this
+# host and served at /metrics/; see hotel_management.metrics
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "") == "1"
+METRICS_DB = os.environ.get("METRICS_DB", Path(tempfile.gettempdir()) / "hotel-metrics.sqlite3")
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", 5))
+
+# Part of every catalogue page ETag; set per deploy so browsers and CDNs
+# drop pages rendered by the previous release's templates.
+RELEASE_ID = os.environ.get("RELEASE_ID", "")
+
 
 # TEMPLATES
 TEMPLATES = [
@@ -0,0 +1,109 @@
+"""
+SQLite backend tuned for many concurrent readers and writers.
+
+Extra ``OPTIONS`` on top of Django's own (``transaction_mode``,
+``init_command``):
+
+``journal_mode``
+    ``"WAL"`` lets readers carry on while a write is in progress.
+``synchronous``
+    ``"NORMAL"`` is durable across application crashes in WAL mode and
+    skips an fsync per commit.
+``busy_timeout``
+    Milliseconds to wait for another connection's write lock before
+    failing with "database is locked".
+``mmap_size``
+    Bytes of the database file to read through memory-mapped I/O.
+``serialize_writes``
+    Queue transactions on a process-wide lock per database file before
+    they ``BEGIN``. Threads then wait their turn in Python instead of
+    spinning in SQLite's busy handler, and only the other processes
+    compete for the file lock.
+
+With ``transaction_mode = "IMMEDIATE"`` every ``atomic()`` block takes the
+write lock when it starts, so two transactions can never both read and
+then deadlock trying to upgrade to a write. Single statements outside
+``atomic()`` are not queued; ``busy_timeout`` covers them.
+"""
+import threading
+
+from django.db.backends.sqlite3 import base
+
+_write_locks = {}
+_write_locks_guard = threading.Lock()
+
+
+def write_lock(name):
+    """The process-wide transaction lock for the database file ``name``."""
+    name = str(name)
+    with _write_locks_guard:
+        return _write_locks.setdefault(name, threading.Lock())
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pragmas = []
+        self.write_lock = None
+        self._holds_write_lock = False
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        busy_timeout = kwargs.pop("busy_timeout", None)
+        if busy_timeout is not None:
+            kwargs["timeout"] = busy_timeout / 1000
+        self.busy_timeout = kwargs.get("timeout", 5)
+
+        pragmas = [
+            ("journal_mode", kwargs.pop("journal_mode", None)),
+            ("synchronous", kwargs.pop("synchronous", None)),
+            ("mmap_size", kwargs.pop("mmap_size", None)),
+        ]
+        self.pragmas = [f"PRAGMA {name} = {value}" for name, value in pragmas if value is not None]
+
+        serialize = kwargs.pop("serialize_writes", False) and not self.is_in_memory_db()
+        self.write_lock = write_lock(self.settings_dict["NAME"]) if serialize else None
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        return conn
+
+    # WRITE QUEUE
+
+    def _start_transaction_under_autocommit(self):
+        if self.write_lock is not None and not self._holds_write_lock:
+            if not self.write_lock.acquire(timeout=self.busy_timeout):
+                with self.wrap_database_errors:
+                    raise self.Database.OperationalError("database is locked")
+            self._holds_write_lock = True
+        try:
+            super()._start_transaction_under_autocommit()
+        except BaseException:
+            self._release_write_lock()
+            raise
+
+    def _release_write_lock(self):
+        if self._holds_write_lock:
+            self._holds_write_lock = False
+            self.write_lock.release()
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self._release_write_lock()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self._release_write_lock()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self._release_write_lock()
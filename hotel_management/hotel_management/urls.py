@@ -19,8 +19,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from . import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("", include("hotel.urls")),
     path("accounts/", include("accounts.urls")),
+    path("metrics/", metrics.metrics_view, name="metrics"),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)